@@ -1,62 +1,194 @@
 from __future__ import annotations
 
-import json
 import os
 import shlex
+import shutil
 import subprocess
 import sys
 import tempfile
 from asyncio import sleep
-from datetime import datetime
-from typing import Any
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from functools import partial
+from http import HTTPStatus
+from io import TextIOWrapper
+from itertools import chain
+from typing import IO, Any, Literal
 
-import yaml
+from aiohttp import ClientError
 from counterweight.components import component
 from counterweight.controls import Suspend
 from counterweight.elements import Chunk, Div, Text
 from counterweight.events import KeyPressed
-from counterweight.hooks import Setter, use_effect, use_state
+from counterweight.hooks import Ref, Setter, use_effect, use_rects, use_ref, use_state
 from counterweight.keys import Key
+from counterweight.styles import Span
 from counterweight.styles.utilities import *
 from more_itertools import intersperse
 from structlog import get_logger
+from yaml import YAMLError
 
-from kludge.diskovery import Resource, discover_resources
-from kludge.klient import Klient
-from kludge.konfig import Konfig
+from kludge.bulk import Progress, bulk, parse_assignments
+from kludge.constants import DEFAULT_NAMESPACE
+from kludge.diskovery import (
+    ALL_NAMESPACES,
+    Discovery,
+    DiscoveryFailed,
+    Resource,
+    discover_resources,
+)
+from kludge.formats import dump_json, dump_yaml, load_yaml
+from kludge.informer import METADATA_WATCH_HEADERS, Informers, ObjectKey, Owner, changes, owned
+from kludge.kache import ObjectCache, View, ViewCache, read_discovery, write_discovery
+from kludge.klient import Klient, Klients, resource_version_of, response_error
+from kludge.logs import LogBuffer, LogSource, containers, default_container, follow_logs
+from kludge.patch import MERGE_PATCH_HEADERS, PatchFailed, apply_edit
+from kludge.search import RowSearch, highlights
+from kludge.sorting import SortedRows
+from kludge.startup import PROFILE
+from kludge.stats import STATS, Percentiles, timed
+from kludge.typeahead import Typeahead
 from kludge.utils import clamp, now
+from kludge.watch import (
+    INITIAL_BACKOFF,
+    MAX_BACKOFF,
+    ListFailed,
+    Row,
+    Table,
+    list_and_watch,
+)
 
 logger = get_logger()
 
 FOCUS = {
-    0: "resources",
-    1: "namespaces",
-    2: "table",
+    0: "contexts",
+    1: "resources",
+    2: "namespaces",
+    3: "labels",
+    4: "fields",
+    5: "table",
 }
+FOCUS_IDX = {v: k for k, v in FOCUS.items()}
 
 DEFAULT_SELECTED_RESOURCE = "pod"
 
+LOG_TAIL_LINES = (1_000, 100, 10_000)
+LOG_SINCE_SECONDS: tuple[int | None, ...] = (None, 5 * 60, 60 * 60, 24 * 60 * 60)
+LOG_RENDER_INTERVAL = 0.1  # seconds
+
+SEARCH_HIGHLIGHT = CellStyle(foreground=Color.from_name("black"), background=yellow_300)
+
+
+@dataclass(frozen=True, slots=True)
+class Prompt:
+    """
+    A bulk action on some objects, waiting for the user to confirm it or type its argument.
+    """
+
+    action: Literal["delete", "label", "annotate"]
+    paths: tuple[str, ...]
+    noun: str  # e.g., "pod" or "pods"
+    text: str = ""
+
+    def __str__(self) -> str:
+        n = f"{len(self.paths)} {self.noun}"
+        match self.action:
+            case "delete":
+                return f"Delete {n}? (y/n)"
+            case "label":
+                return f"Label {n} (key=value or key-): {self.text}_"
+            case "annotate":
+                return f"Annotate {n} (key=value or key-): {self.text}_"
+
 
 @component
-def root() -> Div:
-    names_to_resources, set_names_to_resources = use_state({})  # type: ignore[var-annotated]
+@timed
+def root(klients: Klients) -> Div:
+    context, set_context = use_state(klients.current.context_name)
+    context_filter, set_context_filter = use_state(context)
+    contexts: Ref[Typeahead] = use_ref(lambda: Typeahead.build(klients.konfig.context_names))
+    # Each context's discovery is kept, so that switching back to a context doesn't need to rediscover
+    discoveries: Ref[dict[str, Discovery]] = use_ref({})
+    views: Ref[ViewCache] = use_ref(ViewCache)
+    informers: Ref[dict[str, Informers]] = use_ref({})
+    names_to_resources, set_names_to_resources = use_state(Discovery().index)
+    resource_names, set_resource_names = use_state(Typeahead())
     resource_filter, set_resource_filter = use_state(DEFAULT_SELECTED_RESOURCE)
     selected_resource, set_selected_resource = use_state("")
-    namespace_filter, set_namespace_filter = use_state("default")
-    selected_namespace, set_selected_namespace = use_state("default")
-    namespaces, set_namespaces = use_state(())
-    resources, set_resources = use_state({"columnDefinitions": [], "rows": []})  # type: ignore[var-annotated]
+    namespace_filter, set_namespace_filter = use_state(
+        lambda: klients.current.context.namespace or DEFAULT_NAMESPACE
+    )
+    selected_namespace, set_selected_namespace = use_state(namespace_filter)
+    label_selector, set_label_selector = use_state("")
+    field_selector, set_field_selector = use_state("")
+    namespaces, set_namespaces = use_state(Typeahead())
+    resources, set_resources = use_state(Table())
     last_fetch, set_last_fetch = use_state(now)
-    focus, set_focus = use_state(0)
+    focus, set_focus = use_state(FOCUS_IDX["resources"])
     wide, set_wide = use_state(False)
     use_utc, set_use_utc = use_state(True)
+    show_stats, set_show_stats = use_state(False)
+    no_owner: Owner | None = None
+    owner, set_owner = use_state(no_owner)
+    nothing_owned: frozenset[ObjectKey] = frozenset()
+    owned_keys, set_owned_keys = use_state(nothing_owned)
+    no_error: str | None = None
+    owned_error, set_owned_error = use_state(no_error)
+    resource_error, set_resource_error = use_state(no_error)
+    context_error, set_context_error = use_state(no_error)
+    no_logs: LogSource | None = None
+    logs, set_logs = use_state(no_logs)
+    capturing, set_capturing = use_state(False)
+
+    klient = klients[context]
+    if context not in informers.current:
+        informers.current[context] = Informers(klient)
+    context_informers = informers.current[context]
+
+    def switch_context(name: str) -> None:
+        if name == context:
+            return
+
+        namespace = klients[name].context.namespace or DEFAULT_NAMESPACE
+        set_context(name)
+        set_context_error(None)
+        # The previous context's resources aren't watched against this one, until it is (re)discovered
+        set_names_to_resources(Discovery().index)
+        set_resource_names(Typeahead())
+        set_namespace_filter(namespace)
+        set_selected_namespace(namespace)
+        set_namespaces(Typeahead())
+        set_resources(Table())
+        set_owner(None)
+        set_logs(None)
+
+    def show_logs(source: LogSource) -> None:
+        set_logs(source)
+        set_focus(FOCUS_IDX["table"])
+
+    def show_owned(o: Owner) -> None:
+        namespace = o.namespace or ALL_NAMESPACES
+        set_owner(o)
+        set_owned_keys(frozenset())
+        set_resource_filter(DEFAULT_SELECTED_RESOURCE)
+        set_selected_resource(DEFAULT_SELECTED_RESOURCE)
+        set_namespace_filter(namespace)
+        set_selected_namespace(namespace)
 
     def on_key(event: KeyPressed) -> None:
         match event.key:
+            case _ if capturing:
+                pass  # the table is prompting for text, so let it have every key
+            case ":" | "/" if FOCUS[focus] in ("labels", "fields"):
+                pass  # these are valid characters in selectors, so let the selector pads have them
+            case "/" if FOCUS[focus] == "table":
+                pass  # the table searches its rows
             case ":":
-                set_focus(0)
+                set_focus(FOCUS_IDX["resources"])
             case "/":
-                set_focus(1)
+                set_focus(FOCUS_IDX["namespaces"])
             case Key.Tab:
                 set_focus(lambda f: (f + 1) % len(FOCUS))
             case Key.BackTab:
@@ -65,63 +197,185 @@ def root() -> Div:
                 set_wide(lambda w: not w)
             case Key.ControlU:
                 set_use_utc(lambda u: not u)
+            case Key.ControlT:
+                set_show_stats(lambda s: not s)
+            case Key.Escape if logs is not None:
+                set_logs(None)
+            case Key.Escape:
+                set_owner(None)
 
     async def watch_resources() -> None:
-        async with Klient(Konfig.build()) as klient:
-            while True:
-                discovered_resources = await discover_resources(klient)
-                names_to_resources = {}
-                for r in discovered_resources:
-                    if "list" in r.verbs:
-                        for n in r.names:
-                            names_to_resources[n] = r
-                set_names_to_resources(names_to_resources)
-                set_selected_resource(
-                    lambda sr: (
-                        DEFAULT_SELECTED_RESOURCE
-                        if not sr and DEFAULT_SELECTED_RESOURCE in names_to_resources
-                        else sr
-                    )
+        def publish(discovery: Discovery) -> None:
+            by_name = discovery.index
+            set_names_to_resources(by_name)
+            set_resource_names(Typeahead.build(by_name))
+            # The selected resource might not exist in this context's cluster
+            set_selected_resource(
+                lambda sr: (
+                    sr
+                    if sr in by_name
+                    else DEFAULT_SELECTED_RESOURCE if DEFAULT_SELECTED_RESOURCE in by_name else ""
                 )
+            )
+
+        # Serve the cached discovery immediately, then revalidate it against the API server
+        discovery = discoveries.current.get(context) or read_discovery(klient.server)
+        if discovery is not None:
+            publish(discovery)
+
+        backoff = INITIAL_BACKOFF
+        while True:
+            try:
+                discovered = await discover_resources(klient, cached=discovery)
+            except (DiscoveryFailed, ClientError, TimeoutError) as e:
+                # e.g., the context's API server can't be reached, or its credentials can't be used,
+                # which shouldn't stop the other contexts from being used
+                logger.warning("discovery failed", context=context, error=repr(e), retry_in=backoff)
+                set_context_error(str(e) or type(e).__name__)
+                await sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+
+            set_context_error(None)
+            backoff = INITIAL_BACKOFF
+
+            if discovered is not discovery:
+                discovery = discovered
+                publish(discovery)
+                write_discovery(klient.server, discovery)
+            discoveries.current[context] = discovery
 
-                await sleep(60)
+            await sleep(60)
 
     async def watch_namespaces() -> None:
-        async with Klient(Konfig.build()) as klient:
-            while True:
+        backoff = INITIAL_BACKOFF
+        while True:
+            try:
                 async with await klient.request(
                     method="get", path="/api/v1/namespaces"
                 ) as response:
+                    if response.status != HTTPStatus.OK:
+                        raise ListFailed(await response_error(response))
+
                     j = await response.json()
+            except (ListFailed, ClientError, TimeoutError) as e:
+                # Plenty of users may not list namespaces (so they just can't be picked from a list),
+                # and discovery already shows when the API server can't be reached, so this is only logged
+                logger.info("listing namespaces failed", context=context, error=repr(e))
+                await sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+
+            backoff = INITIAL_BACKOFF
+            set_namespaces(
+                Typeahead.build((ALL_NAMESPACES, *(ns["metadata"]["name"] for ns in j["items"])))
+            )
 
-                ns = tuple(ns["metadata"]["name"] for ns in j["items"])
-                set_namespaces(ns)
+            await sleep(60)
 
-                await sleep(60)
+    # The resource as this context's discovery knows it, which is part of the watch's deps,
+    # so that the watch restarts whenever it is (re)discovered, e.g., after switching contexts
+    resource = names_to_resources.get(selected_resource)
 
     async def watch_resource() -> None:
-        if not selected_resource:  # checks for the empty string that this starts with
+        # The empty string that this starts with, or not (yet) discovered in this context
+        if resource is None:
             return
 
-        async with Klient(Konfig.build()) as klient:
-            while True:
-                async with await klient.request(
-                    method="get",
-                    path=names_to_resources[selected_resource].collection_url(selected_namespace),
-                    headers={
-                        "Accept": "application/json;as=Table;g=meta.k8s.io;v=v1",  # https://kubernetes.io/docs/reference/using-api/api-concepts/#receiving-resources-as-tables
-                    },
-                ) as response:
-                    j = await response.json()
+        path = resource.collection_url(selected_namespace)
+        key = (context, path, label_selector, field_selector)
+        set_resource_error(None)
+
+        # Show the cached view immediately (if there is one), while it is revalidated
+        cached = views.current.get(key)
+        if cached is not None:
+            set_resources(cached.table)
+            set_last_fetch(cached.fetched)
+        else:
+            set_resources(Table())
+
+        async for table in list_and_watch(
+            klient,
+            path=path,
+            watch="watch" in resource.verbs,
+            label_selector=label_selector,
+            field_selector=field_selector,
+            # A single cluster-wide list and watch, rather than one per namespace
+            namespace_column=resource.namespaced and selected_namespace == ALL_NAMESPACES,
+            initial=cached.table if cached is not None else None,
+            on_error=set_resource_error,
+        ):
+            fetched = now()
+            set_resources(table)
+            set_last_fetch(fetched)
+            views.current.put(key, View(table=table, fetched=fetched))
+
+    async def watch_owned() -> None:
+        set_owned_error(None)
+
+        if owner is None:
+            # Nothing else uses the informers, so stop watching once owned pods aren't being shown
+            for i in informers.current.values():
+                await i.stop()
+            return
+        elif DEFAULT_SELECTED_RESOURCE not in names_to_resources:
+            return
+
+        # Pods are usually owned through ReplicaSets (e.g., for Deployments) or Jobs (e.g., for CronJobs),
+        # and the indexes only need metadata, so that's all that is informed.
+        inform = partial(context_informers, metadata_only=True)
+        owners = inform(owner.resource)
+        pods = inform(names_to_resources[DEFAULT_SELECTED_RESOURCE])
+        intermediates = [
+            inform(names_to_resources[n]) for n in ("replicaset", "job") if n in names_to_resources
+        ]
+
+        async for _ in changes(owners, pods, *intermediates):
+            obj = owners.store.get(owner.namespace, owner.name)
+            set_owned_keys(
+                frozenset(
+                    owned(obj["metadata"]["uid"], pods.store, [i.store for i in intermediates])
+                )
+                if obj is not None
+                else frozenset()
+            )
+            set_owned_error(
+                next((i.error for i in (owners, pods, *intermediates) if i.error), None)
+            )
+
+    use_effect(watch_resources, (context,))
+    use_effect(watch_namespaces, (context,))
+    use_effect(
+        watch_resource,
+        (context, resource, selected_namespace, label_selector, field_selector),
+    )
+    use_effect(watch_owned, (context, owner))
 
-                set_resources(j)
-                set_last_fetch(now())
+    # Effects run once the frame they were rendered in has been painted
+    async def first_frame() -> None:
+        PROFILE.mark("first frame")
 
-                await sleep(1)
+    use_effect(first_frame, ())
 
-    use_effect(watch_resources, ())
-    use_effect(watch_namespaces, ())
-    use_effect(watch_resource, (selected_resource, selected_namespace))
+    # When showing the pods owned by something, filter the table down to them
+    shown_owner = (
+        owner
+        if owner is not None
+        and names_to_resources.get(selected_resource)
+        == names_to_resources.get(DEFAULT_SELECTED_RESOURCE)
+        else None
+    )
+    shown: Ref[tuple[tuple[object, ...], Table]] = use_ref(lambda: ((), Table()))
+    if shown_owner is None:
+        shown.current = ((), resources)
+    elif shown.current[0] != (resources, owned_keys, selected_namespace):
+        # Rows listed in a single namespace don't know their namespace
+        keys = (
+            owned_keys
+            if resources.namespace_column
+            else {("", name) for namespace, name in owned_keys if namespace == selected_namespace}
+        )
+        shown.current = ((resources, owned_keys, selected_namespace), resources.only(keys))
 
     return Div(
         style=col,
@@ -130,11 +384,21 @@ def root() -> Div:
             Div(
                 style=row | weight_none | align_self_stretch,
                 children=[
+                    filter_pad(
+                        title="Context",
+                        filter_text=context_filter,
+                        set_filter_text=set_context_filter,
+                        options=contexts.current,
+                        set_selected_option=switch_context,
+                        focused=FOCUS[focus] == "contexts",
+                        set_focus=set_focus,
+                        style=weight_1,
+                    ),
                     filter_pad(
                         title="Resource",
                         filter_text=resource_filter,
                         set_filter_text=set_resource_filter,
-                        options=set(names_to_resources.keys()),
+                        options=resource_names,
                         set_selected_option=set_selected_resource,
                         focused=FOCUS[focus] == "resources",
                         set_focus=set_focus,
@@ -144,47 +408,271 @@ def root() -> Div:
                         title="Namespace",
                         filter_text=namespace_filter,
                         set_filter_text=set_namespace_filter,
-                        options=set(namespaces),
+                        options=namespaces,
                         set_selected_option=set_selected_namespace,
                         focused=FOCUS[focus] == "namespaces",
                         set_focus=set_focus,
                         style=weight_1,
                     ),
+                    selector_pad(
+                        title="Labels",
+                        selector=label_selector,
+                        set_selector=set_label_selector,
+                        focused=FOCUS[focus] == "labels",
+                        set_focus=set_focus,
+                        style=weight_1,
+                    ),
+                    selector_pad(
+                        title="Fields",
+                        selector=field_selector,
+                        set_selector=set_field_selector,
+                        focused=FOCUS[focus] == "fields",
+                        set_focus=set_focus,
+                        style=weight_1,
+                    ),
                 ],
             ),
-            resource_table(
-                names_to_resources=names_to_resources,
-                selected_resource=selected_resource,
-                selected_namespace=selected_namespace,
-                resources=resources,
-                last_fetch=last_fetch,
-                use_utc=use_utc,
-                wide=wide,
-                focused=FOCUS[focus] == "table",
+            (
+                log_pane(
+                    klient=klient,
+                    source=logs,
+                    close=lambda: set_logs(None),
+                    focused=FOCUS[focus] == "table",
+                )
+                if logs is not None
+                else resource_table(
+                    klient=klient,
+                    names_to_resources=names_to_resources,
+                    selected_resource=selected_resource,
+                    selected_namespace=selected_namespace,
+                    selectors=",".join(s for s in (label_selector, field_selector) if s),
+                    owner=shown_owner,
+                    owner_error=owned_error if shown_owner is not None else None,
+                    resource_error=context_error or resource_error,
+                    show_owned=show_owned,
+                    show_logs=show_logs,
+                    resources=shown.current[1],
+                    last_fetch=last_fetch,
+                    use_utc=use_utc,
+                    wide=wide,
+                    focused=FOCUS[focus] == "table",
+                    set_capturing=set_capturing,
+                )
             ),
+            *((stats_overlay(),) if show_stats else ()),
         ],
     )
 
 
 @component
+def stats_overlay() -> Text:
+    summary, set_summary = use_state(STATS.summary)
+
+    async def refresh() -> None:
+        while True:
+            await sleep(1)
+            set_summary(STATS.summary())
+
+    use_effect(refresh, ())
+
+    def ms(p: Percentiles) -> str:
+        return f"p50 {p.p50 * 1000:6.1f}  p95 {p.p95 * 1000:6.1f}  p99 {p.p99 * 1000:6.1f} ms"
+
+    width = max((len(c) for c in ("requests", "latency", *summary.renders)))
+    rates = f"{summary.requests_per_second:.1f}/s  {human_bytes(summary.bytes_per_second)}/s"
+
+    return Text(
+        style=inset_top_right | absolute(x=-1, y=1) | z(20) | border_lightrounded | pad_x_1,
+        content="\n".join(
+            (
+                f"{'requests':<{width}}  {rates}",
+                f"{'latency':<{width}}  {ms(summary.latency)}",
+                *(f"{c:<{width}}  {ms(p)}" for c, p in summary.renders.items()),
+            )
+        ),
+    )
+
+
+@component
+@timed
+def log_pane(
+    klient: Klient,
+    source: LogSource,
+    close: Callable[[], None],
+    focused: bool,
+) -> Div:
+    no_containers: tuple[str, ...] = ()
+    pod_containers, set_pod_containers = use_state(no_containers)
+    no_container: str | None = None
+    container, set_container = use_state(no_container)
+    tail_lines, set_tail_lines = use_state(LOG_TAIL_LINES[0])
+    since_seconds, set_since_seconds = use_state(LOG_SINCE_SECONDS[0])
+    offset, set_offset = use_state(0)  # how many lines back from the newest line the view ends
+    ended, set_ended = use_state(False)
+    no_error: str | None = None
+    error, set_error = use_state(no_error)
+    buffer: Ref[LogBuffer] = use_ref(LogBuffer)
+    _, set_appended = use_state(0)
+
+    async def fetch_containers() -> None:
+        try:
+            async with await klient.request(
+                method="get", path=f"/api/v1/namespaces/{source.namespace}/pods/{source.pod}"
+            ) as r:
+                if r.status != HTTPStatus.OK:
+                    set_error(await response_error(r))
+                    return
+
+                pod = await r.json()
+        except (ClientError, TimeoutError) as e:
+            set_error(str(e) or type(e).__name__)
+            return
+
+        set_pod_containers(containers(pod))
+        set_container(default_container(pod))
+
+    async def follow() -> None:
+        if container is None:
+            return
+
+        buffer.current.clear()
+        set_ended(False)
+        set_error(None)
+
+        # Reconnects (resuming where it left off) if the connection drops
+        async for lines in follow_logs(
+            klient,
+            namespace=source.namespace,
+            pod=source.pod,
+            container=container,
+            tail_lines=tail_lines,
+            since_seconds=since_seconds,
+            on_error=lambda e: set_error(e and f"reconnecting: {e}"),
+        ):
+            buffer.current.extend(lines)
+
+        set_ended(True)
+
+    async def tick() -> None:
+        # Lines can arrive far faster than they can be read,
+        # so render at a fixed rate instead of once per batch of lines.
+        while True:
+            await sleep(LOG_RENDER_INTERVAL)
+            set_appended(buffer.current.appended)
+
+    use_effect(fetch_containers, (source,))
+    use_effect(follow, (source, container, tail_lines, since_seconds))
+    use_effect(tick, ())
+
+    # Only the lines that fit in the pane are drawn
+    rects = use_rects()
+    height = max(1, rects.content.height or shutil.get_terminal_size().lines)
+    width = max(1, rects.content.width or shutil.get_terminal_size().columns)
+    offset = clamp(0, offset, max(0, len(buffer.current) - height))
+    lines = buffer.current.tail(height, offset)
+
+    def on_key(event: KeyPressed) -> None:
+        if not focused:
+            return
+
+        match event.key:
+            case Key.Up:
+                set_offset(offset + 1)
+            case Key.Down:
+                set_offset(max(0, offset - 1))
+            # counterweight doesn't parse PageUp/PageDown/Home yet, so they're Ctrl+Up/Ctrl+Down/g
+            case Key.ControlUp:
+                set_offset(offset + height)
+            case Key.ControlDown:
+                set_offset(max(0, offset - height))
+            case "g":
+                set_offset(len(buffer.current))
+            case Key.End | "G":
+                set_offset(0)
+            case "c" if pod_containers and container is not None:
+                set_container(
+                    pod_containers[(pod_containers.index(container) + 1) % len(pod_containers)]
+                )
+            case "t":
+                set_tail_lines(
+                    LOG_TAIL_LINES[(LOG_TAIL_LINES.index(tail_lines) + 1) % len(LOG_TAIL_LINES)]
+                )
+            case "s":
+                set_since_seconds(
+                    LOG_SINCE_SECONDS[
+                        (LOG_SINCE_SECONDS.index(since_seconds) + 1) % len(LOG_SINCE_SECONDS)
+                    ]
+                )
+            case "q":
+                close()
+
+    def line(text: str) -> Iterator[Chunk]:
+        # With timestamps=true, each line starts with its RFC 3339 timestamp and a space
+        timestamp, _, message = text.partition(" ")
+        yield Chunk(content=timestamp, style=CellStyle(foreground=gray_500))
+        yield Chunk(content=" " + message[: max(0, width - len(timestamp) - 1)])
+
+    title = " ".join(
+        (
+            f" Logs for {source.namespace}/{source.pod}",
+            f"[{container}]" if container is not None else "",
+            f"(tail {tail_lines}",
+            f"since {timedelta(seconds=since_seconds)})" if since_seconds else "since start)",
+            f"{offset} newer lines below" if offset else "",
+            "(ended)" if ended else f"({error})" if error else "",
+        )
+    )
+
+    return Div(
+        on_key=on_key,
+        style=col | border_lightrounded | pad_x_1 | align_self_stretch,
+        children=[
+            Text(
+                style=inset_top_center | absolute(y=-1),
+                content=" " + " ".join(title.split()) + " ",
+            ),
+            Text(
+                style=inset_bottom_center | absolute(y=1),
+                content=" c: container  t: tail  s: since  q: close ",
+            ),
+            Text(
+                style=weight_1,
+                content=list(
+                    chain.from_iterable(
+                        intersperse((Chunk.newline(),), (tuple(line(text)) for text in lines))
+                    )
+                ),
+            ),
+        ],
+    )
+
+
+def human_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+@component
+@timed
 def filter_pad(
     title: str,
     filter_text: str,
     set_filter_text: Setter[str],
-    options: set[str],
-    set_selected_option: Setter[str],
+    options: Typeahead,
+    set_selected_option: Callable[[str], None],
     focused: bool,
     set_focus: Setter[int],
     style: Style,
 ) -> Div:
     typeahead_idx, set_typeahead_idx = use_state(0)
+    fuzzy, set_fuzzy = use_state(False)
 
     b = border_lightrounded
 
-    typeahead = sorted(
-        (o for o in options if o.startswith(filter_text)),
-        key=lambda o: (len(o), o),
-    )[:15]
+    typeahead = (options.fuzzy if fuzzy else options.prefixed)(filter_text, 15)
     typeahead_idx = clamp(0, typeahead_idx, len(typeahead) - 1)
 
     def on_key(event: KeyPressed) -> None:
@@ -204,6 +692,10 @@ def filter_pad(
                 set_filter_text("")
                 set_typeahead_idx(0)
 
+            case Key.ControlF:
+                set_fuzzy(lambda f: not f)
+                set_typeahead_idx(0)
+
             case c if c.isprintable() and len(c) == 1 and c != ":" and c != "/":  # TODO: bleh
                 new_filter_text = filter_text + c
                 set_filter_text(new_filter_text)
@@ -216,19 +708,19 @@ def filter_pad(
                 if not is_valid:
                     set_typeahead_idx(clamp(0, typeahead_idx + 1, len(typeahead) - 1))
                 else:
-                    set_focus(2)
+                    set_focus(FOCUS_IDX["table"])
 
             case Key.Up:
                 if not is_valid:
                     set_typeahead_idx(clamp(0, typeahead_idx - 1, len(typeahead) - 1))
                 else:
-                    set_focus(2)
+                    set_focus(FOCUS_IDX["table"])
 
             case Key.Enter if typeahead_idx is not None and typeahead:
                 set_filter_text(typeahead[typeahead_idx])
                 set_selected_option(typeahead[typeahead_idx])
                 set_typeahead_idx(0)
-                set_focus(2)
+                set_focus(FOCUS_IDX["table"])
 
     is_valid = filter_text in options
 
@@ -273,7 +765,7 @@ def filter_pad(
                 | border_right
                 | pad_x_1
                 | (text_cyan_400 if focused else None),
-                content=title,
+                content=f"{title} ~" if fuzzy else title,
             ),
             Div(
                 style=row,
@@ -284,132 +776,568 @@ def filter_pad(
 
 
 @component
+@timed
+def selector_pad(
+    title: str,
+    selector: str,
+    set_selector: Setter[str],
+    focused: bool,
+    set_focus: Setter[int],
+    style: Style,
+) -> Div:
+    # Edits are only applied on Enter, so that we don't restart the watch on every keystroke
+    text, set_text = use_state(selector)
+
+    b = border_lightrounded
+
+    def on_key(event: KeyPressed) -> None:
+        if not focused:
+            return
+
+        match event.key:
+            case Key.Backspace:
+                set_text(text[:-1])
+
+            case Key.Delete:
+                set_text("")
+                set_selector("")
+
+            case Key.Enter:
+                set_selector(text.strip())
+                set_focus(FOCUS_IDX["table"])
+
+            case Key.Space:  # for set-based requirements, like "env in (prod, qa)"
+                set_text(text + " ")
+
+            case c if c.isprintable() and len(c) == 1:
+                set_text(text + c)
+
+    return Div(
+        on_key=on_key,
+        style=row | b | style,
+        children=[
+            Text(
+                style=weight_none
+                | b
+                | border_right
+                | pad_x_1
+                | (text_cyan_400 if focused else None),
+                content=title,
+            ),
+            Text(
+                style=weight_none | pad_x_1 | (text_gray_500 if text != selector else None),
+                content=text,
+            ),
+        ],
+    )
+
+
+@component
+@timed
 def resource_table(
-    names_to_resources: dict[str, Resource],
+    klient: Klient,
+    names_to_resources: Mapping[str, Resource],
     selected_resource: str,
     selected_namespace: str,
-    resources: dict[str, Any],
+    selectors: str,
+    owner: Owner | None,
+    owner_error: str | None,
+    resource_error: str | None,
+    show_owned: Callable[[Owner], None],
+    show_logs: Callable[[LogSource], None],
+    resources: Table,
     last_fetch: datetime | None,
     use_utc: bool,
     wide: bool,
     focused: bool,
+    set_capturing: Callable[[bool], None],
 ) -> Div:
     selected_resource_idx, set_selected_resource_idx = use_state(0)
-    selected_resource_idx = clamp(0, selected_resource_idx, len(resources["rows"]) - 1)
+
+    # Sorted by column name (and whether descending), so that sorting by a column that other
+    # resources also have (e.g., Age) carries over to them
+    no_sort: tuple[str, bool] | None = None
+    sort, set_sort = use_state(no_sort)
+    sort_column = next(
+        (
+            idx
+            for idx, c in enumerate(resources.columns)
+            if sort is not None and c["name"] == sort[0]
+        ),
+        None,
+    )
+    sorted_rows: Ref[SortedRows] = use_ref(lambda: SortedRows(column=-1))
+    rows: tuple[Row, ...] | SortedRows | list[Row]
+    if sort is None or sort_column is None:
+        rows = resources.rows
+    else:
+        if sorted_rows.current.column != sort_column:
+            sorted_rows.current = SortedRows(column=sort_column)
+        sorted_rows.current.descending = sort[1]
+        sorted_rows.current.update(resources)
+        rows = sorted_rows.current
+
+    # Searching narrows the table to the rows that have the query in their cells
+    query, set_query = use_state("")
+    editing_query, set_editing_query = use_state(False)
+    search: Ref[RowSearch] = use_ref(RowSearch)
+    if query:
+        rows = search.current.search(rows, (resources, sort), query)
+
+    selected_resource_idx = clamp(0, selected_resource_idx, len(rows) - 1)
+
+    objects: Ref[ObjectCache] = use_ref(ObjectCache)
+    no_error: str | None = None
+    error, set_error = use_state(no_error)
+
+    # Rows marked for bulk actions, by key, so that they stay marked as rows come and go
+    nothing_marked: frozenset[tuple[str, str]] = frozenset()
+    marked, set_marked = use_state(nothing_marked)
+    no_prompt: Prompt | None = None
+    prompt, set_prompt = use_state(no_prompt)
+    no_progress: Progress | None = None
+    progress, set_progress = use_state(no_progress)
+
+    async def clear_marks() -> None:
+        set_marked(frozenset())
+
+    use_effect(clear_marks, (klient, selected_resource, selected_namespace))
+
+    async def clear_search() -> None:
+        set_query("")
+
+    use_effect(clear_search, (klient, selected_resource, selected_namespace))
+
+    async def first_rows() -> None:
+        if resources.rows:
+            PROFILE.mark("first rows")
+
+    use_effect(first_rows, (bool(resources.rows),))
+
+    # Only the rows that fit in the table (as of the last render) are built,
+    # scrolling just far enough to keep the selected row in view.
+    rects = use_rects()
+    scroll = use_ref(0)
+    visible_rows = max(
+        1, (rects.content.height or shutil.get_terminal_size().lines) - 1
+    )  # -1 for the header
+    scroll.current = clamp(
+        selected_resource_idx - visible_rows + 1, scroll.current, selected_resource_idx
+    )
+    scroll.current = clamp(0, scroll.current, max(0, len(rows) - visible_rows))
+    window = [
+        rows[idx] for idx in range(scroll.current, min(len(rows), scroll.current + visible_rows))
+    ]
+
+    # The body only depends on these, so it isn't rebuilt when (e.g.) only the fetch timestamp changes
+    body_key = (
+        resources,
+        sort,
+        query,
+        scroll.current,
+        visible_rows,
+        selected_resource_idx,
+        marked,
+        focused,
+        wide,
+    )
+    body: Ref[tuple[tuple[object, ...], tuple[Text, ...]]] = use_ref(((), ()))
+    if body.current[0] != body_key:
+        body.current = (
+            body_key,
+            tuple(
+                Text(
+                    style=weight_none
+                    | Style(
+                        span=Span(
+                            width=max(
+                                len(col_def["name"]) + (2 if col_idx == sort_column else 0),
+                                resources.widths[col_idx],
+                            )
+                        )
+                    ),
+                    content=list(
+                        chain.from_iterable(
+                            intersperse(
+                                (Chunk.newline(),),
+                                (
+                                    (
+                                        Chunk(
+                                            content=col_def["name"].upper()
+                                            + (
+                                                (" ▼" if sort[1] else " ▲")
+                                                if sort is not None and col_idx == sort_column
+                                                else ""
+                                            ),
+                                            style=CellStyle(bold=True),
+                                        ),
+                                    ),
+                                    *(
+                                        cell_chunks(
+                                            r.cells[col_idx],
+                                            query,
+                                            style=(
+                                                CellStyle(
+                                                    foreground=cyan_500 if focused else cyan_700,
+                                                    bold=r.key in marked,
+                                                )
+                                                if row_idx == selected_resource_idx
+                                                else (
+                                                    CellStyle(foreground=amber_400, bold=True)
+                                                    if r.key in marked
+                                                    else CellStyle()
+                                                )
+                                            ),
+                                        )
+                                        for row_idx, r in enumerate(window, start=scroll.current)
+                                    ),
+                                ),
+                            )
+                        )
+                    ),
+                )
+                for col_idx, col_def in enumerate(resources.columns)
+                if wide or col_def["priority"] == 0
+            ),
+        )
+
+    async def fetch(
+        resource: Resource, namespace: str, name: str, resource_version: str
+    ) -> dict[str, Any]:
+        path = resource.instance_url(namespace, name)
+        key = (klient.context_name, path)
+
+        # Rows listed without their metadata don't know their resourceVersion,
+        # but if the object has been fetched before, its metadata alone is enough to tell
+        # whether that copy is still fresh, and is much smaller than the whole object.
+        if not resource_version and objects.current.cached_version(key) is not None:
+            async with await klient.request(
+                method="get", path=path, headers=METADATA_WATCH_HEADERS
+            ) as r:
+                if r.status == HTTPStatus.OK:
+                    resource_version = resource_version_of(await r.json())
+
+        if (obj := objects.current.get(key, resource_version)) is not None:
+            return obj
+
+        async with await klient.request(method="get", path=path) as r:
+            j: dict[str, Any] = await r.json()
+
+        if r.status == HTTPStatus.OK:
+            objects.current.put(key, j)
+
+        return j
+
+    def open_prompt(p: Prompt | None) -> None:
+        set_prompt(p)
+        set_capturing(p is not None)
+
+    def prompt_for(action: Literal["delete", "label", "annotate"]) -> Prompt:
+        """
+        Prompt for an action on the marked rows that are still in the table, or else on the selected row.
+        """
+        resource = names_to_resources[selected_resource]
+        targets = [
+            resources.rows[resources.positions[k]] for k in marked if k in resources.positions
+        ]
+        if not targets:
+            targets = [rows[selected_resource_idx]]
+
+        return Prompt(
+            action=action,
+            paths=tuple(
+                resource.instance_url(r.namespace or selected_namespace, r.name) for r in targets
+            ),
+            noun=resource.name if len(targets) > 1 else resource.singularName or resource.kind,
+        )
+
+    def start_bulk(
+        verb: str,
+        method: Literal["patch", "delete"],
+        paths: Sequence[str],
+        headers: dict[str, str] | None = None,
+        json: object | None = None,
+    ) -> None:
+        set_marked(frozenset())
+        klient.spawn(bulk(klient, method, paths, verb, set_progress, headers=headers, json=json))
+
+    def on_prompt_key(p: Prompt, key: str) -> None:
+        match key:
+            case Key.Escape:
+                open_prompt(None)
+
+            case "y" if p.action == "delete":
+                open_prompt(None)
+                start_bulk("Deleting", "delete", p.paths)
+
+            case _ if p.action == "delete":
+                open_prompt(None)
+
+            case Key.Enter:
+                try:
+                    changes = parse_assignments(p.text)
+                except ValueError as e:
+                    set_error(str(e))
+                    return
+
+                field = "labels" if p.action == "label" else "annotations"
+                open_prompt(None)
+                start_bulk(
+                    "Labeling" if p.action == "label" else "Annotating",
+                    "patch",
+                    p.paths,
+                    headers=MERGE_PATCH_HEADERS,
+                    json={"metadata": {field: changes}},
+                )
+
+            case Key.Backspace:
+                set_prompt(replace(p, text=p.text[:-1]))
+
+            case Key.Space:
+                set_prompt(replace(p, text=p.text + " "))
+
+            case c if c.isprintable() and len(c) == 1:
+                set_prompt(replace(p, text=p.text + c))
+
+    def mark(idx: int, toggle: bool = False) -> None:
+        k = rows[idx].key
+        set_marked(lambda m: m - {k} if toggle and k in m else m | {k})
+
+    def edit_query(editing: bool) -> None:
+        set_editing_query(editing)
+        set_capturing(editing)
+
+    def on_query_key(key: str) -> None:
+        match key:
+            case Key.Escape:
+                set_query("")
+                edit_query(False)
+
+            case Key.Enter:
+                edit_query(False)
+
+            case Key.Backspace:
+                set_query(lambda q: q[:-1])
+                set_selected_resource_idx(0)
+
+            case Key.Space:
+                set_query(lambda q: q + " ")
+                set_selected_resource_idx(0)
+
+            case c if c.isprintable() and len(c) == 1:
+                set_query(lambda q: q + c)
+                set_selected_resource_idx(0)
+
+    def sort_by(step: int) -> None:
+        """
+        Sort by the next (or previous) shown column, or unsort after the last (or before the first).
+        """
+        shown = [
+            None,
+            *(idx for idx, c in enumerate(resources.columns) if wide or c["priority"] == 0),
+        ]
+        idx = shown[
+            (shown.index(sort_column if sort_column in shown else None) + step) % len(shown)
+        ]
+        set_sort(None if idx is None else (resources.columns[idx]["name"], False))
+        set_selected_resource_idx(0)
 
     def on_key(event: KeyPressed) -> Suspend | None:
         if not focused:
             return None
 
+        set_error(None)
+
+        if prompt is not None:
+            on_prompt_key(prompt, event.key)
+            return None
+
+        if editing_query:
+            on_query_key(event.key)
+            return None
+
+        # Finished bulk actions stay on screen until the next key press
+        set_progress(lambda p: None if p is not None and p.done else p)
+
         match event.key:
             case Key.Down:
-                set_selected_resource_idx(
-                    clamp(0, selected_resource_idx + 1, len(resources["rows"]) - 1)
+                set_selected_resource_idx(clamp(0, selected_resource_idx + 1, len(rows) - 1))
+
+            # Space toggles a row's mark, shift+arrows mark a range, and a marks (or unmarks) every row
+            case Key.Space if rows:
+                mark(selected_resource_idx, toggle=True)
+                set_selected_resource_idx(clamp(0, selected_resource_idx + 1, len(rows) - 1))
+
+            case Key.ShiftDown | Key.ShiftUp as k if rows:
+                next_idx = clamp(
+                    0,
+                    selected_resource_idx + (1 if k == Key.ShiftDown else -1),
+                    len(rows) - 1,
                 )
+                mark(selected_resource_idx)
+                mark(next_idx)
+                set_selected_resource_idx(next_idx)
+
+            case "a":
+                shown = frozenset(r.key for r in rows) if query else frozenset(resources.positions)
+                set_marked(marked - shown if marked.issuperset(shown) else marked | shown)
+
+            # / starts a new search, which Enter finishes and Escape cancels
+            case "/":
+                set_query("")
+                set_selected_resource_idx(0)
+                edit_query(True)
+
+            # > and < sort by the next and previous columns, and r reverses the sort
+            case ">" if resources.columns:
+                sort_by(1)
+
+            case "<" if resources.columns:
+                sort_by(-1)
+
+            case "r" if sort is not None:
+                set_sort((sort[0], not sort[1]))
+                set_selected_resource_idx(0)
+
+            case "D" if rows:
+                open_prompt(prompt_for("delete"))
+
+            case "L" if rows:
+                open_prompt(prompt_for("label"))
+
+            case "A" if rows:
+                open_prompt(prompt_for("annotate"))
 
             case Key.Up:
+                set_selected_resource_idx(clamp(0, selected_resource_idx - 1, len(rows) - 1))
+
+            # counterweight doesn't parse PageUp/PageDown/Home yet, so they're Ctrl+Up/Ctrl+Down/g
+            case Key.ControlDown:
+                set_selected_resource_idx(
+                    clamp(0, selected_resource_idx + visible_rows, len(rows) - 1)
+                )
+
+            case Key.ControlUp:
                 set_selected_resource_idx(
-                    clamp(0, selected_resource_idx - 1, len(resources["rows"]) - 1)
+                    clamp(0, selected_resource_idx - visible_rows, len(rows) - 1)
                 )
 
-            case "y" | Key.ControlY | "j" as k:
+            case "g":
+                set_selected_resource_idx(0)
+
+            case Key.End | "G":
+                set_selected_resource_idx(max(0, len(rows) - 1))
+
+            case "l" if rows and names_to_resources[selected_resource].is_pods:
+                row = rows[selected_resource_idx]
+                show_logs(LogSource(namespace=row.namespace or selected_namespace, pod=row.name))
+
+            case "o" if rows:
+                resource = names_to_resources[selected_resource]
+                row = rows[selected_resource_idx]
+                show_owned(
+                    Owner(
+                        resource=resource,
+                        namespace=row.namespace
+                        or (selected_namespace if resource.namespaced else ""),
+                        name=row.name,
+                    )
+                )
+
+            case "y" | Key.ControlY | "j" as k if rows:
 
                 async def handler() -> None:
                     resource = names_to_resources[selected_resource]
-                    metadata = resources["rows"][selected_resource_idx]["object"]["metadata"]
-                    name = metadata["name"]
-                    namespace = metadata["namespace"]
+                    row = rows[selected_resource_idx]
+                    name = row.name
+                    namespace = row.namespace or selected_namespace
 
-                    async with Klient(Konfig.build()) as klient:
-                        async with await klient.request(
-                            method="get",
-                            path=resource.instance_url(namespace, name),
-                        ) as r:
-                            j = await r.json()
+                    j = await fetch(resource, namespace, name, row.resource_version)
 
                     if k not in (Key.ControlY, "j"):
-                        j["metadata"].pop("managedFields", None)
+                        j = without_managed_fields(j)
+
+                    with pager() as stdin:
+                        if k == "j":
+                            stdin.write(dump_json(j))
+                        else:
+                            with TextIOWrapper(stdin, encoding="utf-8") as text:
+                                dump_yaml(j, text)
+
+                return Suspend(handler=handler)
 
-                    mode = "yaml" if k in ("y", Key.ControlY) else "json"
+            case "e" if rows:
+
+                async def handler() -> None:
+                    resource = names_to_resources[selected_resource]
+                    row = rows[selected_resource_idx]
+                    name = row.name
+                    namespace = row.namespace or selected_namespace
+
+                    j = await fetch(resource, namespace, name, row.resource_version)
+
+                    j = without_managed_fields(j)
 
                     with tempfile.NamedTemporaryFile(
-                        mode="w",
+                        mode="w+",
                         prefix=f"{namespace}.{name}.",
-                        suffix=f".{mode}",
+                        suffix=".yaml",
                         encoding="utf-8",
                     ) as f:
-                        f.write(
-                            yaml.safe_dump(j, default_flow_style=False, sort_keys=False, indent=2)
-                            if mode == "yaml"
-                            else json.dumps(j, indent=2)
-                        )
+                        dump_yaml(j, f)
                         f.flush()
 
                         subprocess.run(
-                            (*shlex.split(os.getenv("PAGER", "less")), f.name),
+                            (*shlex.split(os.getenv("EDITOR", "vim")), f.name),
                             stdin=sys.stdin,
                             stdout=sys.stdout,
                             stderr=sys.stderr,
                             check=False,
                         )
 
-                return Suspend(handler=handler)
-
-            case "e":
-
-                async def handler() -> None:
-                    resource = names_to_resources[selected_resource]
-                    metadata = resources["rows"][selected_resource_idx]["object"]["metadata"]
-                    name = metadata["name"]
-                    namespace = metadata["namespace"]
-
-                    async with Klient(Konfig.build()) as klient:
-                        async with await klient.request(
-                            method="get",
-                            path=resource.instance_url(namespace, name),
-                        ) as r:
-                            j = await r.json()
-
-                        j["metadata"].pop("managedFields", None)
-
-                        with tempfile.NamedTemporaryFile(
-                            mode="w+",
-                            prefix=f"{namespace}.{name}.",
-                            suffix=".yaml",
-                            encoding="utf-8",
-                        ) as f:
-                            f.write(
-                                yaml.safe_dump(
-                                    j, default_flow_style=False, sort_keys=False, indent=2
-                                )
-                            )
-                            f.flush()
-
-                            subprocess.run(
-                                (*shlex.split(os.getenv("EDITOR", "vim")), f.name),
-                                stdin=sys.stdin,
-                                stdout=sys.stdout,
-                                stderr=sys.stderr,
-                                check=False,
-                            )
+                        f.seek(0)
+                        try:
+                            y = load_yaml(f.read())
+                        except YAMLError as e:
+                            set_error(f"Invalid YAML, not saved: {' '.join(str(e).split())}")
+                            return
 
-                            f.seek(0)
-                            y = yaml.safe_load(f.read())
+                    if not isinstance(y, dict):
+                        set_error("Invalid object, not saved")
+                        return
 
-                        if y == j:
-                            return
+                    path = resource.instance_url(namespace, name)
+                    try:
+                        updated = await apply_edit(klient, path, j, y)
+                    except PatchFailed as e:
+                        set_error(f"Failed to save {name}: {e}")
+                        return
 
-                        async with await klient.request(
-                            method="put",
-                            path=resource.instance_url(namespace, name),
-                            json=y,
-                        ) as r:
-                            logger.debug("put", s=r.status, t=await r.text())
+                    if updated is not None:
+                        objects.current.put((klient.context_name, path), updated)
 
                 return Suspend(handler=handler)
 
         return None
 
+    if error is not None:
+        footer, footer_style = error, text_red_500
+    elif prompt is not None:
+        footer, footer_style = str(prompt), text_amber_400
+    elif editing_query:
+        footer, footer_style = f"/{query}_", text_amber_400
+    elif progress is not None:
+        footer, footer_style = str(progress), text_amber_400
+    elif resource_error is not None:
+        footer, footer_style = resource_error, text_red_500
+    elif owner_error is not None:
+        footer, footer_style = owner_error, text_red_500
+    elif last_fetch is not None:
+        footer = f"{last_fetch if use_utc else last_fetch.astimezone():%Y-%m-%d %H:%M:%S %z}"
+        footer_style = Style()
+    else:
+        footer, footer_style = "Waiting for first fetch ...", Style()
+
     return Div(
         on_key=on_key,
         style=row | border_lightrounded | pad_x_1 | gap_children_2 | align_self_stretch,
@@ -418,50 +1346,81 @@ def resource_table(
                 style=inset_top_center | absolute(y=-1),
                 content=(
                     (
-                        f" {names_to_resources[selected_resource].kind} in {selected_namespace} "
-                        if names_to_resources[selected_resource].namespaced
-                        else f" {names_to_resources[selected_resource].kind} "
+                        f" {names_to_resources[selected_resource].kind}"
+                        + (
+                            (
+                                " in all namespaces"
+                                if selected_namespace == ALL_NAMESPACES
+                                else f" in {selected_namespace}"
+                            )
+                            if names_to_resources[selected_resource].namespaced
+                            else ""
+                        )
+                        + (f" matching {selectors}" if selectors else "")
+                        + (
+                            f" owned by {owner.resource.kind}/{owner.name}"
+                            if owner is not None
+                            else ""
+                        )
+                        + (f' ({len(rows)} found for "{query}")' if query else "")
+                        + (f" ({len(marked)} marked)" if marked else "")
+                        + " "
                     )
-                    if selected_resource
+                    # The selected resource isn't known until the context is (re)discovered
+                    if selected_resource in names_to_resources
                     else ""
                 ),
             ),
             Text(
-                style=inset_bottom_center | absolute(y=1),
-                content=(
-                    f" {last_fetch if use_utc else last_fetch.astimezone():%Y-%m-%d %H:%M:%S %z} "
-                    if last_fetch is not None
-                    else " Waiting for first fetch ... "
-                ),
-            ),
-            *(
-                Text(
-                    style=weight_none,
-                    content=list(
-                        intersperse(
-                            Chunk.newline(),
-                            (
-                                Chunk(
-                                    content=col_def["name"].upper(),
-                                    style=CellStyle(bold=True),
-                                ),
-                                *(
-                                    Chunk(
-                                        content=str(r["cells"][col_idx]),
-                                        style=(
-                                            CellStyle(foreground=cyan_500 if focused else cyan_700)
-                                            if row_idx == selected_resource_idx
-                                            else CellStyle()
-                                        ),
-                                    )
-                                    for row_idx, r in enumerate(resources["rows"])
-                                ),
-                            ),
-                        )
-                    ),
-                )
-                for col_idx, col_def in enumerate(resources["columnDefinitions"])
-                if wide or col_def["priority"] == 0
+                style=inset_bottom_center | absolute(y=1) | footer_style,
+                content=f" {footer} ",
             ),
+            *body.current[1],
         ],
     )
+
+
+@contextmanager
+def pager() -> Iterator[IO[bytes]]:
+    """
+    Run the user's pager, yielding its stdin to write into,
+    so that it can start showing the beginning of a large object while the rest is still being written.
+    """
+    p = subprocess.Popen(
+        shlex.split(os.getenv("PAGER", "less")),
+        stdin=subprocess.PIPE,
+        stdout=sys.stdout,
+        stderr=sys.stderr,
+    )
+    assert p.stdin is not None
+
+    try:
+        yield p.stdin
+    except BrokenPipeError:  # the pager was quit before it read everything
+        pass
+    finally:
+        # Whatever went wrong while writing, the pager only exits once its stdin is closed
+        with suppress(BrokenPipeError):
+            p.stdin.close()
+        p.wait()
+
+
+def cell_chunks(cell: str, query: str, style: CellStyle) -> tuple[Chunk, ...]:
+    """
+    A cell's text, with whatever matches the search query highlighted.
+    """
+    if not query:
+        return (Chunk(content=cell, style=style),)
+
+    return tuple(
+        Chunk(content=part, style=style | SEARCH_HIGHLIGHT if match else style)
+        for part, match in highlights(cell, query)
+    )
+
+
+def without_managed_fields(obj: dict[str, Any]) -> dict[str, Any]:
+    # Copies instead of popping, since the object may be shared (e.g., by an Informer's Store)
+    return {
+        **obj,
+        "metadata": {k: v for k, v in obj["metadata"].items() if k != "managedFields"},
+    }
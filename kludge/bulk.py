@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from asyncio import gather, sleep
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass, replace
+from http import HTTPStatus
+from time import monotonic
+from typing import Literal
+
+from aiohttp import ClientError
+from structlog import get_logger
+
+from kludge.klient import Klient, response_error
+
+logger = get_logger()
+
+BULK_CONCURRENCY = 8
+THROTTLE_RETRIES = 5
+DEFAULT_RETRY_AFTER = 1  # seconds, if a 429 doesn't say how long to wait
+MAX_RETRY_AFTER = 60
+
+
+@dataclass(frozen=True, slots=True)
+class Progress:
+    verb: str  # e.g., "Deleting"
+    total: int
+    succeeded: int = 0
+    failed: int = 0
+    errors: tuple[str, ...] = ()
+
+    @property
+    def done(self) -> bool:
+        return self.succeeded + self.failed >= self.total
+
+    def advance(self, error: str | None) -> Progress:
+        if error is None:
+            return replace(self, succeeded=self.succeeded + 1)
+
+        return replace(self, failed=self.failed + 1, errors=(*self.errors, error))
+
+    def __str__(self) -> str:
+        s = f"{self.verb} {self.succeeded + self.failed}/{self.total}"
+        if self.failed:
+            s += f", {self.failed} failed ({self.errors[0]})"
+        return s
+
+
+@dataclass(slots=True)
+class Throttle:
+    """
+    Shared by all of a bulk action's workers,
+    so that when the API server asks one of them to back off, they all do.
+    """
+
+    not_before: float = 0
+
+    async def wait(self) -> None:
+        if (delay := self.not_before - monotonic()) > 0:
+            await sleep(delay)
+
+    def back_off(self, seconds: float) -> None:
+        self.not_before = max(self.not_before, monotonic() + seconds)
+
+
+def retry_after(headers: Mapping[str, str]) -> float:
+    # The API server always sends a number of seconds, never an HTTP date
+    try:
+        seconds = float(headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+    except ValueError:
+        seconds = DEFAULT_RETRY_AFTER
+
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+
+def parse_assignments(text: str) -> dict[str, str | None]:
+    """
+    Parse kubectl-style label or annotation changes, like `app=web tier-`,
+    into a merge patch for them (where `None` removes the key).
+    """
+    changes: dict[str, str | None] = {}
+    for token in text.split():
+        if token.endswith("-") and "=" not in token:
+            changes[token[:-1]] = None
+        elif "=" in token and not token.startswith("="):
+            key, value = token.split("=", 1)
+            changes[key] = value
+        else:
+            raise ValueError(f"Expected key=value or key-, not {token!r}")
+
+    if not changes:
+        raise ValueError("Expected key=value or key-")
+
+    return changes
+
+
+async def bulk(
+    klient: Klient,
+    method: Literal["patch", "delete"],
+    paths: Sequence[str],
+    verb: str,
+    on_progress: Callable[[Progress], None],
+    headers: dict[str, str] | None = None,
+    json: object | None = None,
+    concurrency: int = BULK_CONCURRENCY,
+) -> Progress:
+    """
+    Make the same request to each of the `paths`, at most `concurrency` at a time,
+    calling `on_progress` after each one finishes.
+
+    Requests that are rate-limited are retried after the API server's Retry-After,
+    and every other request waits for it too.
+    Requests that fail to connect (or time out) count as failed, like any other error.
+    """
+    todo = iter(paths)
+    progress = Progress(verb=verb, total=len(paths))
+    throttle = Throttle()
+
+    on_progress(progress)
+
+    async def one(path: str) -> str | None:
+        name = path.rsplit("/", 1)[-1]
+
+        for _ in range(THROTTLE_RETRIES + 1):
+            await throttle.wait()
+
+            try:
+                async with await klient.request(
+                    method=method, path=path, headers=headers, json=json
+                ) as r:
+                    if r.status == HTTPStatus.TOO_MANY_REQUESTS:
+                        seconds = retry_after(r.headers)
+                        logger.debug("throttled", path=path, retry_after=seconds)
+                        throttle.back_off(seconds)
+                        continue
+                    elif r.status < 300 or (
+                        method == "delete" and r.status == HTTPStatus.NOT_FOUND
+                    ):
+                        return None
+
+                    return f"{name}: {await response_error(r)}"
+            except (ClientError, TimeoutError) as e:
+                logger.warning("request failed", method=method, path=path, error=repr(e))
+                return f"{name}: {str(e) or type(e).__name__}"
+
+        return f"{name}: {HTTPStatus.TOO_MANY_REQUESTS.phrase}"
+
+    async def worker() -> None:
+        nonlocal progress
+
+        # The workers share the iterator, so each path is only taken by one of them
+        for path in todo:
+            error = await one(path)
+            progress = progress.advance(error)  # only after the await, so no update is lost
+            on_progress(progress)
+
+    await gather(*(worker() for _ in range(min(concurrency, len(paths)))))
+
+    return progress
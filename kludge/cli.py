@@ -1,15 +1,21 @@
-from asyncio import run
+from kludge.startup import PROFILE  # isort: skip # first, so that it can time the other imports
+
+import sys
+from enum import Enum
 from textwrap import dedent
+from typing import Optional
 
-from counterweight.app import app
-from typer import Typer
+from typer import Argument, Context, Exit, Option, Typer, echo
 
-from kludge.app import root
 from kludge.constants import PACKAGE_NAME
 
+PROFILE.mark("import cli")
+
+# The heavy modules (the TUI, aiohttp, pydantic, yaml, structlog, ...) are imported by the commands
+# that need them, so that (e.g.) --help doesn't wait for them.
+
 cli = Typer(
     name=PACKAGE_NAME,
-    no_args_is_help=True,
     rich_markup_mode="rich",
     help=dedent(
         """\
@@ -18,9 +24,134 @@ cli = Typer(
 )
 
 
-@cli.command()
-def kludge() -> None:
+class OutputFormat(str, Enum):
+    table = "table"
+    wide = "wide"
+    ndjson = "ndjson"
+
+
+# Without a command, kludge starts the TUI
+@cli.callback(invoke_without_command=True)
+def kludge(
+    ctx: Context,
+    profile_startup: bool = Option(
+        False,
+        "--profile-startup",
+        help="On exit, report how long each phase of startup took, up to the first rows shown.",
+    ),
+) -> None:
+    if ctx.invoked_subcommand is not None:
+        return
+
+    from asyncio import run
+    from functools import partial
+
+    from counterweight.app import app
+
+    from kludge.app import root
+    from kludge.klient import Klients
+    from kludge.konfig import Konfig
+    from kludge.stats import STATS
+
+    PROFILE.mark("import app")
+
     async def _() -> None:
-        await app(root)
+        async with Klients(Konfig.build()) as klients:
+            PROFILE.mark("load kubeconfig")
+            klients.hooks.append(STATS.record_request)
+            await app(partial(root, klients=klients))
+
+    try:
+        run(_())
+    finally:
+        if profile_startup:
+            echo(PROFILE.report(), err=True)
+
+
+@cli.command(name="get")
+def get_command(
+    resource: str = Argument(..., help="The resource to get, like pods, pod, or po."),
+    namespace: Optional[str] = Option(
+        None, "--namespace", "-n", help="Defaults to the context's namespace."
+    ),
+    all_namespaces: bool = Option(False, "--all-namespaces", "-A"),
+    selector: str = Option("", "--selector", "-l", help="A label selector."),
+    field_selector: str = Option("", "--field-selector"),
+    output: OutputFormat = Option(OutputFormat.table, "--output", "-o"),
+    watch: bool = Option(False, "--watch", "-w", help="After listing, keep writing changes."),
+    watch_events: bool = Option(
+        False,
+        "--output-watch-events",
+        help="With -o ndjson, write watch events (with listed objects as ADDED events).",
+    ),
+    context: Optional[str] = Option(None, "--context"),
+) -> None:
+    """
+    Write resources to stdout as they are listed (and watched),
+    without holding onto them, for scripting.
+    """
+    import logging
+    import os
+    from asyncio import run
+
+    from aiohttp import ClientError
+    from structlog import PrintLoggerFactory, configure, make_filtering_bound_logger
+
+    from kludge.constants import DEFAULT_NAMESPACE
+    from kludge.diskovery import ALL_NAMESPACES, DiscoveryFailed, discover_resources
+    from kludge.get import GetFailed, find_resource, get
+    from kludge.kache import read_discovery, write_discovery
+    from kludge.klient import Klient
+    from kludge.konfig import Konfig, KonfigFailed
+
+    # stdout is for the output alone, so log (only what matters) to stderr
+    configure(
+        logger_factory=PrintLoggerFactory(sys.stderr),
+        wrapper_class=make_filtering_bound_logger(logging.WARNING),
+    )
+
+    async def _() -> None:
+        async with Klient(Konfig.build(), context=context) as klient:
+            # The cached discovery is good enough if it knows the resource, like kubectl's
+            discovery = read_discovery(klient.server)
+            r = find_resource(discovery, resource) if discovery is not None else None
+            if r is None:
+                discovery = await discover_resources(klient, cached=discovery)
+                write_discovery(klient.server, discovery)
+                r = find_resource(discovery, resource)
+
+            if r is None:
+                echo(f"Unknown resource: {resource}", err=True)
+                raise Exit(1)
+
+            await get(
+                klient,
+                resource=r,
+                namespace=(
+                    ALL_NAMESPACES
+                    if all_namespaces
+                    else namespace or klient.context.namespace or DEFAULT_NAMESPACE
+                ),
+                out=sys.stdout.buffer,
+                output=output.value,
+                watch=watch,
+                watch_events=watch_events,
+                label_selector=selector,
+                field_selector=field_selector,
+            )
 
-    run(_())
+    try:
+        run(_())
+    except (GetFailed, DiscoveryFailed, KonfigFailed) as e:
+        echo(f"Error: {e}", err=True)
+        raise Exit(1)
+    except (ClientError, TimeoutError) as e:
+        # e.g., discovery couldn't reach the API server
+        echo(f"Error: {str(e) or type(e).__name__}", err=True)
+        raise Exit(1)
+    except BrokenPipeError:
+        # Whatever we were writing to (e.g., head) has stopped reading, which is fine,
+        # but don't let Python complain about it when it flushes stdout on the way out.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    except KeyboardInterrupt:
+        raise Exit(130)
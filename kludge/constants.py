@@ -1,4 +1,13 @@
-from importlib import metadata
-
 PACKAGE_NAME = "kludge"
-__version__ = metadata.version(PACKAGE_NAME)
+
+DEFAULT_NAMESPACE = "default"
+
+
+def __getattr__(name: str) -> str:
+    # Looking up the version reads the package metadata, which is slow, so only do it if asked
+    if name == "__version__":
+        from importlib import metadata
+
+        return metadata.version(PACKAGE_NAME)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,10 +1,18 @@
 from __future__ import annotations
 
-from typing import ClassVar, Literal
+from asyncio import Semaphore, gather
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from itertools import chain
+from types import MappingProxyType
+from typing import Any, Literal
 
-from pydantic import BaseModel, ConfigDict
+from structlog import get_logger
 
-from kludge.klient import Klient
+from kludge.klient import Klient, response_error
+
+logger = get_logger()
 
 Verb = Literal[
     "create",
@@ -18,25 +26,80 @@ Verb = Literal[
 ]
 
 
-class Resource(BaseModel):
+# Not a valid namespace name, so it can't collide with a real namespace
+ALL_NAMESPACES = "*"
+
+
+class DiscoveryFailed(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Resource:
     core: bool
     groupVersion: str
     name: str
     kind: str
     singularName: str
     namespaced: bool
-    shortNames: tuple[str, ...] = ()
     verbs: tuple[Verb, ...]
+    shortNames: tuple[str, ...] = ()
+
+    # Computed once, rather than on every lookup
+    qualified_names: tuple[str, ...] = field(init=False, repr=False, compare=False)
+    names: tuple[str, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Unique across the API server, unlike the other names, which groups can share
+        qualified = (
+            (self.name,)
+            if self.core
+            else (f"{self.groupVersion}/{self.name}", f"{self.name}.{self.group}")
+        )
+        others = (self.name, self.singularName, *self.shortNames)
+
+        object.__setattr__(self, "qualified_names", qualified)
+        object.__setattr__(
+            self, "names", tuple(dict.fromkeys(n for n in (*qualified, *others) if n))
+        )
+
+    @classmethod
+    def from_json(cls, j: dict[str, Any]) -> Resource:
+        return cls(
+            core=bool(j["core"]),
+            groupVersion=str(j["groupVersion"]),
+            name=str(j["name"]),
+            kind=str(j.get("kind", "")),
+            singularName=str(j.get("singularName", "")),
+            namespaced=bool(j["namespaced"]),
+            verbs=tuple(j.get("verbs", ())),
+            shortNames=tuple(j.get("shortNames", ())),
+        )
 
-    model_config: ClassVar[ConfigDict] = {
-        "frozen": True,
-        "extra": "ignore",
-    }
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "core": self.core,
+            "groupVersion": self.groupVersion,
+            "name": self.name,
+            "kind": self.kind,
+            "singularName": self.singularName,
+            "namespaced": self.namespaced,
+            "verbs": list(self.verbs),
+            "shortNames": list(self.shortNames),
+        }
+
+    @property
+    def group(self) -> str:
+        return "" if self.core else self.groupVersion.split("/", 1)[0]
 
     def collection_url(self, namespace: str) -> str:
+        """
+        The path of the collection in `namespace`,
+        or across all namespaces if `namespace` is `ALL_NAMESPACES`.
+        """
         parts = ["api" if self.core else "apis", self.groupVersion]
 
-        if self.namespaced:
+        if self.namespaced and namespace != ALL_NAMESPACES:
             parts.append("namespaces")
             parts.append(namespace)
 
@@ -48,54 +111,205 @@ class Resource(BaseModel):
         return "/".join((self.collection_url(namespace), name))
 
     @property
-    def names(self) -> set[str]:
-        return {
-            f"{self.groupVersion}/{self.name}" if not self.core else self.name,
-            self.singularName,
-            *self.shortNames,
-        } - {""}
+    def is_pods(self) -> bool:
+        return self.core and self.name == "pods"
 
 
-async def discover_resources(klient: Klient) -> tuple[Resource, ...]:
-    resources = []
+AGGREGATED_DISCOVERY_HEADERS = {
+    # https://kubernetes.io/docs/concepts/overview/kubernetes-api/#aggregated-discovery
+    # Servers that don't support aggregated discovery ignore the first two and send the legacy documents.
+    "Accept": ",".join(
+        (
+            "application/json;g=apidiscovery.k8s.io;v=v2;as=APIGroupDiscoveryList",
+            "application/json;g=apidiscovery.k8s.io;v=v2beta1;as=APIGroupDiscoveryList",
+            "application/json",
+        )
+    ),
+}
 
-    # TODO: do all of these concurrently, or use more efficient discovery method
+DISCOVERY_CONCURRENCY = 16
 
-    # Core API
-    async with await klient.request(method="get", path="/api") as response:
-        j = await response.json()
 
-    for version in j["versions"]:
-        async with await klient.request(method="get", path=f"/api/{version}") as response:
-            j = await response.json()
+@dataclass(frozen=True, slots=True)
+class Discovery:
+    resources: tuple[Resource, ...] = ()
+    etags: dict[str, str] = field(default_factory=dict)
 
-        for resource in j["resources"]:
-            if "/" in resource["name"]:
-                continue  # TODO: handle subresources
+    # Every name of every resource that can be listed, mapped to that resource
+    index: Mapping[str, Resource] = field(init=False, repr=False, compare=False)
 
-            resources.append(
-                Resource.model_validate(resource | {"core": True, "groupVersion": version})
-            )
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "index", _index(self.resources))
+
+    @classmethod
+    def from_json(cls, j: dict[str, Any]) -> Discovery:
+        return cls(
+            resources=tuple(Resource.from_json(r) for r in j["resources"]),
+            etags={str(k): str(v) for k, v in j.get("etags", {}).items()},
+        )
+
+    def to_json(self) -> dict[str, Any]:
+        return {"resources": [r.to_json() for r in self.resources], "etags": self.etags}
+
+
+def _index(resources: Iterable[Resource]) -> Mapping[str, Resource]:
+    """
+    Fully-qualified names always map to their own resource.
+    Other names can be shared by resources in different groups (e.g., core and events.k8s.io
+    both have "events"), so each goes to the most preferred group that has it:
+    core first, then the groups in the order the API server lists them, which is by priority.
+    A plural name beats a singular name, which beats a short name.
+    """
+    listable = tuple(r for r in resources if "list" in r.verbs)
+
+    index = {n: r for r in listable for n in r.qualified_names}
+    for unqualified in (
+        lambda r: (r.name,),
+        lambda r: (r.singularName,),
+        lambda r: r.shortNames,
+    ):
+        for r in listable:
+            for n in unqualified(r):
+                if n:
+                    index.setdefault(n, r)
+
+    return MappingProxyType(index)
 
-    # Everything else
-    async with await klient.request(method="get", path="/apis") as response:
-        j = await response.json()
 
-    for group in j["groups"]:
-        v = group["preferredVersion"]
+async def discover_resources(klient: Klient, cached: Discovery | None = None) -> Discovery:
+    """
+    Discover the resources the API server serves.
 
-        async with await klient.request(
-            method="get", path=f"/apis/{v['groupVersion']}"
-        ) as response:
-            j = await response.json()
-            for resource in j["resources"]:
-                if "/" in resource["name"]:
-                    continue  # TODO: handle subresources
+    If a `cached` Discovery is given, the aggregated discovery documents are revalidated
+    against its ETags, and the `cached` Discovery itself is returned if nothing changed.
+    """
+    etags = cached.etags if cached is not None else {}
 
-                resources.append(
-                    Resource.model_validate(
-                        resource | {"core": False, "groupVersion": v["groupVersion"]}
+    async def get(path: str) -> tuple[dict[str, Any] | None, str | None]:
+        headers = AGGREGATED_DISCOVERY_HEADERS
+        if path in etags:
+            headers = headers | {"If-None-Match": etags[path]}
+
+        async with await klient.request(method="get", path=path, headers=headers) as response:
+            if response.status == HTTPStatus.NOT_MODIFIED:
+                return None, etags[path]
+            elif response.status != HTTPStatus.OK:
+                raise DiscoveryFailed(await response_error(response))
+
+            j: dict[str, Any] = await response.json()
+
+            # Only the aggregated documents describe resources, so only their ETags are useful
+            return j, response.headers.get("ETag") if _is_aggregated(j) else None
+
+    (core, core_etag), (groups, groups_etag) = await gather(get("/api"), get("/apis"))
+
+    if cached is not None and core is None and groups is None:
+        return cached
+
+    if (core is None or _is_aggregated(core)) and (groups is None or _is_aggregated(groups)):
+        # A document that wasn't modified can only have come from a cached aggregated discovery,
+        # so we can reuse its half of the cached resources.
+        cached_resources = cached.resources if cached is not None else ()
+        discovery = Discovery(
+            resources=(
+                *(
+                    _aggregated_resources(core, core=True)
+                    if core is not None
+                    else (r for r in cached_resources if r.core)
+                ),
+                *(
+                    _aggregated_resources(groups, core=False)
+                    if groups is not None
+                    else (r for r in cached_resources if not r.core)
+                ),
+            ),
+            etags={
+                path: etag
+                for path, etag in (("/api", core_etag), ("/apis", groups_etag))
+                if etag is not None
+            },
+        )
+    elif core is not None and groups is not None:
+        discovery = Discovery(
+            resources=await _discover_resources_per_group(klient, core=core, groups=groups)
+        )
+    else:
+        # One document is unchanged, but the other is no longer aggregated, so start over without the cache
+        return await discover_resources(klient)
+
+    return cached if discovery == cached else discovery
+
+
+def _is_aggregated(j: dict[str, Any]) -> bool:
+    return j.get("kind") == "APIGroupDiscoveryList"
+
+
+def _aggregated_resources(j: dict[str, Any], core: bool) -> Iterator[Resource]:
+    for group in j["items"]:
+        if not group.get("versions"):
+            continue
+
+        v = group["versions"][0]  # versions are listed in order of preference
+        group_version = v["version"] if core else f"{group['metadata']['name']}/{v['version']}"
+
+        for resource in v.get("resources", ()):
+            yield Resource(
+                core=core,
+                groupVersion=group_version,
+                name=resource["resource"],
+                kind=resource.get("responseKind", {}).get("kind", ""),
+                singularName=resource.get("singularResource", ""),
+                namespaced=resource.get("scope") == "Namespaced",
+                shortNames=tuple(resource.get("shortNames", ())),
+                verbs=tuple(resource.get("verbs", ())),
+            )
+
+
+async def _discover_resources_per_group(
+    klient: Klient,
+    core: dict[str, Any],
+    groups: dict[str, Any],
+) -> tuple[Resource, ...]:
+    semaphore = Semaphore(DISCOVERY_CONCURRENCY)
+
+    async def get_resources(group_version: str, is_core: bool) -> list[Resource]:
+        async with semaphore:
+            async with await klient.request(
+                method="get", path=f"/{'api' if is_core else 'apis'}/{group_version}"
+            ) as response:
+                # An unavailable group (e.g., an aggregated API server that is down)
+                # shouldn't hide every other group's resources
+                if response.status != HTTPStatus.OK:
+                    logger.warning(
+                        "group discovery failed",
+                        group_version=group_version,
+                        error=await response_error(response),
                     )
-                )
+                    return []
+
+                j = await response.json()
+
+        return [
+            Resource(
+                core=is_core,
+                groupVersion=group_version,
+                name=resource["name"],
+                kind=resource.get("kind", ""),
+                singularName=resource.get("singularName", ""),
+                namespaced=resource.get("namespaced", False),
+                shortNames=tuple(resource.get("shortNames", ())),
+                verbs=tuple(resource.get("verbs", ())),
+            )
+            for resource in j["resources"]
+            if "/" not in resource["name"]  # TODO: handle subresources
+        ]
+
+    discovered = await gather(
+        *(get_resources(version, is_core=True) for version in core["versions"]),
+        *(
+            get_resources(group["preferredVersion"]["groupVersion"], is_core=False)
+            for group in groups["groups"]
+        ),
+    )
 
-    return tuple(resources)
+    return tuple(chain.from_iterable(discovered))
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+from typing import IO, Any
+
+import yaml
+
+# libyaml's C implementations are many times faster than the pure-Python ones,
+# but they're only available if PyYAML was built against it.
+try:
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeDumper, SafeLoader
+
+
+def dump_yaml(obj: Any, stream: IO[str] | None = None) -> str | None:
+    """
+    Dump `obj` as block-style YAML, in its original key order,
+    writing it to `stream` as it is emitted if one is given, or else returning it.
+    """
+    dumped: str | None = yaml.dump(
+        obj,
+        stream,
+        Dumper=SafeDumper,
+        default_flow_style=False,
+        sort_keys=False,
+        indent=2,
+        allow_unicode=True,
+    )
+    return dumped
+
+
+def load_yaml(text: str) -> Any:
+    return yaml.load(text, Loader=SafeLoader)
+
+
+# orjson is optional, but encodes several times faster than the standard library
+try:
+    import orjson
+
+    def dump_json(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    def dump_json_line(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+
+except ImportError:  # pragma: no cover
+
+    def dump_json(obj: Any) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+    def dump_json_line(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+from asyncio import sleep
+from collections.abc import Mapping
+from http import HTTPStatus
+from typing import IO, Any, Literal
+
+from aiohttp import ClientError, ClientTimeout
+from structlog import get_logger
+
+from kludge.diskovery import ALL_NAMESPACES, Discovery, Resource
+from kludge.formats import dump_json_line
+from kludge.klient import Klient, read_events, resource_version_of, response_error
+from kludge.watch import (
+    ALL_NAMESPACES_TABLE_PARAMS,
+    INITIAL_BACKOFF,
+    LIST_PAGE_SIZE,
+    MAX_BACKOFF,
+    TABLE_HEADERS,
+    TABLE_PARAMS,
+    WATCH_TIMEOUT_SECONDS,
+    Table,
+)
+
+logger = get_logger()
+
+Output = Literal["table", "wide", "ndjson"]
+
+COLUMN_GAP = "   "  # same as kubectl
+
+
+class GetFailed(Exception):
+    pass
+
+
+def find_resource(discovery: Discovery, name: str) -> Resource | None:
+    """
+    The resource with the given name, like the TUI accepts:
+    a plural, singular, short, or fully-qualified (e.g., `deployments.apps`) name.
+    """
+    return discovery.index.get(name)
+
+
+class TableWriter:
+    """
+    Writes rows as plain, aligned text, a page (or watch event) at a time,
+    so that only one page is ever held in memory.
+
+    Columns only ever widen, so each page lines up with the header and with the pages before it,
+    as well as it can without knowing the pages after it.
+    """
+
+    def __init__(self, out: IO[bytes], wide: bool, namespace_column: bool):
+        self.out = out
+        self.wide = wide
+        self.namespace_column = namespace_column
+
+        self.shown: tuple[int, ...] = ()
+        self.widths: dict[int, int] = {}
+
+    def page(self, j: dict[str, Any]) -> None:
+        table = Table.from_json(j, namespace_column=self.namespace_column)
+
+        if not self.shown and table.columns:
+            self.shown = tuple(
+                idx for idx, c in enumerate(table.columns) if self.wide or c["priority"] == 0
+            )
+            self.widths = {
+                idx: max(len(table.columns[idx]["name"]), table.widths[idx]) for idx in self.shown
+            }
+            self._line(c["name"].upper() for c in table.columns)
+
+        for idx in self.shown:
+            if idx < len(table.widths):
+                self.widths[idx] = max(self.widths[idx], table.widths[idx])
+
+        for row in table.rows:
+            self._line(row.cells)
+
+        self.out.flush()
+
+    def event(self, type: str, obj: dict[str, Any]) -> None:
+        # Watch events for Tables carry a Table with just the changed row
+        self.page(obj)
+
+    def _line(self, cells: Any) -> None:
+        cells = tuple(cells)
+        self.out.write(
+            COLUMN_GAP.join(
+                cells[idx].ljust(self.widths[idx]) for idx in self.shown if idx < len(cells)
+            )
+            .rstrip()
+            .encode("utf-8")
+            + b"\n"
+        )
+
+
+class NdjsonWriter:
+    """
+    Writes each object as a line of JSON, or with `watch_events`, each watch event,
+    where the listed objects are ADDED events.
+    """
+
+    def __init__(self, out: IO[bytes], watch_events: bool):
+        self.out = out
+        self.watch_events = watch_events
+
+    def page(self, j: dict[str, Any]) -> None:
+        kind = str(j.get("kind", "")).removesuffix("List")
+        api_version = j.get("apiVersion")
+
+        for item in j.get("items") or ():
+            # Items in lists don't say what they are, since the list already does
+            self._write(
+                "ADDED", {"kind": kind, "apiVersion": api_version, **item} if kind else item
+            )
+
+        self.out.flush()
+
+    def event(self, type: str, obj: dict[str, Any]) -> None:
+        self._write(type, obj)
+        self.out.flush()
+
+    def _write(self, type: str, obj: dict[str, Any]) -> None:
+        self.out.write(dump_json_line({"type": type, "object": obj} if self.watch_events else obj))
+
+
+async def _list(
+    klient: Klient,
+    path: str,
+    headers: dict[str, str] | None,
+    params: Mapping[str, str],
+    writer: TableWriter | NdjsonWriter,
+) -> str:
+    """
+    List the collection at `path` a page at a time, writing each page as it arrives,
+    and return the list's resourceVersion.
+    """
+    page_params = {**params, "limit": str(LIST_PAGE_SIZE)}
+
+    while True:
+        async with await klient.request(
+            method="get", path=path, headers=headers, params=page_params
+        ) as r:
+            if r.status == HTTPStatus.GONE and "continue" in page_params:
+                # Starting over would write the pages that have already been written again,
+                # so fail like kubectl does
+                raise GetFailed(
+                    "The list took too long, and expired before it was complete: "
+                    + await response_error(r)
+                )
+            elif r.status != HTTPStatus.OK:
+                raise GetFailed(await response_error(r))
+
+            j = await r.json(content_type=None)
+
+        writer.page(j)
+
+        if not (token := j.get("metadata", {}).get("continue")):
+            return resource_version_of(j)
+
+        page_params = {**params, "limit": str(LIST_PAGE_SIZE), "continue": token}
+
+
+async def _watch(
+    klient: Klient,
+    path: str,
+    headers: dict[str, str] | None,
+    params: Mapping[str, str],
+    resource_version: str,
+    writer: TableWriter | NdjsonWriter,
+) -> str | None:
+    """
+    Watch the collection at `path` from `resource_version`, writing each event as it arrives,
+    and return the resourceVersion to resume watching from, or `None` if it needs to be relisted.
+    """
+    async with await klient.request(
+        method="get",
+        path=path,
+        headers=headers,
+        params={
+            **params,
+            "watch": "1",
+            "resourceVersion": resource_version,
+            "allowWatchBookmarks": "true",
+            "timeoutSeconds": str(WATCH_TIMEOUT_SECONDS),
+        },
+        timeout=ClientTimeout(total=None, sock_read=WATCH_TIMEOUT_SECONDS + 30),
+    ) as r:
+        if r.status == HTTPStatus.GONE:
+            return None
+        elif r.status != HTTPStatus.OK:
+            raise GetFailed(await response_error(r))
+
+        async for event in read_events(r):
+            match event["type"]:
+                case "ADDED" | "MODIFIED" | "DELETED" as t:
+                    writer.event(t, event["object"])
+                case "ERROR":
+                    logger.debug("watch error", path=path, status=event["object"])
+                    return None
+
+            resource_version = resource_version_of(event["object"]) or resource_version
+
+    return resource_version
+
+
+async def get(
+    klient: Klient,
+    resource: Resource,
+    namespace: str,
+    out: IO[bytes],
+    output: Output = "table",
+    watch: bool = False,
+    watch_events: bool = False,
+    label_selector: str = "",
+    field_selector: str = "",
+) -> None:
+    """
+    Write the objects of `resource` in `namespace` to `out`, as they are listed,
+    and then (with `watch`) write each change to them as it happens, forever.
+
+    If the watch expires, or its connection drops, the collection is listed (and written) again,
+    but if the API server can't be reached for the first list, this fails.
+    """
+    namespace_column = resource.namespaced and namespace == ALL_NAMESPACES
+    path = resource.collection_url(namespace)
+
+    params: dict[str, str] = {}
+    headers: dict[str, str] | None = None
+    writer: TableWriter | NdjsonWriter
+    if output == "ndjson":
+        writer = NdjsonWriter(out, watch_events=watch_events)
+    else:
+        params.update(ALL_NAMESPACES_TABLE_PARAMS if namespace_column else TABLE_PARAMS)
+        headers = TABLE_HEADERS
+        writer = TableWriter(out, wide=output == "wide", namespace_column=namespace_column)
+
+    if label_selector:
+        params["labelSelector"] = label_selector
+    if field_selector:
+        params["fieldSelector"] = field_selector
+
+    listed = False
+    backoff = INITIAL_BACKOFF
+    while True:
+        try:
+            resource_version: str | None = await _list(klient, path, headers, params, writer)
+            if not watch:
+                return
+
+            listed = True
+            backoff = INITIAL_BACKOFF
+            while resource_version is not None:
+                resource_version = await _watch(
+                    klient, path, headers, params, resource_version, writer
+                )
+        except (ClientError, TimeoutError) as e:
+            if not listed:
+                raise GetFailed(str(e) or type(e).__name__) from e
+
+            # e.g., the connection dropped, or the API server is restarting,
+            # so wait a bit (longer each time) and then relist, since events may have been missed
+            logger.warning("watch failed", path=path, error=repr(e), retry_in=backoff)
+            await sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
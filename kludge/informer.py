@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+from asyncio import FIRST_COMPLETED, Event, Task, create_task, sleep, wait
+from collections import defaultdict
+from collections.abc import AsyncIterator, Iterable, Iterator
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Any
+
+from aiohttp import ClientError, ClientTimeout
+from structlog import get_logger
+
+from kludge.diskovery import ALL_NAMESPACES, Resource
+from kludge.klient import Klient, read_events, response_error
+from kludge.watch import INITIAL_BACKOFF, LIST_PAGE_SIZE, MAX_BACKOFF, WATCH_TIMEOUT_SECONDS
+
+logger = get_logger()
+
+# https://kubernetes.io/docs/reference/using-api/api-concepts/#receiving-resources-as-metadata
+METADATA_LIST_HEADERS = {
+    "Accept": "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json",
+}
+METADATA_WATCH_HEADERS = {
+    "Accept": "application/json;as=PartialObjectMetadata;g=meta.k8s.io;v=v1,application/json",
+}
+
+OWNER_DEPTH = 3  # e.g., CronJob -> Job -> Pod, or Deployment -> ReplicaSet -> Pod
+
+ObjectKey = tuple[str, str]  # namespace, name
+
+
+def key(obj: dict[str, Any]) -> ObjectKey:
+    metadata = obj.get("metadata", {})
+    return metadata.get("namespace", ""), metadata.get("name", "")
+
+
+@dataclass(slots=True)
+class Store:
+    """
+    The objects of one resource type, indexed by namespace, by label, and by owner.
+    """
+
+    objects: dict[ObjectKey, dict[str, Any]] = field(default_factory=dict)
+    resource_version: str = ""
+    by_namespace: defaultdict[str, set[ObjectKey]] = field(default_factory=lambda: defaultdict(set))
+    by_label: defaultdict[tuple[str, str], set[ObjectKey]] = field(
+        default_factory=lambda: defaultdict(set)
+    )
+    by_owner: defaultdict[str, set[ObjectKey]] = field(default_factory=lambda: defaultdict(set))
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def get(self, namespace: str, name: str) -> dict[str, Any] | None:
+        return self.objects.get((namespace, name))
+
+    def in_namespace(self, namespace: str) -> list[dict[str, Any]]:
+        return self._lookup(self.by_namespace.get(namespace, ()))
+
+    def with_label(self, label: str, value: str) -> list[dict[str, Any]]:
+        return self._lookup(self.by_label.get((label, value), ()))
+
+    def owned_by(self, uid: str) -> list[dict[str, Any]]:
+        return self._lookup(self.by_owner.get(uid, ()))
+
+    def _lookup(self, keys: Iterable[ObjectKey]) -> list[dict[str, Any]]:
+        return [self.objects[k] for k in keys]
+
+    def replace(self, objects: Iterable[dict[str, Any]], resource_version: str) -> None:
+        self.objects.clear()
+        self.by_namespace.clear()
+        self.by_label.clear()
+        self.by_owner.clear()
+
+        for obj in objects:
+            self.upsert(obj)
+
+        self.resource_version = resource_version
+
+    def upsert(self, obj: dict[str, Any]) -> None:
+        k = key(obj)
+        if (old := self.objects.get(k)) is not None:
+            self._unindex(k, old)
+
+        self.objects[k] = obj
+        for index, value in self._indexes(obj):
+            index[value].add(k)
+
+    def delete(self, obj: dict[str, Any]) -> None:
+        k = key(obj)
+        if (old := self.objects.pop(k, None)) is not None:
+            self._unindex(k, old)
+
+    def _unindex(self, k: ObjectKey, obj: dict[str, Any]) -> None:
+        for index, value in self._indexes(obj):
+            keys = index[value]
+            keys.discard(k)
+            if not keys:
+                del index[value]
+
+    def _indexes(
+        self, obj: dict[str, Any]
+    ) -> Iterator[tuple[defaultdict[Any, set[ObjectKey]], Any]]:
+        metadata = obj.get("metadata", {})
+
+        yield self.by_namespace, metadata.get("namespace", "")
+        for label in (metadata.get("labels") or {}).items():
+            yield self.by_label, label
+        for owner in metadata.get("ownerReferences") or ():
+            yield self.by_owner, owner["uid"]
+
+
+class InformerFailed(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Owner:
+    resource: Resource
+    namespace: str
+    name: str
+
+
+class Informer:
+    """
+    Keeps a Store of every object of one resource type (across all namespaces) up-to-date,
+    by listing them and then watching for changes, like client-go's informers.
+
+    With `metadata_only`, only the objects' metadata is fetched,
+    which is all that the indexes need, and is much smaller than the whole objects.
+
+    If listing or watching fails (e.g., because the user may only list one namespace),
+    the failure is kept in `error` (and consumers are notified of it),
+    and it is retried with exponential backoff.
+    """
+
+    def __init__(self, klient: Klient, resource: Resource, metadata_only: bool = False):
+        self.klient = klient
+        self.resource = resource
+        self.metadata_only = metadata_only
+
+        self.store = Store()
+        self.synced = Event()
+        self.error: str | None = None
+
+        self._changed = Event()
+        self._task: Task[None] | None = None
+        self._backoff: float = INITIAL_BACKOFF
+
+    @property
+    def path(self) -> str:
+        return self.resource.collection_url(ALL_NAMESPACES)
+
+    def start(self) -> Informer:
+        if self._task is None:
+            self._task = self.klient.spawn(self._run())
+
+        return self
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = Event()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._list()
+                self.synced.set()
+                self._notify()
+
+                await self._watch()
+            except (InformerFailed, ClientError, TimeoutError) as e:
+                self.error = str(e) or type(e).__name__
+                logger.warning(
+                    "informer failed", path=self.path, error=self.error, retry_in=self._backoff
+                )
+                self._notify()
+
+                await sleep(self._backoff)
+                self._backoff = min(self._backoff * 2, MAX_BACKOFF)
+
+    async def _list(self) -> None:
+        objects: list[dict[str, Any]] = []
+        resource_version = ""
+        params = {"limit": str(LIST_PAGE_SIZE)}
+
+        while True:
+            async with await self.klient.request(
+                method="get",
+                path=self.path,
+                headers=METADATA_LIST_HEADERS if self.metadata_only else None,
+                params=params,
+            ) as r:
+                if r.status == HTTPStatus.GONE:  # the continue token expired, so start over
+                    objects.clear()
+                    params = {"limit": str(LIST_PAGE_SIZE)}
+                    continue
+
+                if r.status != HTTPStatus.OK:
+                    raise InformerFailed(await response_error(r))
+
+                page = await r.json(content_type=None)
+
+            objects.extend(page.get("items") or ())
+            resource_version = page.get("metadata", {}).get("resourceVersion", "")
+
+            if not (token := page.get("metadata", {}).get("continue")):
+                break
+
+            params = {"limit": str(LIST_PAGE_SIZE), "continue": token}
+
+        self.store.replace(objects, resource_version)
+
+    async def _watch(self) -> None:
+        """
+        Watch from the Store's resourceVersion, resuming each time the watch times out,
+        and return (to relist) if the Store's resourceVersion is too old.
+        """
+        while True:
+            async with await self.klient.request(
+                method="get",
+                path=self.path,
+                headers=METADATA_WATCH_HEADERS if self.metadata_only else None,
+                params={
+                    "watch": "1",
+                    "resourceVersion": self.store.resource_version,
+                    "allowWatchBookmarks": "true",
+                    "timeoutSeconds": str(WATCH_TIMEOUT_SECONDS),
+                },
+                timeout=ClientTimeout(total=None, sock_read=WATCH_TIMEOUT_SECONDS + 30),
+            ) as r:
+                if r.status == HTTPStatus.GONE:
+                    return
+                elif r.status != HTTPStatus.OK:
+                    raise InformerFailed(await response_error(r))
+
+                # Only a working watch shows that the failures (if any) are over
+                if self.error is not None:
+                    self.error = None
+                    self._notify()
+                self._backoff = INITIAL_BACKOFF
+
+                async for event in read_events(r):
+                    obj = event["object"]
+                    match event["type"]:
+                        case "ADDED" | "MODIFIED":
+                            self.store.upsert(obj)
+                        case "DELETED":
+                            self.store.delete(obj)
+                        case "BOOKMARK":
+                            pass
+                        case "ERROR":
+                            logger.debug("watch error", path=self.path, status=obj)
+                            return
+
+                    self.store.resource_version = (
+                        obj.get("metadata", {}).get("resourceVersion")
+                        or self.store.resource_version
+                    )
+                    if event["type"] != "BOOKMARK":
+                        self._notify()
+
+
+class Informers:
+    """
+    The Informers for one Klient, started the first time they're asked for and then shared,
+    so that every consumer of a resource type is served from the same Store.
+    """
+
+    def __init__(self, klient: Klient):
+        self.klient = klient
+
+        self._informers: dict[tuple[str, bool], Informer] = {}
+
+    def __call__(self, resource: Resource, metadata_only: bool = False) -> Informer:
+        k = (resource.collection_url(ALL_NAMESPACES), metadata_only)
+        if k not in self._informers:
+            self._informers[k] = Informer(self.klient, resource, metadata_only).start()
+
+        return self._informers[k]
+
+    async def stop(self) -> None:
+        """
+        Stop every Informer, so that the next time one is asked for, a new one is started.
+        """
+        for informer in self._informers.values():
+            await informer.stop()
+
+        self._informers.clear()
+
+
+def owned(uid: str, target: Store, intermediates: Iterable[Store]) -> set[ObjectKey]:
+    """
+    The keys of the objects in the `target` Store that are owned by the object with `uid`,
+    either directly or through owners in the `intermediates` Stores
+    (e.g., the Pods owned by a Deployment, through its ReplicaSets).
+    """
+    intermediates = tuple(intermediates)
+    found: set[ObjectKey] = set()
+    owners = {uid}
+
+    for _ in range(OWNER_DEPTH):
+        found.update(k for o in owners for k in target.by_owner.get(o, ()))
+        owners = {
+            child["metadata"]["uid"]
+            for o in owners
+            for store in intermediates
+            for child in store.owned_by(o)
+        }
+        if not owners:
+            break
+
+    return found
+
+
+async def changes(*informers: Informer) -> AsyncIterator[None]:
+    """
+    Yield once all the `informers` have synced (or any has failed),
+    and then again every time any of them change (or fail).
+    Changes that happen while the consumer is busy are coalesced into a single yield.
+    """
+    while True:
+        events = [informer._changed for informer in informers]
+        if all(i.synced.is_set() for i in informers) or any(i.error for i in informers):
+            yield
+
+        waiters = [create_task(e.wait()) for e in events]
+        try:
+            await wait(waiters, return_when=FIRST_COMPLETED)
+        finally:
+            for w in waiters:
+                w.cancel()
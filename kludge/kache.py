@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import json
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from structlog import get_logger
+
+from kludge.diskovery import Discovery
+from kludge.watch import Table
+
+logger = get_logger()
+
+CACHE_DIR = Path.home() / ".kube" / "cache" / "kludge"
+
+VIEW_CACHE_ENTRIES = 32
+VIEW_CACHE_BYTES = 256 * 1024 * 1024
+OBJECT_CACHE_ENTRIES = 64
+
+# Rough costs of the Python objects behind each row and cell, on top of the cell text itself
+ROW_OVERHEAD_BYTES = 200
+CELL_OVERHEAD_BYTES = 50
+
+
+def cache_dir(server: str) -> Path:
+    # Like kubectl's ~/.kube/cache/discovery/<host_port>
+    return CACHE_DIR / re.sub(r"[^\w.-]", "_", re.sub(r"^https?://", "", server))
+
+
+def read_discovery(server: str) -> Discovery | None:
+    path = cache_dir(server) / "discovery.json"
+
+    try:
+        return Discovery.from_json(json.loads(path.read_bytes()))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.debug("no usable discovery cache", path=str(path), error=repr(e))
+        return None
+
+
+def write_discovery(server: str, discovery: Discovery) -> None:
+    path = cache_dir(server) / "discovery.json"
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file and then move it into place,
+        # so that a concurrent reader never sees a partial file.
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(discovery.to_json()))
+        tmp.replace(path)
+    except OSError as e:
+        logger.debug("failed to write discovery cache", path=str(path), error=repr(e))
+
+
+# context, collection path, label selector, field selector
+ViewKey = tuple[str, str, str, str]
+
+
+@dataclass(frozen=True, slots=True)
+class View:
+    table: Table
+    fetched: datetime
+
+
+def approximate_size(table: Table) -> int:
+    # Uses the widest cell in each column, so it overestimates, but doesn't have to look at every cell
+    return len(table.rows) * (
+        ROW_OVERHEAD_BYTES + sum(table.widths) + CELL_OVERHEAD_BYTES * len(table.columns)
+    )
+
+
+@dataclass(slots=True)
+class ViewCache:
+    """
+    The most recently used views, so that returning to one can show its rows immediately
+    while it is revalidated in the background.
+
+    Bounded by both the number of views and their approximate total size in bytes.
+    The most recently stored view is always kept, even if it alone is over the byte limit.
+    """
+
+    max_entries: int = VIEW_CACHE_ENTRIES
+    max_bytes: int = VIEW_CACHE_BYTES
+    views: OrderedDict[ViewKey, tuple[View, int]] = field(default_factory=OrderedDict)
+    total_bytes: int = 0
+
+    def __len__(self) -> int:
+        return len(self.views)
+
+    def get(self, key: ViewKey) -> View | None:
+        if (entry := self.views.get(key)) is None:
+            return None
+
+        self.views.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: ViewKey, view: View) -> None:
+        if (old := self.views.pop(key, None)) is not None:
+            self.total_bytes -= old[1]
+
+        size = approximate_size(view.table)
+        self.views[key] = (view, size)
+        self.total_bytes += size
+
+        while len(self.views) > 1 and (
+            len(self.views) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            _, (_, evicted) = self.views.popitem(last=False)
+            self.total_bytes -= evicted
+
+
+@dataclass(slots=True)
+class ObjectCache:
+    """
+    The most recently fetched whole objects, by context and path,
+    so that looking at an object again doesn't have to re-fetch it if it hasn't changed since.
+    """
+
+    max_entries: int = OBJECT_CACHE_ENTRIES
+    objects: OrderedDict[tuple[str, str], dict[str, Any]] = field(default_factory=OrderedDict)
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def get(self, key: tuple[str, str], resource_version: str) -> dict[str, Any] | None:
+        """
+        The object, if it is cached at exactly `resource_version`.
+        """
+        obj = self.objects.get(key)
+        if obj is None or not resource_version:
+            return None
+
+        if obj.get("metadata", {}).get("resourceVersion") != resource_version:
+            return None
+
+        self.objects.move_to_end(key)
+        return obj
+
+    def cached_version(self, key: tuple[str, str]) -> str | None:
+        if (obj := self.objects.get(key)) is None:
+            return None
+
+        return str(obj.get("metadata", {}).get("resourceVersion", "")) or None
+
+    def put(self, key: tuple[str, str], obj: dict[str, Any]) -> None:
+        self.objects.pop(key, None)
+        self.objects[key] = obj
+
+        while len(self.objects) > self.max_entries:
+            self.objects.popitem(last=False)
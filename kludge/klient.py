@@ -1,33 +1,116 @@
 from __future__ import annotations
 
+from asyncio import Task, create_task, gather
 from base64 import b64decode
+from collections.abc import AsyncIterator, Callable, Coroutine, Mapping
 from functools import cached_property
+from http import HTTPStatus
+from json import loads
 from ssl import SSLContext, create_default_context
 from tempfile import NamedTemporaryFile
+from time import perf_counter
 from types import TracebackType
-from typing import Literal, Type
-from urllib.parse import urljoin
+from typing import Any, Literal, Type, TypeVar
+from urllib.parse import urljoin, urlsplit
 
-from aiohttp import ClientSession
+from aiohttp import ClientError, ClientResponse, ClientSession, ClientTimeout, TCPConnector
 from aiohttp.client import _RequestContextManager
 from structlog import get_logger
 
-from kludge.konfig import Konfig
+from kludge.konfig import ClusterInfo, ContextInfo, Konfig, KonfigFailed, UserInfo
+from kludge.stats import RequestRecord, path_template
 
 logger = get_logger()
 
+T = TypeVar("T")
+
+CONNECTIONS_PER_HOST = 16
+DNS_CACHE_SECONDS = 300
+KEEPALIVE_SECONDS = 60
+
+
+class KlientFailed(ClientError):
+    """
+    The Klient can't make requests at all, e.g., because its context's user has no credentials
+    that it supports, or its certificates can't be loaded.
+
+    It's a ClientError, so that it's handled like any other failure to reach the API server.
+    """
+
+
+class InstrumentedRequest:
+    """
+    Wraps an aiohttp request context manager to time it,
+    and to report it to the Klient's hooks once the response has been released.
+    """
+
+    def __init__(self, klient: Klient, method: str, path: str, request: _RequestContextManager):
+        self.klient = klient
+        self.method = method
+        self.path = path
+        self.request = request
+
+        self._latency = 0.0
+
+    async def __aenter__(self) -> ClientResponse:
+        start = perf_counter()
+        self.response = await self.request.__aenter__()
+        self._latency = perf_counter() - start
+
+        return self.response
+
+    async def __aexit__(
+        self,
+        exc_type: Type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.request.__aexit__(exc_type, exc_val, exc_tb)
+
+        record = RequestRecord(
+            method=self.method.upper(),
+            path=path_template(self.path),
+            status=self.response.status,
+            bytes=self.response.content.total_bytes,
+            latency=self._latency,
+        )
+        for hook in self.klient.hooks:
+            hook(record)
+
 
 class Klient:
-    def __init__(self, konfig: Konfig):
+    def __init__(self, konfig: Konfig, context: str | None = None):
         self.konfig = konfig
+        self.context_name = context or konfig.current_context or ""
+
+        self.hooks: list[Callable[[RequestRecord], None]] = []
 
         self._session: ClientSession | None = None
+        self._tasks: set[Task[Any]] = set()
+
+    def spawn(self, coro: Coroutine[Any, Any, T]) -> Task[T]:
+        """
+        Run `coro` in the background until it finishes or this Klient is closed.
+        """
+        task = create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
 
     async def session(self) -> ClientSession:
         if self._session is not None:
             return self._session
 
-        self._session = ClientSession()
+        # One session (and so one connection pool) is shared by every request this Klient makes,
+        # so connections (and their TLS handshakes) are reused instead of being made per-request.
+        self._session = ClientSession(
+            connector=TCPConnector(
+                limit_per_host=CONNECTIONS_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_SECONDS,
+                keepalive_timeout=KEEPALIVE_SECONDS,
+                ssl=self.ssl,
+            )
+        )
         return self._session
 
     async def __aenter__(self) -> Klient:
@@ -39,12 +122,35 @@ class Klient:
         exc_val: BaseException | None,
         exc_tb: TracebackType | None,
     ) -> None:
-        await (await self.session()).close()
+        for task in tuple(self._tasks):
+            task.cancel()
+        await gather(*self._tasks, return_exceptions=True)
+
+        # A Klient that never made a request (e.g., because it can't) has no session to close
+        if self._session is not None:
+            await self._session.close()
+
+    @cached_property
+    def context(self) -> ContextInfo:
+        return self.konfig.context(self.context_name or None)
+
+    @cached_property
+    def cluster(self) -> ClusterInfo:
+        return self.konfig.cluster(self.context.cluster)
+
+    @cached_property
+    def user(self) -> UserInfo:
+        return self.konfig.user(self.context.user)
+
+    @cached_property
+    def ssl(self) -> SSLContext | bool:
+        # Plain HTTP servers (e.g., `kubectl proxy`) don't use TLS, so they don't need any certificates
+        return self.sslcontext if urlsplit(self.server).scheme == "https" else False
 
     @cached_property
     def sslcontext(self) -> SSLContext:
-        cluster = self.konfig.clusters[0].cluster
-        user = self.konfig.users[0].user
+        cluster = self.cluster
+        user = self.user
 
         context = create_default_context(
             cafile=cluster.certificate_authority,
@@ -75,24 +181,142 @@ class Klient:
                 keyfile=user.client_key,
             )
         else:
-            raise Exception("No client certificate or key provided")
+            raise KonfigFailed(
+                f"User {self.context.user!r} has no client certificate and key,"
+                " which are the only credentials supported"
+            )
 
         return context
 
+    @property
+    def server(self) -> str:
+        return self.cluster.server
+
     def url(self, path: str) -> str:
-        return urljoin(self.konfig.clusters[0].cluster.server, path)
+        return urljoin(self.server, path)
 
     async def request(
         self,
-        method: Literal["get", "put"],
+        method: Literal["get", "put", "patch", "delete"],
         path: str,
         headers: dict[str, str] | None = None,
+        params: Mapping[str, str] | None = None,
         json: object | None = None,
-    ) -> _RequestContextManager:
-        return (await self.session()).request(
+        timeout: ClientTimeout | None = None,
+    ) -> InstrumentedRequest:
+        kwargs: dict[str, Any] = {} if timeout is None else {"timeout": timeout}
+
+        try:
+            session, url, ssl = await self.session(), self.url(path), self.ssl
+        except (KonfigFailed, OSError) as e:  # SSLErrors are OSErrors too
+            raise KlientFailed(f"Can't connect to context {self.context_name!r}: {e}") from e
+
+        return InstrumentedRequest(
+            klient=self,
             method=method,
-            url=self.url(path),
-            headers=headers,
-            ssl=self.sslcontext,
-            json=json,
+            path=path,
+            request=session.request(
+                method=method,
+                url=url,
+                headers=headers,
+                params=params,
+                ssl=ssl,
+                json=json,
+                **kwargs,
+            ),
         )
+
+
+class Klients:
+    """
+    A Klient for each context, created the first time that context is used
+    and then kept open, so that switching back to a context reuses its warm connection pool.
+    """
+
+    def __init__(self, konfig: Konfig):
+        self.konfig = konfig
+
+        self.hooks: list[Callable[[RequestRecord], None]] = []
+
+        self._klients: dict[str, Klient] = {}
+
+    def __getitem__(self, context: str) -> Klient:
+        if context not in self._klients:
+            klient = Klient(self.konfig, context=context)
+            klient.hooks = self.hooks  # shared, so hooks added later apply to every Klient
+            self._klients[context] = klient
+
+        return self._klients[context]
+
+    @property
+    def current(self) -> Klient:
+        return self[self.konfig.current_context or ""]
+
+    async def __aenter__(self) -> Klients:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        for klient in self._klients.values():
+            await klient.__aexit__(exc_type, exc_val, exc_tb)
+
+
+def error_message(status: int, j: Any) -> str:
+    """
+    Why a request failed. Failures are usually a Status object, which explains itself.
+    """
+    try:
+        phrase = HTTPStatus(status).phrase
+    except ValueError:  # e.g., a proxy's own status codes
+        phrase = f"HTTP {status}"
+
+    if isinstance(j, dict) and (message := j.get("message")):
+        return f"{phrase}: {message}"
+
+    return phrase
+
+
+async def response_error(response: ClientResponse) -> str:
+    """
+    Why a request failed, from its response, whose body is usually a Status object,
+    but may be anything (e.g., an HTML error page from a load balancer in front of the API server).
+    """
+    try:
+        j = loads(await response.text())
+    except ValueError:
+        j = None
+
+    return error_message(response.status, j)
+
+
+def resource_version_of(j: dict[str, Any]) -> str:
+    """
+    The resourceVersion of an object or a list,
+    or of the last object in a Table that doesn't have its own (like a watch event's).
+    """
+    rv: str = j.get("metadata", {}).get("resourceVersion", "")
+    if rv:
+        return rv
+
+    for row in j.get("rows") or ():
+        rv = (row.get("object") or {}).get("metadata", {}).get("resourceVersion", rv)
+
+    return rv
+
+
+async def read_events(response: ClientResponse) -> AsyncIterator[dict[str, Any]]:
+    """
+    The events of a watch, as they arrive.
+    """
+    # Watch events are newline-delimited JSON documents.
+    # We split the lines ourselves because a single event can be larger than aiohttp's line limit.
+    buffer = b""
+    async for chunk in response.content.iter_any():
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield loads(line)
@@ -7,6 +7,10 @@ from pydantic import BaseModel, Field
 from yaml import safe_load
 
 
+class KonfigFailed(Exception):
+    pass
+
+
 class ClusterInfo(BaseModel):
     certificate_authority: Path | None = Field(default=None, alias="certificate-authority")
     certificate_authority_data: str | None = Field(default=None, alias="certificate-authority-data")
@@ -30,10 +34,23 @@ class User(BaseModel):
     user: UserInfo
 
 
+class ContextInfo(BaseModel):
+    cluster: str
+    user: str
+    namespace: str | None = None
+
+
+class Context(BaseModel):
+    name: str
+    context: ContextInfo
+
+
 class Konfig(BaseModel):
     apiVersion: str
     clusters: list[Cluster]
     users: list[User]
+    contexts: list[Context] = []
+    current_context: str | None = Field(default=None, alias="current-context")
 
     @classmethod
     def build(cls) -> Konfig:
@@ -42,3 +59,37 @@ class Konfig(BaseModel):
         y = safe_load(path.read_text())
 
         return cls.model_validate(y)
+
+    @property
+    def context_names(self) -> list[str]:
+        return [c.name for c in self.contexts]
+
+    def context(self, name: str | None = None) -> ContextInfo:
+        """
+        The context called `name`, or the current context if `name` isn't given.
+        """
+        name = name or self.current_context
+
+        for c in self.contexts:
+            if c.name == name:
+                return c.context
+
+        if name is None and self.clusters and self.users:
+            # Without any contexts, fall back to the first cluster and user, like we used to
+            return ContextInfo(cluster=self.clusters[0].name, user=self.users[0].name)
+
+        raise KonfigFailed(f"No context named {name!r}")
+
+    def cluster(self, name: str) -> ClusterInfo:
+        for c in self.clusters:
+            if c.name == name:
+                return c.cluster
+
+        raise KonfigFailed(f"No cluster named {name!r}")
+
+    def user(self, name: str) -> UserInfo:
+        for u in self.users:
+            if u.name == name:
+                return u.user
+
+        raise KonfigFailed(f"No user named {name!r}")
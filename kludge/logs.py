@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+from asyncio import sleep
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Collection
+from dataclasses import dataclass, field
+from datetime import datetime
+from http import HTTPStatus
+from itertools import dropwhile, islice
+from typing import Any
+
+from aiohttp import ClientError, ClientTimeout
+from structlog import get_logger
+
+from kludge.klient import Klient
+from kludge.watch import INITIAL_BACKOFF, MAX_BACKOFF
+
+logger = get_logger()
+
+LOG_BUFFER_LINES = 10_000
+DEFAULT_CONTAINER_ANNOTATION = "kubectl.kubernetes.io/default-container"
+
+
+@dataclass(frozen=True, slots=True)
+class LogSource:
+    namespace: str
+    pod: str
+
+
+@dataclass(slots=True)
+class LogBuffer:
+    """
+    A ring buffer of the most recent `max_lines` log lines,
+    so that memory stays bounded no matter how chatty the container is.
+    """
+
+    max_lines: int = LOG_BUFFER_LINES
+    lines: deque[str] = field(init=False)
+    # The total number of lines ever appended, which changes whenever the lines do
+    appended: int = 0
+
+    def __post_init__(self) -> None:
+        self.lines = deque(maxlen=self.max_lines)
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def extend(self, lines: Collection[str]) -> None:
+        self.lines.extend(lines)
+        self.appended += len(lines)
+
+    def clear(self) -> None:
+        self.lines.clear()
+        self.appended = 0
+
+    def tail(self, n: int, offset: int = 0) -> list[str]:
+        """
+        The last `n` lines, ending `offset` lines before the newest line.
+        Only walks back from the newest line, so it doesn't touch the rest of the buffer.
+        """
+        return list(islice(reversed(self.lines), offset, offset + n))[::-1]
+
+
+def default_container(pod: dict[str, Any]) -> str | None:
+    containers = [c["name"] for c in pod.get("spec", {}).get("containers", ())]
+    annotations = pod.get("metadata", {}).get("annotations") or {}
+
+    if (default := annotations.get(DEFAULT_CONTAINER_ANNOTATION)) in containers:
+        return str(default)
+
+    return containers[0] if containers else None
+
+
+def containers(pod: dict[str, Any]) -> tuple[str, ...]:
+    spec = pod.get("spec", {})
+    return tuple(c["name"] for c in (*spec.get("containers", ()), *spec.get("initContainers", ())))
+
+
+async def stream_logs(
+    klient: Klient,
+    namespace: str,
+    pod: str,
+    container: str | None = None,
+    tail_lines: int | None = None,
+    since_seconds: int | None = None,
+    since_time: str | None = None,
+    follow: bool = True,
+) -> AsyncIterator[list[str]]:
+    """
+    Yield batches of log lines (prefixed by their timestamps) from a pod's container,
+    as they arrive, until the stream ends.
+
+    Lines are yielded as soon as a chunk of them arrives, so a busy container yields big batches
+    instead of many small ones.
+
+    If the connection drops, this raises a ClientError (e.g., a ClientPayloadError partway through);
+    see follow_logs to reconnect instead.
+    """
+    params = {"timestamps": "true"}
+    if follow:
+        params["follow"] = "true"
+    if container is not None:
+        params["container"] = container
+    if tail_lines is not None:
+        params["tailLines"] = str(tail_lines)
+    if since_seconds is not None:
+        params["sinceSeconds"] = str(since_seconds)
+    if since_time is not None:
+        params["sinceTime"] = since_time
+
+    async with await klient.request(
+        method="get",
+        path=f"/api/v1/namespaces/{namespace}/pods/{pod}/log",
+        params=params,
+        # Quiet containers can go a long time between lines
+        timeout=ClientTimeout(total=None, sock_read=None),
+    ) as r:
+        if r.status != HTTPStatus.OK:
+            text = await r.text()
+            logger.debug("logs failed", pod=pod, container=container, status=r.status, text=text)
+            yield [f"Failed to get logs ({r.status}): {text}"]
+            return
+
+        buffer = b""
+        async for chunk in r.content.iter_any():
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            if lines:
+                yield [line.decode("utf-8", errors="replace") for line in lines]
+
+        if buffer:
+            yield [buffer.decode("utf-8", errors="replace")]
+
+
+def timestamp(line: str) -> datetime | None:
+    """
+    The timestamp that a log line starts with (with timestamps=true), if it has one.
+    """
+    try:
+        return datetime.fromisoformat(line.partition(" ")[0])
+    except ValueError:
+        return None
+
+
+async def follow_logs(
+    klient: Klient,
+    namespace: str,
+    pod: str,
+    container: str | None = None,
+    tail_lines: int | None = None,
+    since_seconds: int | None = None,
+    on_error: Callable[[str | None], None] = lambda error: None,
+) -> AsyncIterator[list[str]]:
+    """
+    Like stream_logs, but when the connection drops, reconnect (waiting longer each time)
+    and resume from the last line's timestamp, until the stream ends (e.g., the container exits).
+
+    `on_error` is called with why the connection dropped, and with None once lines arrive again.
+    """
+    # The last line's timestamp, as the API server sent it (for sinceTime) and parsed (to compare)
+    last: tuple[str, datetime] | None = None
+    backoff = INITIAL_BACKOFF
+    failed = False
+
+    while True:
+        resumed_from = last
+        try:
+            async for batch in stream_logs(
+                klient,
+                namespace=namespace,
+                pod=pod,
+                container=container,
+                tail_lines=tail_lines if last is None else None,
+                since_seconds=since_seconds if last is None else None,
+                since_time=last[0] if last is not None else None,
+            ):
+                lines = batch
+                if resumed_from is not None:
+                    # sinceTime includes the last line itself (and maybe others just before it),
+                    # which have already been yielded
+                    after = resumed_from[1]
+                    lines = list(
+                        dropwhile(
+                            lambda line: (t := timestamp(line)) is not None and t <= after, batch
+                        )
+                    )
+                    if not lines:
+                        continue
+                    resumed_from = None
+
+                if failed:
+                    failed = False
+                    backoff = INITIAL_BACKOFF
+                    on_error(None)
+
+                if lines and (t := timestamp(lines[-1])) is not None:
+                    last = (lines[-1].partition(" ")[0], t)
+
+                yield lines
+
+            return
+        except (ClientError, TimeoutError) as e:
+            logger.info(
+                "logs dropped", pod=pod, container=container, error=repr(e), retry_in=backoff
+            )
+            failed = True
+            on_error(str(e) or type(e).__name__)
+            await sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
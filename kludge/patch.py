@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from http import HTTPStatus
+from typing import Any
+
+from structlog import get_logger
+
+from kludge.klient import Klient, resource_version_of, response_error
+
+logger = get_logger()
+
+MERGE_PATCH_HEADERS = {"Content-Type": "application/merge-patch+json"}
+
+CONFLICT_RETRIES = 3
+
+Path = tuple[str, ...]
+
+# Fields that change on every write, which the user's edits are never compared against
+VOLATILE_METADATA = ("resourceVersion", "managedFields", "generation")
+
+
+class PatchFailed(Exception):
+    pass
+
+
+def merge_patch(before: Any, after: Any) -> Any:
+    """
+    The JSON merge patch (RFC 7386) that turns `before` into `after`,
+    which only contains the fields that changed (lists are always replaced whole).
+    """
+    if not isinstance(before, dict) or not isinstance(after, dict):
+        return after
+
+    patch = {k: None for k in before if k not in after}
+    for k, v in after.items():
+        if k not in before:
+            patch[k] = v
+        elif before[k] != v:
+            patch[k] = merge_patch(before[k], v)
+
+    return patch
+
+
+def paths(patch: Any, prefix: Path = ()) -> Iterator[Path]:
+    """
+    The paths to the fields that a merge patch sets (or removes).
+    """
+    if isinstance(patch, dict) and patch:
+        for k, v in patch.items():
+            yield from paths(v, (*prefix, k))
+    else:
+        yield prefix
+
+
+def overlaps(a: Any, b: Any) -> bool:
+    """
+    Whether two merge patches touch any of the same fields, or fields inside each other.
+    """
+    b_paths = tuple(paths(b))
+    return any(p[: len(q)] == q or q[: len(p)] == p for p in paths(a) for q in b_paths)
+
+
+def without_volatile_metadata(obj: dict[str, Any]) -> dict[str, Any]:
+    return {
+        **obj,
+        "metadata": {
+            k: v for k, v in obj.get("metadata", {}).items() if k not in VOLATILE_METADATA
+        },
+    }
+
+
+async def apply_edit(
+    klient: Klient, path: str, before: dict[str, Any], after: dict[str, Any]
+) -> dict[str, Any] | None:
+    """
+    Patch the object at `path` with just the fields that were edited between `before` and `after`,
+    returning the updated object, or `None` if nothing was edited.
+
+    The patch only applies to the version of the object that was edited.
+    If someone else has changed the object since, it is retried against the new version,
+    but only if none of the fields they changed were also edited (otherwise, this raises `PatchFailed`).
+    """
+    patch = merge_patch(without_volatile_metadata(before), without_volatile_metadata(after))
+    if not patch:
+        return None
+
+    base = before
+    for _ in range(CONFLICT_RETRIES + 1):
+        # Including the resourceVersion makes the API server reject the patch if the object has changed
+        body = {
+            **patch,
+            "metadata": {
+                **(patch.get("metadata") or {}),
+                "resourceVersion": resource_version_of(base),
+            },
+        }
+
+        async with await klient.request(
+            method="patch", path=path, headers=MERGE_PATCH_HEADERS, json=body
+        ) as r:
+            if r.status == HTTPStatus.OK:
+                updated: dict[str, Any] = await r.json(content_type=None)
+                return updated
+            elif r.status != HTTPStatus.CONFLICT:
+                raise PatchFailed(await response_error(r))
+
+        async with await klient.request(method="get", path=path) as r:
+            if r.status != HTTPStatus.OK:
+                raise PatchFailed(await response_error(r))
+
+            j = await r.json(content_type=None)
+
+        theirs = merge_patch(without_volatile_metadata(base), without_volatile_metadata(j))
+        logger.debug("patch conflict", path=path, theirs=tuple(paths(theirs)))
+
+        if overlaps(patch, theirs):
+            raise PatchFailed(
+                "Conflict: the object was changed by someone else while it was being edited"
+            )
+
+        base = j
+
+    raise PatchFailed(
+        f"Conflict: the object kept changing, gave up after {CONFLICT_RETRIES} retries"
+    )
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+from kludge.watch import Row
+
+# Separates cells in a row's text, so that a query can't match across two of them
+CELL_SEPARATOR = "\t"
+
+
+@dataclass(slots=True)
+class RowSearch:
+    """
+    Finds the rows that have some text in their cells (ignoring case), as a query is typed.
+
+    Each row's lowercase text is built once per version of the row (i.e., once per Row object),
+    and a query that extends the previous one only searches the rows that matched it.
+    """
+
+    # Identifies the rows being searched; when it changes, searching starts over from all the rows
+    source: object = None
+    # Each row's text, by the row's id, which is cheaper to hash than its key.
+    # The rows are kept alive, so that their ids can't be reused by other rows.
+    rows: tuple[Row, ...] = ()
+    texts: dict[int, str] = field(default_factory=dict)
+    # Each query and its matches, each extending and narrowing the one before
+    results: list[tuple[str, list[Row]]] = field(default_factory=list)
+
+    def search(self, rows: Iterable[Row], source: object, query: str) -> list[Row]:
+        """
+        The `rows` (in order) that match the `query`.
+        """
+        q = query.lower()
+
+        if source != self.source:
+            self.source = source
+            self.results = []
+
+        # Backing up (e.g., deleting the last character) returns to an earlier, wider result
+        while self.results and not q.startswith(self.results[-1][0]):
+            self.results.pop()
+
+        if self.results and self.results[-1][0] == q:
+            return self.results[-1][1]
+
+        if not self.results:
+            self._index(rows)
+
+        texts = self.texts
+        matches = [
+            r for r in (self.results[-1][1] if self.results else self.rows) if q in texts[id(r)]
+        ]
+
+        self.results.append((q, matches))
+
+        return matches
+
+    def _index(self, rows: Iterable[Row]) -> None:
+        # Only the texts of the rows being searched are kept, so rows that are gone are forgotten
+        previous, new_rows = self.texts, tuple(rows)
+        self.texts = {
+            id(r): t if (t := previous.get(id(r))) is not None else _text(r) for r in new_rows
+        }
+        self.rows = new_rows
+
+
+def _text(row: Row) -> str:
+    return CELL_SEPARATOR.join(row.cells).lower()
+
+
+def highlights(text: str, query: str) -> Iterator[tuple[str, bool]]:
+    """
+    Split `text` into the parts that match `query` (ignoring case) and the parts between them,
+    each with whether it matches.
+    """
+    if not query:
+        yield text, False
+        return
+
+    lower, q = text.lower(), query.lower()
+    start = 0
+    while (idx := lower.find(q, start)) != -1:
+        if idx > start:
+            yield text[start:idx], False
+        yield text[idx : idx + len(q)], True
+        start = idx + len(q)
+
+    if start < len(text) or not text:
+        yield text[start:], False
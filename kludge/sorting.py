@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, insort
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+from kludge.watch import Row, Table
+
+# A typed key for the cell, then the row's key (to break ties, and to find the row again)
+SortKey = tuple[int, Any, tuple[str, str]]
+
+# Re-sorting from scratch is faster than bisecting in this many changed rows (as a fraction of all rows)
+RESORT_FRACTION = 0.25
+
+NUMBER = re.compile(r"^\s*(-?\d+(?:\.\d+)?)")
+# Ages, like "45s", "3h12m", or "2y100d", which is how Tables show dates
+DURATION = re.compile(r"(\d+)([smhdy])")
+DURATION_SECONDS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60, "y": 365 * 24 * 60 * 60}
+
+
+def cell_key(column: Mapping[str, Any], cell: str) -> tuple[int, Any]:
+    """
+    A key that sorts cells by what they mean, according to their column's type,
+    e.g., so that "10" sorts after "9" in an integer column, and "2d" after "3h" in a date column.
+    Cells that can't be understood (e.g., "<unknown>") sort after those that can.
+    """
+    match column.get("type"), column.get("name"):
+        case "integer" | "number", _:
+            # Integers can have notes after them, e.g., restarts are like "3 (5m ago)"
+            if (m := NUMBER.match(cell)) is not None:
+                return 0, float(m.group(1))
+        # Built-in resources' Age columns are strings, but CRDs' date columns are shown the same way
+        case ("date", _) | ("string", "Age"):
+            if parts := DURATION.findall(cell):
+                return 0, sum(int(n) * DURATION_SECONDS[unit] for n, unit in parts)
+        case _, _:
+            return 0, cell
+
+    return 1, cell
+
+
+@dataclass(slots=True)
+class SortedRows:
+    """
+    The rows of a Table, ordered by one of its columns.
+
+    The order is kept up to date incrementally: when the Table changes,
+    only the rows that changed (which, unlike the unchanged ones, are new Row objects)
+    are re-inserted into it, by bisection.
+    """
+
+    column: int
+    descending: bool = False
+    table: Table = field(default_factory=Table)
+    keys: list[SortKey] = field(default_factory=list)  # ascending
+    by_row: dict[tuple[str, str], SortKey] = field(default_factory=dict)
+
+    def key(self, row: Row) -> SortKey:
+        column = self.table.columns[self.column] if self.column < len(self.table.columns) else {}
+        cell = row.cells[self.column] if self.column < len(row.cells) else ""
+        return (*cell_key(column, cell), row.key)
+
+    def update(self, table: Table) -> None:
+        if table is self.table:
+            return
+
+        old, self.table = self.table, table
+
+        if table.columns != old.columns:
+            self._resort()
+            return
+
+        if len(table.rows) == len(old.rows):
+            # Usually rows were only modified in place, so comparing by position finds them quickly
+            # (and any that moved are just re-inserted where they already were)
+            changed = [new for prev, new in zip(old.rows, table.rows) if prev is not new]
+        else:
+            changed = [
+                row
+                for row in table.rows
+                if (idx := old.positions.get(row.key)) is None or old.rows[idx] is not row
+            ]
+        added = sum(1 for row in changed if row.key not in old.positions)
+        # Finding deleted rows means looking at every row, so only do it if some were
+        deleted = (
+            [k for k in self.by_row if k not in table.positions]
+            if len(old.rows) + added > len(table.rows)
+            else []
+        )
+
+        if len(changed) + len(deleted) > RESORT_FRACTION * len(table.rows):
+            self._resort()
+            return
+
+        for k in deleted:
+            self._remove(self.by_row.pop(k))
+
+        for row in changed:
+            if (previous := self.by_row.get(row.key)) is not None:
+                self._remove(previous)
+
+            key = self.key(row)
+            self.by_row[row.key] = key
+            insort(self.keys, key)
+
+    def _resort(self) -> None:
+        self.by_row = {row.key: self.key(row) for row in self.table.rows}
+        self.keys = sorted(self.by_row.values())
+
+    def _remove(self, key: SortKey) -> None:
+        del self.keys[bisect_left(self.keys, key)]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __iter__(self) -> Iterator[Row]:
+        rows, positions = self.table.rows, self.table.positions
+        for key in reversed(self.keys) if self.descending else self.keys:
+            yield rows[positions[key[-1]]]
+
+    def __getitem__(self, idx: int) -> Row:
+        key = self.keys[-1 - idx if self.descending else idx]
+        return self.table.rows[self.table.positions[key[-1]]]
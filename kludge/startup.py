@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from time import perf_counter
+
+# Kept free of third-party imports, so that it can be imported (and time things) before any of them
+
+# How long after startup each milestone should be reached by
+BUDGETS = {
+    "first frame": 0.5,
+    "first rows": 1.5,
+}
+
+
+@dataclass(slots=True)
+class StartupProfile:
+    """
+    When each phase of startup finished (e.g., importing the TUI, or painting the first frame),
+    relative to when the profile was created, which is as soon as `kludge.cli` is imported.
+    """
+
+    started: float = field(default_factory=perf_counter)
+    marks: dict[str, float] = field(default_factory=dict)
+
+    def mark(self, name: str) -> None:
+        # Only the first time counts, so marks can be made from code that runs repeatedly
+        if name not in self.marks:
+            self.marks[name] = perf_counter()
+
+    def over_budget(self) -> list[str]:
+        return [
+            name
+            for name, budget in BUDGETS.items()
+            if self.marks.get(name, float("inf")) - self.started > budget
+        ]
+
+    def report(self) -> str:
+        lines = [f"{'since start':>12} {'phase':>8}"]
+        previous = self.started
+        for name, at in self.marks.items():
+            line = f"{(at - self.started) * 1000:9.1f} ms {(at - previous) * 1000:5.1f} ms  {name}"
+            if name in BUDGETS and name in self.over_budget():
+                line += f" (over the {BUDGETS[name] * 1000:.0f} ms budget)"
+            lines.append(line)
+            previous = at
+
+        return "\n".join(lines)
+
+
+PROFILE = StartupProfile()
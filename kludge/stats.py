@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from functools import wraps
+from time import monotonic, perf_counter
+from typing import ParamSpec, TypeVar
+
+from structlog import get_logger
+
+logger = get_logger()
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+WINDOW_SECONDS = 60
+
+
+@dataclass(frozen=True, slots=True)
+class RequestRecord:
+    method: str
+    path: str  # a template, like /api/v1/namespaces/{namespace}/pods/{name}
+    status: int
+    bytes: int
+    latency: float  # seconds until the response headers arrived
+    at: float = field(default_factory=monotonic)
+
+
+@dataclass(frozen=True, slots=True)
+class RenderRecord:
+    component: str
+    elapsed: float
+    at: float = field(default_factory=monotonic)
+
+
+@dataclass(frozen=True, slots=True)
+class Percentiles:
+    p50: float
+    p95: float
+    p99: float
+
+    @classmethod
+    def of(cls, values: Iterable[float]) -> Percentiles:
+        v = sorted(values)
+        if not v:
+            return cls(0, 0, 0)
+
+        def p(q: float) -> float:
+            return v[min(len(v) - 1, int(q * len(v)))]
+
+        return cls(p50=p(0.50), p95=p(0.95), p99=p(0.99))
+
+
+@dataclass(frozen=True, slots=True)
+class Summary:
+    latency: Percentiles
+    requests_per_second: float
+    bytes_per_second: float
+    renders: dict[str, Percentiles]
+
+
+@dataclass(slots=True)
+class Stats:
+    """
+    Rolling records of API requests and component renders over the last `window` seconds.
+    """
+
+    window: float = WINDOW_SECONDS
+    requests: deque[RequestRecord] = field(default_factory=deque)
+    renders: deque[RenderRecord] = field(default_factory=deque)
+
+    def record_request(self, record: RequestRecord) -> None:
+        logger.debug(
+            "request",
+            method=record.method,
+            path=record.path,
+            status=record.status,
+            bytes=record.bytes,
+            latency_ms=f"{record.latency * 1000:.1f}",
+        )
+        self.requests.append(record)
+        self._prune()
+
+    def record_render(self, record: RenderRecord) -> None:
+        logger.debug(
+            "render", component=record.component, elapsed_ms=f"{record.elapsed * 1000:.1f}"
+        )
+        self.renders.append(record)
+        self._prune()
+
+    def _prune(self) -> None:
+        cutoff = monotonic() - self.window
+        for records in (self.requests, self.renders):
+            while records and records[0].at < cutoff:
+                records.popleft()
+
+    def summary(self) -> Summary:
+        self._prune()
+
+        by_component: dict[str, list[float]] = {}
+        for r in self.renders:
+            by_component.setdefault(r.component, []).append(r.elapsed)
+
+        return Summary(
+            latency=Percentiles.of(r.latency for r in self.requests),
+            requests_per_second=len(self.requests) / self.window,
+            bytes_per_second=sum(r.bytes for r in self.requests) / self.window,
+            renders={c: Percentiles.of(e) for c, e in sorted(by_component.items())},
+        )
+
+
+STATS = Stats()
+
+
+def timed(func: Callable[P, R]) -> Callable[P, R]:
+    """
+    Record how long each call to the (component) function takes in `STATS`.
+
+    Apply it underneath `@component`, so that it times the render itself.
+    """
+
+    @wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            STATS.record_render(
+                RenderRecord(component=func.__name__, elapsed=perf_counter() - start)
+            )
+
+    return wrapper
+
+
+def path_template(path: str) -> str:
+    """
+    Replace the namespace and name segments of an API path with placeholders,
+    so that requests for different objects of the same kind are grouped together.
+    """
+    parts = path.split("?", 1)[0].strip("/").split("/")
+
+    match parts:
+        case ["api", _, *rest]:
+            prefix = parts[:2]
+        case ["apis", _, _, *rest]:
+            prefix = parts[:3]
+        case _:
+            return path
+
+    if len(rest) > 2 and rest[0] == "namespaces":
+        rest = ["namespaces", "{namespace}", *rest[2:]]
+        resource_idx = 2
+    else:
+        resource_idx = 0
+
+    if len(rest) > resource_idx + 1:
+        rest = [*rest[: resource_idx + 1], "{name}", *rest[resource_idx + 2 :]]
+
+    return "/" + "/".join((*prefix, *rest))
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from heapq import nsmallest
+from itertools import islice
+
+BOUNDARIES = frozenset("-./_:")
+
+
+# Indexes compare by their options, so that setting state to an index with the same options
+# doesn't trigger a render (and the existing index, with its warm cache, is kept).
+@dataclass(frozen=True, slots=True)
+class Typeahead:
+    options: frozenset[str] = frozenset()
+    by_name: tuple[str, ...] = field(default=(), compare=False)
+    by_length: tuple[str, ...] = field(default=(), compare=False)
+    _last_fuzzy: dict[str, list[str]] = field(default_factory=dict, compare=False)
+
+    @classmethod
+    def build(cls, options: Iterable[str]) -> Typeahead:
+        o = frozenset(options)
+
+        return cls(
+            options=o,
+            by_name=tuple(sorted(o)),
+            by_length=tuple(sorted(o, key=lambda o: (len(o), o))),
+        )
+
+    def __contains__(self, option: str) -> bool:
+        return option in self.options
+
+    def __len__(self) -> int:
+        return len(self.options)
+
+    def prefixed(self, prefix: str, limit: int) -> list[str]:
+        """
+        The shortest `limit` options that start with `prefix`.
+        """
+        if not prefix:
+            return list(self.by_length[:limit])
+
+        start = bisect_left(self.by_name, prefix)
+        stop = bisect_left(self.by_name, prefix + "\U0010ffff", lo=start)
+
+        return nsmallest(limit, islice(self.by_name, start, stop), key=lambda o: (len(o), o))
+
+    def fuzzy(self, pattern: str, limit: int) -> list[str]:
+        """
+        The best `limit` options that contain the characters of `pattern` in order,
+        ranked by how tightly they match.
+
+        Typing usually extends the previous pattern, whose matches are a superset of the new matches,
+        so only those are searched instead of every option.
+        """
+        if not pattern:
+            return list(self.by_length[:limit])
+
+        candidates: Iterable[str] = self.by_name
+        for previous, matches in self._last_fuzzy.items():
+            if pattern.startswith(previous):
+                candidates = matches
+
+        scored = []
+        for o in candidates:
+            score = fuzzy_score(pattern, o)
+            if score is not None:
+                scored.append((-score, len(o), o))
+
+        self._last_fuzzy.clear()
+        self._last_fuzzy[pattern] = [o for _, _, o in scored]
+
+        return [o for _, _, o in nsmallest(limit, scored)]
+
+
+def fuzzy_score(pattern: str, option: str) -> int | None:
+    """
+    Score how well `pattern` matches `option` as a subsequence (higher is better),
+    or return `None` if it doesn't match at all.
+
+    Consecutive characters and characters at the start of a word score higher,
+    and skipped characters score lower.
+    """
+    score = 0
+    pos = 0
+    previous = -2
+
+    for char in pattern:
+        idx = option.find(char, pos)
+        if idx < 0:
+            return None
+
+        if idx == previous + 1:
+            score += 4
+        if idx == 0 or option[idx - 1] in BOUNDARIES:
+            score += 3
+        score -= idx - pos
+
+        previous = idx
+        pos = idx + 1
+
+    return score
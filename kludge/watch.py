@@ -0,0 +1,450 @@
+from __future__ import annotations
+
+from asyncio import sleep
+from collections.abc import AsyncIterator, Callable, Collection, Iterable, Mapping
+from dataclasses import dataclass, field, replace
+from http import HTTPStatus
+from time import monotonic
+from typing import Any
+
+from aiohttp import ClientError, ClientTimeout
+from structlog import get_logger
+
+from kludge.klient import Klient, read_events, resource_version_of, response_error
+
+logger = get_logger()
+
+TABLE_HEADERS = {
+    "Accept": "application/json;as=Table;g=meta.k8s.io;v=v1",  # https://kubernetes.io/docs/reference/using-api/api-concepts/#receiving-resources-as-tables
+}
+
+# The UI only needs the cells and each row's name, which is in the name column,
+# so don't have the API server send (and us decode) each row's metadata or object.
+TABLE_PARAMS = {
+    "includeObject": "None",
+}
+
+# Rows of cluster-wide lists need their namespace, which is only in their object's metadata.
+ALL_NAMESPACES_TABLE_PARAMS = {
+    "includeObject": "Metadata",
+}
+NAMESPACE_COLUMN = {
+    "name": "Namespace",
+    "type": "string",
+    "format": "",
+    "description": "The namespace of the object.",
+    "priority": 0,
+}
+
+WATCH_TIMEOUT_SECONDS = 300
+LIST_PAGE_SIZE = 500  # same as kubectl
+# After the first page of a list has been shown, show the rows listed so far at most this often
+PROGRESSIVE_LIST_INTERVAL = 0.25  # seconds
+
+# How long to wait before listing again after a failure, doubling each time it fails again
+INITIAL_BACKOFF = 1  # seconds
+MAX_BACKOFF = 60
+
+
+class ListFailed(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Row:
+    namespace: str
+    name: str
+    resource_version: str
+    cells: tuple[str, ...]
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.namespace, self.name
+
+    @classmethod
+    def from_json(
+        cls, row: dict[str, Any], name_column: int = 0, namespace_column: bool = False
+    ) -> Row:
+        # Rows listed with includeObject=None don't carry their object,
+        # so the name has to come from the name column, and the namespace is unknown.
+        metadata = (row.get("object") or {}).get("metadata", {})
+        cells = tuple(str(c) for c in row["cells"])
+        if namespace_column:
+            cells = (metadata.get("namespace", ""), *cells)
+
+        return cls(
+            namespace=metadata.get("namespace", ""),
+            name=metadata.get("name", cells[name_column] if cells else ""),
+            resource_version=metadata.get("resourceVersion", ""),
+            cells=cells,
+        )
+
+
+# Tables compare by identity, so that setting state to an unchanged Table doesn't trigger a render
+@dataclass(frozen=True, slots=True, eq=False)
+class Table:
+    columns: tuple[dict[str, Any], ...] = ()
+    rows: tuple[Row, ...] = ()
+    resource_version: str = ""
+    positions: Mapping[tuple[str, str], int] = field(default_factory=dict)
+    widths: tuple[int, ...] = ()  # the widest cell seen in each column
+    namespace_column: bool = False  # whether to prepend a column for each row's namespace
+
+    @classmethod
+    def from_json(cls, j: dict[str, Any], namespace_column: bool = False) -> Table:
+        return cls(namespace_column=namespace_column).extend(j)
+
+    def extend(self, j: dict[str, Any]) -> Table:
+        """
+        A copy of this Table with the rows of a Table's JSON appended, which is how `from_json` builds one.
+
+        Lists don't extend a Table page by page, since that copies every row so far for each page;
+        they collect their pages with `TablePages` instead.
+        """
+        columns = self.columns or _columns(j, self.namespace_column)
+        name_column = _name_column(columns)
+        rows = (
+            *self.rows,
+            *(Row.from_json(r, name_column, self.namespace_column) for r in j.get("rows") or ()),
+        )
+        positions = dict(self.positions)
+        for idx in range(len(self.rows), len(rows)):
+            positions[rows[idx].key] = idx
+
+        return Table(
+            columns=columns,
+            rows=rows,
+            resource_version=self.resource_version
+            or j.get("metadata", {}).get("resourceVersion", ""),
+            positions=positions,
+            widths=_widen(self.widths or tuple(0 for _ in columns), rows[len(self.rows) :]),
+            namespace_column=self.namespace_column,
+        )
+
+    def merge(self, other: Table) -> Table:
+        """
+        Return `other` (e.g., a fresh list of the same collection), reusing this Table's rows
+        where they haven't changed, or this Table itself if nothing changed at all.
+        """
+        if self.columns != other.columns:
+            return other
+
+        rows = tuple(
+            (
+                old
+                if (idx := self.positions.get(new.key)) is not None
+                and (old := self.rows[idx]) == new
+                else new
+            )
+            for new in other.rows
+        )
+
+        if len(rows) == len(self.rows) and all(a is b for a, b in zip(rows, self.rows)):
+            return self
+
+        return replace(other, rows=rows)
+
+    def only(self, keys: Collection[tuple[str, str]]) -> Table:
+        """
+        A Table of just the rows with the given keys (keeping this Table's column widths).
+        """
+        rows = tuple(r for r in self.rows if r.key in keys)
+
+        return replace(self, rows=rows, positions={r.key: idx for idx, r in enumerate(rows)})
+
+    def apply(self, event_type: str, j: dict[str, Any]) -> Table:
+        """
+        Apply a watch event, whose object is a Table holding the changed rows.
+
+        Returns a new Table, or this Table if the event didn't change anything,
+        so that callers can skip re-rendering by checking identity.
+        """
+        rows = list(self.rows)
+        positions = dict(self.positions)
+        upserted = []
+        deleted = False
+        name_column = _name_column(self.columns)
+
+        for r in j.get("rows") or ():
+            row = Row.from_json(r, name_column, self.namespace_column)
+            idx = positions.get(row.key)
+
+            if event_type == "DELETED":
+                if idx is None:
+                    continue
+
+                del rows[idx]
+                del positions[row.key]
+                for later in rows[idx:]:
+                    positions[later.key] -= 1
+                deleted = True
+            elif idx is None:
+                positions[row.key] = len(rows)
+                rows.append(row)
+                upserted.append(row)
+            elif rows[idx] != row:
+                rows[idx] = row
+                upserted.append(row)
+
+        if not (upserted or deleted):
+            return self
+
+        return Table(
+            columns=self.columns or _columns(j, self.namespace_column),
+            rows=tuple(rows),
+            resource_version=resource_version_of(j) or self.resource_version,
+            positions=positions,
+            # Columns don't shrink when their widest row is deleted, which keeps this incremental
+            # (and stops the table from jittering around as rows come and go).
+            widths=_widen(self.widths, upserted),
+            namespace_column=self.namespace_column,
+        )
+
+
+@dataclass(slots=True)
+class TablePages:
+    """
+    Accumulates the pages of a list in place, so that each page only costs as much as its own rows.
+
+    Extending a Table page by page copies all the rows (and positions) listed so far for every page,
+    which adds up to quadratic time for huge collections.
+    """
+
+    namespace_column: bool = False
+    columns: tuple[dict[str, Any], ...] = ()
+    rows: list[Row] = field(default_factory=list)
+    positions: dict[tuple[str, str], int] = field(default_factory=dict)
+    widths: list[int] = field(default_factory=list)
+    resource_version: str = ""
+
+    def add(self, j: dict[str, Any]) -> None:
+        if not self.columns:
+            self.columns = _columns(j, self.namespace_column)
+            self.widths = [0 for _ in self.columns]
+        self.resource_version = self.resource_version or j.get("metadata", {}).get(
+            "resourceVersion", ""
+        )
+
+        start = len(self.rows)
+        name_column = _name_column(self.columns)
+        self.rows.extend(
+            Row.from_json(r, name_column, self.namespace_column) for r in j.get("rows") or ()
+        )
+        for idx in range(start, len(self.rows)):
+            self.positions[self.rows[idx].key] = idx
+
+        _widen_into(self.widths, self.rows[start:])
+
+    def table(self) -> Table:
+        """
+        A Table of the rows listed so far (which later pages don't change).
+        """
+        return Table(
+            columns=self.columns,
+            rows=tuple(self.rows),
+            resource_version=self.resource_version,
+            positions=dict(self.positions),
+            widths=tuple(self.widths),
+            namespace_column=self.namespace_column,
+        )
+
+
+def _columns(j: dict[str, Any], namespace_column: bool) -> tuple[dict[str, Any], ...]:
+    columns = tuple(j.get("columnDefinitions") or ())
+    return (NAMESPACE_COLUMN, *columns) if namespace_column and columns else columns
+
+
+def _name_column(columns: tuple[dict[str, Any], ...]) -> int:
+    return next((idx for idx, c in enumerate(columns) if c.get("format") == "name"), 0)
+
+
+def _widen(widths: tuple[int, ...], rows: Iterable[Row]) -> tuple[int, ...]:
+    w = list(widths)
+    _widen_into(w, rows)
+    return tuple(w)
+
+
+def _widen_into(w: list[int], rows: Iterable[Row]) -> None:
+    for row in rows:
+        if len(row.cells) > len(w):
+            w.extend(0 for _ in range(len(row.cells) - len(w)))
+
+        for idx, cell in enumerate(row.cells):
+            if len(cell) > w[idx]:
+                w[idx] = len(cell)
+
+
+async def list_and_watch(
+    klient: Klient,
+    path: str,
+    watch: bool = True,
+    poll_interval: float = 1,
+    label_selector: str = "",
+    field_selector: str = "",
+    namespace_column: bool = False,
+    initial: Table | None = None,
+    on_error: Callable[[str | None], None] = lambda error: None,
+) -> AsyncIterator[Table]:
+    """
+    Yield the Table for the collection at `path`, then yield a new Table every time it changes.
+    The same Table is yielded again when it is confirmed to be unchanged
+    (by a bookmark, or by a relist that found no differences).
+
+    The collection is listed once, in pages of `LIST_PAGE_SIZE` rows,
+    and then watched from the list's resourceVersion,
+    with each event applied incrementally to the previous Table.
+    If the watch expires (410 Gone), the collection is listed again.
+    If a request fails (or its connection does), `on_error` is called with why,
+    and the collection is listed again after an exponential backoff;
+    once it is listed and watched again, `on_error` is called with `None`.
+    Collections that don't support watching are re-listed every `poll_interval` seconds instead.
+
+    The selectors are passed through to the API server, so only matching rows are sent.
+
+    With `namespace_column`, each row's namespace is prepended to its cells,
+    for cluster-wide lists of namespaced resources.
+
+    If an `initial` Table is given (e.g., a cached one), the first list is treated as a relist of it.
+    """
+    table = initial or Table(namespace_column=namespace_column)
+    resource_version = None
+    backoff = INITIAL_BACKOFF
+    failed = False
+
+    base_params = dict(ALL_NAMESPACES_TABLE_PARAMS if namespace_column else TABLE_PARAMS)
+    if label_selector:
+        base_params["labelSelector"] = label_selector
+    if field_selector:
+        base_params["fieldSelector"] = field_selector
+
+    while True:
+        try:
+            if resource_version is None:
+                # List the collection in pages. On the first list, yield as soon as the first page
+                # arrives (and then every so often), so that the first rows can be shown
+                # without waiting for the entire collection.
+                # On relists, only yield the complete table, so that rows don't disappear and reappear,
+                # and merge it into the previous table, so that unchanged rows (or tables) are reused.
+                # `table` is only replaced once the list is complete, so that if it fails part way,
+                # the next list starts from the last complete table.
+                progressive = not table.rows
+                pages = TablePages(namespace_column=namespace_column)
+                yielded_at: float | None = None
+                params = {**base_params, "limit": str(LIST_PAGE_SIZE)}
+                while True:
+                    async with await klient.request(
+                        method="get", path=path, headers=TABLE_HEADERS, params=params
+                    ) as r:
+                        if r.status == HTTPStatus.GONE:  # the continue token expired, so start over
+                            pages = TablePages(namespace_column=namespace_column)
+                            params = {**base_params, "limit": str(LIST_PAGE_SIZE)}
+                            continue
+                        elif r.status != HTTPStatus.OK:
+                            raise ListFailed(await response_error(r))
+
+                        page = await r.json()
+
+                    if (
+                        not progressive
+                        and not pages.rows
+                        and table.resource_version
+                        and page.get("metadata", {}).get("resourceVersion")
+                        == table.resource_version
+                    ):
+                        # Nothing has changed since the previous list, so don't bother with the rest of it
+                        listed = table
+                        break
+
+                    pages.add(page)
+                    token = page.get("metadata", {}).get("continue")
+
+                    if not token:
+                        listed = pages.table()
+                        if progressive:
+                            yield listed
+                        break
+
+                    if progressive and (
+                        yielded_at is None or monotonic() - yielded_at >= PROGRESSIVE_LIST_INTERVAL
+                    ):
+                        yield pages.table()
+                        yielded_at = monotonic()
+
+                    params = {**base_params, "limit": str(LIST_PAGE_SIZE), "continue": token}
+
+                # Take the resourceVersion before merging, since the merged table may be the previous one
+                resource_version = listed.resource_version
+
+                if progressive:
+                    table = listed
+                else:
+                    table = table.merge(listed)
+                    yield table
+
+            if not watch:
+                backoff = INITIAL_BACKOFF
+                if failed:
+                    failed = False
+                    on_error(None)
+
+                await sleep(poll_interval)
+                resource_version = None
+                continue
+
+            async with await klient.request(
+                method="get",
+                path=path,
+                headers=TABLE_HEADERS,
+                params={
+                    **base_params,
+                    "watch": "1",
+                    "resourceVersion": resource_version,
+                    "allowWatchBookmarks": "true",
+                    "timeoutSeconds": str(WATCH_TIMEOUT_SECONDS),
+                },
+                timeout=ClientTimeout(total=None, sock_read=WATCH_TIMEOUT_SECONDS + 30),
+            ) as r:
+                if r.status == HTTPStatus.GONE:
+                    resource_version = None
+                    continue
+                elif r.status != HTTPStatus.OK:
+                    raise ListFailed(await response_error(r))
+
+                # Only a working watch shows that the failures (if any) are over
+                backoff = INITIAL_BACKOFF
+                if failed:
+                    failed = False
+                    on_error(None)
+
+                async for event in read_events(r):
+                    match event["type"]:
+                        case "ADDED" | "MODIFIED" | "DELETED" as t:
+                            new = table.apply(t, event["object"])
+                            resource_version = (
+                                resource_version_of(event["object"]) or resource_version
+                            )
+
+                            if new is not table:
+                                table = new
+                                yield table
+                        case "BOOKMARK":
+                            resource_version = (
+                                resource_version_of(event["object"]) or resource_version
+                            )
+                            yield table  # unchanged, but now known to be up-to-date
+                        case "ERROR":
+                            # The object is a Status; 410 Gone means our resourceVersion is too old,
+                            # and anything else leaves us unsure of what we missed, so relist either way.
+                            logger.debug("watch error", path=path, status=event["object"])
+                            resource_version = None
+                            break
+        except (ListFailed, ClientError, TimeoutError) as e:
+            # e.g., the user may not list this resource, the connection dropped,
+            # or the API server is restarting, so wait a bit (longer each time) and then relist,
+            # since events may have been missed
+            logger.warning("list or watch failed", path=path, error=repr(e), retry_in=backoff)
+            failed = True
+            on_error(str(e) or type(e).__name__)
+            await sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+            resource_version = None
@@ -5,3 +5,11 @@ from typer.testing import CliRunner
 @pytest.fixture
 def runner() -> CliRunner:
     return CliRunner()
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--bench-json",
+        default=None,
+        help="Write the results of the benchmarks to this path as JSON.",
+    )
@@ -0,0 +1,530 @@
+"""
+A stand-in for a Kubernetes API server, serving a synthetic cluster
+with configurable numbers of API groups, CRDs, namespaces, and pods.
+
+It implements just enough of the API for kludge to run against it:
+legacy and aggregated discovery (revalidated with ETags), listing namespaces, listing and watching pods as Tables
+(in one namespace or across all of them) or as objects, and getting, patching, deleting, and logging pods.
+Watches stream whatever events the test scripts for them.
+"""
+
+from __future__ import annotations
+
+import json
+from asyncio import sleep
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import cached_property
+from typing import Any
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from kludge.diskovery import Resource
+from kludge.klient import Klient
+from kludge.konfig import Konfig
+
+POD_COLUMNS = [
+    {"name": "Name", "type": "string", "format": "name", "priority": 0},
+    {"name": "Ready", "type": "string", "format": "", "priority": 0},
+    {"name": "Status", "type": "string", "format": "", "priority": 0},
+    {"name": "Restarts", "type": "integer", "format": "", "priority": 0},
+    {"name": "Age", "type": "string", "format": "", "priority": 0},
+    {"name": "IP", "type": "string", "format": "", "priority": 1},
+    {"name": "Node", "type": "string", "format": "", "priority": 1},
+]
+
+RESOURCE_VERSION = "1000"
+
+POD = Resource(
+    core=True,
+    groupVersion="v1",
+    name="pods",
+    kind="Pod",
+    singularName="pod",
+    namespaced=True,
+    shortNames=("po",),
+    verbs=("get", "list", "watch"),
+)
+
+
+@dataclass(frozen=True)
+class FakeCluster:
+    groups: int = 10
+    crds_per_group: int = 5
+    namespaces: int = 10
+    pods: int = 100  # per namespace
+    aggregated_discovery: bool = True
+    latency: float = 0  # seconds, per request
+    log_lines: int = 100  # per container
+    edited: dict[tuple[str, str], dict[str, Any]] = field(default_factory=dict, compare=False)
+    deleted: set[tuple[str, str]] = field(default_factory=set, compare=False)
+    # How many more times to rate-limit requests to change each pod
+    throttled: dict[tuple[str, str], int] = field(default_factory=dict, compare=False)
+    # Continue tokens (of lists of pods) that have expired
+    expired: set[str] = field(default_factory=set, compare=False)
+    # How many more times to drop each pod's log stream partway through
+    dropped_logs: dict[tuple[str, str], int] = field(default_factory=dict, compare=False)
+    # Paths that the user isn't allowed to get (or list, or watch)
+    forbidden: set[str] = field(default_factory=set, compare=False)
+    # Paths whose requests are answered by something in front of the API server (e.g., a load balancer),
+    # which doesn't answer with JSON
+    unavailable: set[str] = field(default_factory=set, compare=False)
+    # Paths whose requests get their connection closed instead of a response
+    dropped: set[str] = field(default_factory=set, compare=False)
+    # What each watch of pods (in turn) does: stream some events (where None drops the connection),
+    # or fail with a status. Once these run out, nothing ever changes, so watches just end.
+    watches: list[list[dict[str, Any] | None] | int] = field(default_factory=list, compare=False)
+    # Every request's method, path, and query, in the order they were received
+    requests: list[tuple[str, str, dict[str, str]]] = field(default_factory=list, compare=False)
+
+    @cached_property
+    def pod_rows(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "cells": [
+                    f"pod-{i}",
+                    "1/1",
+                    "Running" if i % 7 else "CrashLoopBackOff",
+                    i % 13,
+                    f"{i % 90}d",
+                    f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+                    f"node-{i % 50}",
+                ]
+            }
+            for i in range(self.pods)
+        ]
+
+    @cached_property
+    def all_pod_rows(self) -> list[dict[str, Any]]:
+        return [
+            {
+                **r,
+                "object": {
+                    "kind": "PartialObjectMetadata",
+                    "apiVersion": "meta.k8s.io/v1",
+                    "metadata": {
+                        "name": r["cells"][0],
+                        "namespace": f"ns-{n}",
+                        "resourceVersion": RESOURCE_VERSION,
+                    },
+                },
+            }
+            for n in range(self.namespaces)
+            for r in self.pod_rows
+        ]
+
+    @cached_property
+    def pod_objects(self) -> list[dict[str, Any]]:
+        # Each pod is owned by one of five ReplicaSets in its namespace, and labelled to match
+        return [
+            {
+                "kind": "Pod",
+                "apiVersion": "v1",
+                "metadata": {
+                    "name": f"pod-{i}",
+                    "namespace": f"ns-{n}",
+                    "uid": f"uid-ns-{n}-pod-{i}",
+                    "resourceVersion": RESOURCE_VERSION,
+                    "labels": {"app": f"app-{i % 5}"},
+                    "ownerReferences": [
+                        {
+                            "kind": "ReplicaSet",
+                            "name": f"rs-{i % 5}",
+                            "uid": f"uid-ns-{n}-rs-{i % 5}",
+                        }
+                    ],
+                },
+            }
+            for n in range(self.namespaces)
+            for i in range(self.pods)
+        ]
+
+    def group_names(self) -> list[str]:
+        return [f"group-{g}.example.com" for g in range(self.groups)]
+
+    def konfig(self, server: str) -> Konfig:
+        return Konfig.model_validate(
+            {
+                "apiVersion": "v1",
+                "clusters": [{"name": "fake", "cluster": {"server": server}}],
+                "users": [{"name": "fake", "user": {}}],
+            }
+        )
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._latency, self._authorize])
+        app.router.add_get("/api", self._api)
+        app.router.add_get("/api/v1", self._core_resources)
+        app.router.add_get("/apis", self._apis)
+        app.router.add_get("/apis/{group}/{version}", self._group_resources)
+        app.router.add_get("/api/v1/namespaces", self._namespaces)
+        app.router.add_get("/api/v1/pods", self._pods)
+        app.router.add_get("/api/v1/namespaces/{namespace}/pods", self._pods)
+        app.router.add_get("/api/v1/namespaces/{namespace}/pods/{name}", self._pod)
+        app.router.add_patch("/api/v1/namespaces/{namespace}/pods/{name}", self._patch_pod)
+        app.router.add_delete("/api/v1/namespaces/{namespace}/pods/{name}", self._delete_pod)
+        app.router.add_get("/api/v1/namespaces/{namespace}/pods/{name}/log", self._log)
+        return app
+
+    @web.middleware
+    async def _latency(self, request: web.Request, handler: Any) -> web.StreamResponse:
+        if self.latency:
+            await sleep(self.latency)
+
+        response: web.StreamResponse = await handler(request)
+        return response
+
+    @web.middleware
+    async def _authorize(self, request: web.Request, handler: Any) -> web.StreamResponse:
+        self.requests.append((request.method, request.path, dict(request.query)))
+
+        if request.path in self.dropped:
+            assert request.transport is not None
+            request.transport.close()
+            return web.Response()
+        elif request.path in self.unavailable:
+            return web.Response(
+                status=503,
+                text="<html><h1>Service Unavailable</h1></html>",
+                content_type="text/html",
+            )
+        elif request.path in self.forbidden:
+            return web.json_response(
+                {
+                    "kind": "Status",
+                    "status": "Failure",
+                    "message": f"cannot {request.method.lower()} {request.path}",
+                    "reason": "Forbidden",
+                    "code": 403,
+                },
+                status=403,
+            )
+
+        response: web.StreamResponse = await handler(request)
+        return response
+
+    def _wants_aggregated(self, request: web.Request) -> bool:
+        return self.aggregated_discovery and "apidiscovery.k8s.io" in request.headers.get(
+            "Accept", ""
+        )
+
+    def _core(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "name": "pods",
+                "singularName": "pod",
+                "namespaced": True,
+                "kind": "Pod",
+                "verbs": ["get", "list", "watch"],
+                "shortNames": ["po"],
+            },
+            {
+                "name": "namespaces",
+                "singularName": "namespace",
+                "namespaced": False,
+                "kind": "Namespace",
+                "verbs": ["get", "list", "watch"],
+                "shortNames": ["ns"],
+            },
+        ]
+
+    def _crds(self, group: str) -> list[dict[str, Any]]:
+        prefix = group.split(".")[0].replace("-", "")
+        return [
+            {
+                "name": f"{prefix}things{c}",
+                "singularName": f"{prefix}thing{c}",
+                "namespaced": True,
+                "kind": f"Thing{c}",
+                "verbs": ["get", "list", "watch"],
+            }
+            for c in range(self.crds_per_group)
+        ]
+
+    @staticmethod
+    def _aggregated(group: str, resources: list[dict[str, Any]]) -> dict[str, Any]:
+        return {
+            "metadata": {"name": group},
+            "versions": [
+                {
+                    "version": "v1",
+                    "resources": [
+                        {
+                            "resource": r["name"],
+                            "responseKind": {"group": group, "version": "v1", "kind": r["kind"]},
+                            "scope": "Namespaced" if r["namespaced"] else "Cluster",
+                            "singularResource": r["singularName"],
+                            "shortNames": r.get("shortNames", []),
+                            "verbs": r["verbs"],
+                        }
+                        for r in resources
+                    ],
+                }
+            ],
+        }
+
+    @staticmethod
+    def _unless_matches(request: web.Request, etag: str, j: dict[str, Any]) -> web.Response:
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        return web.json_response(j, headers={"ETag": etag})
+
+    async def _api(self, request: web.Request) -> web.Response:
+        if self._wants_aggregated(request):
+            return self._unless_matches(
+                request,
+                '"core"',
+                {"kind": "APIGroupDiscoveryList", "items": [self._aggregated("", self._core())]},
+            )
+
+        return web.json_response({"kind": "APIVersions", "versions": ["v1"]})
+
+    async def _core_resources(self, request: web.Request) -> web.Response:
+        return web.json_response({"kind": "APIResourceList", "resources": self._core()})
+
+    async def _apis(self, request: web.Request) -> web.Response:
+        if self._wants_aggregated(request):
+            return self._unless_matches(
+                request,
+                # Changes whenever the groups do
+                f'"groups-{self.groups}-{self.crds_per_group}"',
+                {
+                    "kind": "APIGroupDiscoveryList",
+                    "items": [self._aggregated(g, self._crds(g)) for g in self.group_names()],
+                },
+            )
+
+        return web.json_response(
+            {
+                "kind": "APIGroupList",
+                "groups": [
+                    {"name": g, "preferredVersion": {"groupVersion": f"{g}/v1", "version": "v1"}}
+                    for g in self.group_names()
+                ],
+            }
+        )
+
+    async def _group_resources(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {"kind": "APIResourceList", "resources": self._crds(request.match_info["group"])}
+        )
+
+    async def _namespaces(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "kind": "NamespaceList",
+                "items": [{"metadata": {"name": f"ns-{n}"}} for n in range(self.namespaces)],
+            }
+        )
+
+    async def _pods(self, request: web.Request) -> web.StreamResponse:
+        if request.query.get("watch"):
+            return await self._watch(request)
+        elif request.query.get("continue") in self.expired:
+            return web.json_response(
+                {
+                    "kind": "Status",
+                    "status": "Failure",
+                    "message": "The provided continue parameter is too old",
+                    "reason": "Expired",
+                    "code": 410,
+                },
+                status=410,
+            )
+
+        if "as=Table" not in request.headers.get("Accept", ""):
+            return self._pod_objects(request)
+
+        rows = self.pod_rows if "namespace" in request.match_info else self.all_pod_rows
+
+        limit = int(request.query.get("limit", 0)) or len(rows)
+        start = int(request.query.get("continue", 0))
+        stop = start + limit
+
+        return web.Response(
+            text=json.dumps(
+                {
+                    "kind": "Table",
+                    "apiVersion": "meta.k8s.io/v1",
+                    "metadata": {
+                        "resourceVersion": RESOURCE_VERSION,
+                        "continue": str(stop) if stop < len(rows) else "",
+                    },
+                    "columnDefinitions": POD_COLUMNS,
+                    "rows": (
+                        rows[start:stop]
+                        if request.query.get("includeObject") == "Metadata"
+                        else [{"cells": r["cells"]} for r in rows[start:stop]]
+                    ),
+                }
+            ),
+            content_type="application/json",
+        )
+
+    async def _watch(self, request: web.Request) -> web.StreamResponse:
+        events = self.watches.pop(0) if self.watches else []
+        if isinstance(events, int):
+            return web.json_response({"kind": "Status", "code": events}, status=events)
+
+        response = web.StreamResponse()
+        await response.prepare(request)
+
+        for event in events:
+            if event is None:
+                assert request.transport is not None
+                request.transport.close()
+                return response
+
+            await response.write(json.dumps(event).encode() + b"\n")
+
+        return response
+
+    def _pod_objects(self, request: web.Request) -> web.Response:
+        namespace = request.match_info.get("namespace")
+        items = [
+            p
+            for p in self.pod_objects
+            if namespace is None or p["metadata"]["namespace"] == namespace
+        ]
+
+        limit = int(request.query.get("limit", 0)) or len(items)
+        start = int(request.query.get("continue", 0))
+        stop = start + limit
+
+        return web.json_response(
+            {
+                "kind": "PodList",
+                "apiVersion": "v1",
+                "metadata": {
+                    "resourceVersion": RESOURCE_VERSION,
+                    "continue": str(stop) if stop < len(items) else "",
+                },
+                "items": items[start:stop],
+            }
+        )
+
+    def pod(self, namespace: str, name: str) -> dict[str, Any]:
+        return self.edited.get(
+            (namespace, name),
+            {
+                "kind": "Pod",
+                "apiVersion": "v1",
+                "metadata": {"name": name, "namespace": namespace, "resourceVersion": "1"},
+                "spec": {"containers": [{"name": "main"}, {"name": "sidecar"}]},
+            },
+        )
+
+    def edit(self, namespace: str, name: str, patch: dict[str, Any]) -> dict[str, Any]:
+        pod = _merge(self.pod(namespace, name), patch)
+        pod["metadata"]["resourceVersion"] = str(int(pod["metadata"]["resourceVersion"]) + 1)
+        self.edited[namespace, name] = pod
+        return pod
+
+    async def _pod(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            self.pod(request.match_info["namespace"], request.match_info["name"])
+        )
+
+    def _throttle(self, request: web.Request) -> web.Response | None:
+        key = request.match_info["namespace"], request.match_info["name"]
+        if self.throttled.get(key, 0) <= 0:
+            return None
+
+        self.throttled[key] -= 1
+        return web.json_response(
+            {"kind": "Status", "code": 429}, status=429, headers={"Retry-After": "0"}
+        )
+
+    async def _delete_pod(self, request: web.Request) -> web.Response:
+        if (throttled := self._throttle(request)) is not None:
+            return throttled
+
+        key = request.match_info["namespace"], request.match_info["name"]
+        if key in self.deleted:
+            return web.json_response({"kind": "Status", "code": 404}, status=404)
+
+        self.deleted.add(key)
+        return web.json_response(self.pod(*key))
+
+    async def _patch_pod(self, request: web.Request) -> web.Response:
+        if (throttled := self._throttle(request)) is not None:
+            return throttled
+
+        if request.content_type != "application/merge-patch+json":
+            return web.json_response({"kind": "Status", "code": 415}, status=415)
+
+        namespace, name = request.match_info["namespace"], request.match_info["name"]
+        patch = await request.json()
+
+        expected = patch.get("metadata", {}).pop("resourceVersion", None)
+        if (
+            expected is not None
+            and expected != self.pod(namespace, name)["metadata"]["resourceVersion"]
+        ):
+            return web.json_response(
+                {"kind": "Status", "status": "Failure", "reason": "Conflict", "code": 409},
+                status=409,
+            )
+
+        return web.json_response(self.edit(namespace, name, patch))
+
+    async def _log(self, request: web.Request) -> web.StreamResponse:
+        key = (request.match_info["namespace"], request.match_info["name"])
+        container = request.query.get("container", "main")
+        tail = int(request.query.get("tailLines", self.log_lines))
+        # Each line is a microsecond after the last, from midnight
+        since = (
+            datetime.fromisoformat(request.query["sinceTime"]).microsecond
+            if "sinceTime" in request.query
+            else 0
+        )
+
+        response = web.StreamResponse()
+        await response.prepare(request)
+
+        # Send the lines in a few chunks, which don't line up with the line breaks
+        text = "".join(
+            f"2024-01-01T00:00:00.{i:06}Z {container} line {i}\n"
+            for i in range(max(since, self.log_lines - tail), self.log_lines)
+        ).encode()
+        for start in range(0, len(text), 4096):
+            if start and self.dropped_logs.get(key, 0):
+                self.dropped_logs[key] -= 1
+                assert request.transport is not None
+                request.transport.close()
+                return response
+
+            await response.write(text[start : start + 4096])
+
+        return response
+
+
+def _merge(target: Any, patch: Any) -> Any:
+    # https://datatracker.ietf.org/doc/html/rfc7386#section-2
+    if not isinstance(patch, dict):
+        return patch
+
+    merged = dict(target) if isinstance(target, dict) else {}
+    for k, v in patch.items():
+        if v is None:
+            merged.pop(k, None)
+        else:
+            merged[k] = _merge(merged.get(k), v)
+
+    return merged
+
+
+@asynccontextmanager
+async def serve(cluster: FakeCluster) -> AsyncIterator[Klient]:
+    server = TestServer(cluster.app())
+    await server.start_server()
+
+    try:
+        async with Klient(cluster.konfig(str(server.make_url("")))) as klient:
+            yield klient
+    finally:
+        await server.close()
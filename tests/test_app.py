@@ -0,0 +1,140 @@
+from asyncio import sleep
+from functools import partial
+from pathlib import Path
+
+import pytest
+from counterweight.app import app
+from counterweight.controls import Quit, Suspend
+from counterweight.events import KeyPressed
+from counterweight.keys import Key
+
+from kludge import kache
+from kludge.app import pager, resource_table, root
+from kludge.diskovery import Discovery, discover_resources
+from kludge.klient import Klient, Klients
+from kludge.konfig import Konfig
+from kludge.utils import now
+from kludge.watch import Table
+from tests.fake_api import POD, POD_COLUMNS, RESOURCE_VERSION, FakeCluster, serve
+
+
+async def test_keys_do_nothing_when_search_matches_nothing() -> None:
+    table = Table.from_json(
+        {
+            "metadata": {"resourceVersion": RESOURCE_VERSION},
+            "columnDefinitions": POD_COLUMNS,
+            "rows": FakeCluster(pods=10).pod_rows,
+        }
+    )
+    shown: list[object] = []
+    capturing: list[bool] = []
+
+    await app(
+        lambda: resource_table(
+            klient=None,  # type: ignore[arg-type] # not used, since nothing is selected
+            names_to_resources={"pods": POD},
+            selected_resource="pods",
+            selected_namespace="ns-0",
+            selectors="",
+            owner=None,
+            owner_error=None,
+            resource_error=None,
+            show_owned=shown.append,
+            show_logs=shown.append,
+            resources=table,
+            last_fetch=now(),
+            use_utc=True,
+            wide=False,
+            focused=True,
+            set_capturing=capturing.append,
+        ),
+        headless=True,
+        dimensions=(100, 20),
+        autopilot=[
+            *(
+                KeyPressed(key=k)
+                for k in ("/", *"nope", Key.Enter, Key.Space, Key.ShiftDown, "D", "L", "A")
+            ),
+            *(KeyPressed(key=k) for k in ("l", "o", "y", "j", "e", Key.Down, Key.End)),
+            Quit(),
+        ],
+    )
+
+    assert shown == []
+    assert capturing == [True, False]  # just for the search, not for any prompts
+
+
+async def test_switching_to_unusable_contexts(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(kache, "CACHE_DIR", tmp_path)
+
+    failures: dict[str, str] = {}
+
+    async def discover(klient: Klient, cached: Discovery | None = None) -> Discovery:
+        try:
+            return await discover_resources(klient, cached=cached)
+        except Exception as e:
+            failures[klient.context_name] = type(e).__name__
+            raise
+
+    monkeypatch.setattr("kludge.app.discover_resources", discover)
+
+    def wait() -> Suspend:
+        return Suspend(handler=partial(sleep, 0.2))
+
+    async with serve(FakeCluster(namespaces=1, pods=1)) as klient:
+        konfig = Konfig.model_validate(
+            {
+                "apiVersion": "v1",
+                "current-context": "a",
+                "contexts": [
+                    {"name": n, "context": {"cluster": n, "user": n}} for n in ("a", "b", "c")
+                ],
+                "clusters": [
+                    {"name": "a", "cluster": {"server": klient.server}},
+                    # Nothing listens on port 1
+                    {"name": "b", "cluster": {"server": "http://127.0.0.1:1"}},
+                    {"name": "c", "cluster": {"server": "https://127.0.0.1:1"}},
+                ],
+                # c's user has no client certificate, which is the only kind of credentials supported
+                "users": [{"name": n, "user": {}} for n in ("a", "b", "c")],
+            }
+        )
+
+        # The app keeps running (until it quits), rather than crashing
+        async with Klients(konfig) as klients:
+            await app(
+                partial(root, klients=klients),
+                headless=True,
+                dimensions=(200, 50),
+                autopilot=[
+                    wait(),
+                    KeyPressed(key=Key.BackTab),  # to the contexts
+                    KeyPressed(key=Key.Delete),  # clears the filter
+                    KeyPressed(key="b"),
+                    wait(),
+                    KeyPressed(key=Key.Delete),
+                    KeyPressed(key="c"),
+                    wait(),
+                    Quit(),
+                ],
+            )
+
+    assert failures == {"b": "ClientConnectorError", "c": "KlientFailed"}
+
+
+def test_pager_exits_when_writing_fails(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("PAGER", "cat")
+
+    # e.g., fetching the object failed partway through, which shouldn't leave the pager waiting for more
+    with pytest.raises(RuntimeError), pager() as stdin:
+        stdin.write(b"partial\n")
+        raise RuntimeError()
+
+
+def test_pager_quit_early(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("PAGER", "true")  # exits without reading anything
+
+    with pager() as stdin:
+        stdin.write(b"x" * 1_000_000)
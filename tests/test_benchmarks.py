@@ -0,0 +1,229 @@
+"""
+Benchmarks for startup and the hot paths (discovery, listing, and rendering),
+run against the fake API server in `fake_api`.
+
+Run them with `just bench`, which writes the results as JSON for comparison across commits.
+"""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+import tracemalloc
+from asyncio import sleep
+from collections.abc import Iterator
+from functools import partial
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import pytest
+from counterweight.app import app
+from counterweight.controls import Quit, Suspend
+from counterweight.events import KeyPressed
+from counterweight.keys import Key
+
+from kludge import kache
+from kludge.app import resource_table, root
+from kludge.diskovery import ALL_NAMESPACES, discover_resources
+from kludge.klient import Klient, Klients
+from kludge.search import RowSearch
+from kludge.startup import PROFILE
+from kludge.utils import now
+from kludge.watch import Table, list_and_watch
+from tests.fake_api import POD, POD_COLUMNS, RESOURCE_VERSION, FakeCluster, serve
+
+pytestmark = pytest.mark.slow
+
+ROWS = [100, 1_000, 10_000, 100_000]
+
+
+@pytest.fixture(scope="session")
+def results(request: pytest.FixtureRequest) -> Iterator[list[dict[str, Any]]]:
+    r: list[dict[str, Any]] = []
+
+    yield r
+
+    if path := request.config.getoption("--bench-json"):
+        Path(path).write_text(json.dumps(r, indent=2))
+
+
+def record(results: list[dict[str, Any]], name: str, **measurements: Any) -> None:
+    results.append({"benchmark": name, **measurements})
+
+
+@pytest.mark.parametrize("aggregated", [True, False])
+@pytest.mark.parametrize("groups", [10, 100])
+async def test_discover_resources(
+    results: list[dict[str, Any]], aggregated: bool, groups: int
+) -> None:
+    cluster = FakeCluster(groups=groups, aggregated_discovery=aggregated, latency=0.005)
+
+    async with serve(cluster) as klient:
+        start = perf_counter()
+        discovery = await discover_resources(klient)
+        elapsed = perf_counter() - start
+
+    assert len(discovery.resources) == 2 + groups * cluster.crds_per_group
+
+    record(
+        results,
+        "discover_resources",
+        aggregated=aggregated,
+        groups=groups,
+        seconds=elapsed,
+    )
+
+
+async def list_all(klient: Klient, rows: int) -> Table:
+    async for table in list_and_watch(klient, path=POD.collection_url("ns-0")):
+        if len(table.rows) == rows:
+            return table
+
+    raise Exception("Unreachable!")
+
+
+@pytest.mark.parametrize("rows", ROWS)
+async def test_list(results: list[dict[str, Any]], rows: int) -> None:
+    cluster = FakeCluster(pods=rows)
+    cluster.pod_rows  # build the fake data outside of the measurement
+
+    async with serve(cluster) as klient:
+        start = perf_counter()
+        table = await list_all(klient, rows)
+        elapsed = perf_counter() - start
+
+        tracemalloc.start()
+        try:
+            await list_all(klient, rows)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    assert table.rows[-1].name == f"pod-{rows - 1}"
+
+    record(results, "list", rows=rows, seconds=elapsed, peak_bytes=peak)
+
+
+@pytest.mark.parametrize("namespaces", [10, 100])
+async def test_list_all_namespaces(results: list[dict[str, Any]], namespaces: int) -> None:
+    cluster = FakeCluster(namespaces=namespaces, pods=100)
+    rows = len(cluster.all_pod_rows)
+
+    async with serve(cluster) as klient:
+        start = perf_counter()
+        async for table in list_and_watch(
+            klient, path=POD.collection_url(ALL_NAMESPACES), namespace_column=True
+        ):
+            if len(table.rows) == rows:
+                break
+        elapsed = perf_counter() - start
+
+    assert table.rows[-1].namespace == f"ns-{namespaces - 1}"
+
+    record(results, "list_all_namespaces", namespaces=namespaces, rows=rows, seconds=elapsed)
+
+
+def pod_table(rows: int) -> Table:
+    return Table.from_json(
+        {
+            "metadata": {"resourceVersion": RESOURCE_VERSION},
+            "columnDefinitions": POD_COLUMNS,
+            "rows": FakeCluster(pods=rows).pod_rows,
+        }
+    )
+
+
+@pytest.mark.parametrize("rows", ROWS)
+async def test_render(results: list[dict[str, Any]], rows: int) -> None:
+    table = pod_table(rows)
+    frames = 50
+
+    start = perf_counter()
+    await app(
+        lambda: resource_table(
+            klient=None,  # type: ignore[arg-type] # not used for rendering
+            names_to_resources={"pods": POD},
+            selected_resource="pods",
+            selected_namespace="ns-0",
+            selectors="",
+            owner=None,
+            owner_error=None,
+            resource_error=None,
+            show_owned=lambda *_: None,
+            show_logs=lambda *_: None,
+            resources=table,
+            last_fetch=now(),
+            use_utc=True,
+            wide=True,
+            focused=True,
+            set_capturing=lambda *_: None,
+        ),
+        headless=True,
+        dimensions=(200, 50),
+        autopilot=[*(KeyPressed(key=Key.Down) for _ in range(frames)), Quit()],
+    )
+    elapsed = perf_counter() - start
+
+    record(results, "render", rows=rows, seconds_per_frame=elapsed / frames)
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_search(results: list[dict[str, Any]], rows: int) -> None:
+    table = pod_table(rows)
+    search = RowSearch()
+    query = "node-12"
+
+    start = perf_counter()
+    for n in range(1, len(query) + 1):
+        matches = search.search(table.rows, table, query[:n])
+    elapsed = perf_counter() - start
+
+    assert all(r.cells[-1] == "node-12" for r in matches)
+
+    record(results, "search", rows=rows, seconds_per_key=elapsed / len(query))
+
+
+def test_import_cli(results: list[dict[str, Any]]) -> None:
+    start = perf_counter()
+    subprocess.run([sys.executable, "-c", "import kludge.cli"], check=True)
+    elapsed = perf_counter() - start
+
+    record(results, "import_cli", seconds=elapsed)
+
+
+# counterweight merges some of root's styles in a way that newer versions of pydantic deprecate,
+# and leaks its log file when an app is run more than once in the same process
+async def test_time_to_first_rows(
+    results: list[dict[str, Any]], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(kache, "CACHE_DIR", tmp_path)  # so discovery isn't served from a cache
+    cluster = FakeCluster(namespaces=1, pods=1_000, latency=0.005)
+
+    # counterweight doesn't render while suspended, so wait in many short suspensions,
+    # until the first rows have been shown
+    def autopilot() -> Iterator[Suspend | Quit]:
+        while "first rows" not in PROFILE.marks:
+            yield Suspend(handler=partial(sleep, 0.01))
+        yield Quit()
+
+    async with serve(cluster) as klient:
+        async with Klients(klient.konfig) as klients:
+            PROFILE.started = perf_counter()
+            PROFILE.marks.clear()
+
+            await app(
+                partial(root, klients=klients),
+                headless=True,
+                dimensions=(200, 50),
+                autopilot=autopilot(),
+            )
+
+    record(
+        results,
+        "time_to_first_rows",
+        first_frame=PROFILE.marks["first frame"] - PROFILE.started,
+        first_rows=PROFILE.marks["first rows"] - PROFILE.started,
+        over_budget=PROFILE.over_budget(),
+    )
@@ -0,0 +1,85 @@
+import pytest
+
+from kludge.bulk import Progress, bulk, parse_assignments, retry_after
+from kludge.patch import MERGE_PATCH_HEADERS
+from tests.fake_api import FakeCluster, serve
+
+
+def paths(n: int) -> list[str]:
+    return [f"/api/v1/namespaces/ns-0/pods/pod-{i}" for i in range(n)]
+
+
+def test_parse_assignments() -> None:
+    assert parse_assignments("app=web tier- empty=") == {"app": "web", "tier": None, "empty": ""}
+
+    with pytest.raises(ValueError):
+        parse_assignments("app")
+
+    with pytest.raises(ValueError):
+        parse_assignments("  ")
+
+
+def test_retry_after() -> None:
+    assert retry_after({"Retry-After": "3"}) == 3
+    assert retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 1
+    assert retry_after({"Retry-After": "3600"}) == 60
+    assert retry_after({}) == 1
+
+
+async def test_bulk_delete() -> None:
+    cluster = FakeCluster()
+    cluster.deleted.add(("ns-0", "pod-3"))  # already gone, which is fine
+    cluster.throttled[("ns-0", "pod-5")] = 2
+
+    reported: list[Progress] = []
+    async with serve(cluster) as klient:
+        progress = await bulk(
+            klient, "delete", paths(20), "Deleting", reported.append, concurrency=4
+        )
+
+    assert progress.done
+    assert (progress.succeeded, progress.failed) == (20, 0)
+    assert len(reported) == 21
+    assert cluster.deleted == {("ns-0", f"pod-{i}") for i in range(20)}
+
+
+async def test_bulk_patch() -> None:
+    cluster = FakeCluster()
+    cluster.throttled[("ns-0", "pod-1")] = 100  # never lets up
+
+    async with serve(cluster) as klient:
+        progress = await bulk(
+            klient,
+            "patch",
+            paths(3),
+            "Labeling",
+            lambda p: None,
+            headers=MERGE_PATCH_HEADERS,
+            json={"metadata": {"labels": {"app": "x"}}},
+        )
+
+    assert (progress.succeeded, progress.failed) == (2, 1)
+    assert progress.errors == ("pod-1: Too Many Requests",)
+    assert str(progress) == "Labeling 3/3, 1 failed (pod-1: Too Many Requests)"
+    assert cluster.pod("ns-0", "pod-0")["metadata"]["labels"] == {"app": "x"}
+
+
+async def test_bulk_counts_dropped_connections_as_failed() -> None:
+    cluster = FakeCluster(dropped={paths(3)[1]})
+
+    async with serve(cluster) as klient:
+        progress = await bulk(klient, "delete", paths(3), "Deleting", lambda p: None)
+
+    assert progress.done
+    assert (progress.succeeded, progress.failed) == (2, 1)
+    assert progress.errors[0].startswith("pod-1: ")
+
+
+async def test_bulk_reports_errors_that_are_not_json() -> None:
+    cluster = FakeCluster(unavailable={paths(3)[1]})
+
+    async with serve(cluster) as klient:
+        progress = await bulk(klient, "delete", paths(3), "Deleting", lambda p: None)
+
+    assert (progress.succeeded, progress.failed) == (2, 1)
+    assert progress.errors == ("pod-1: Service Unavailable",)
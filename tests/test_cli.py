@@ -1,6 +1,7 @@
 import subprocess
 import sys
 
+from pytest_mock import MockerFixture
 from typer.testing import CliRunner
 
 from kludge.cli import cli
@@ -17,3 +18,45 @@ def test_help_via_main() -> None:
     result = subprocess.run([sys.executable, "-m", PACKAGE_NAME, "--help"], check=False)
 
     assert result.returncode == 0
+
+
+def test_get_help(runner: CliRunner) -> None:
+    result = runner.invoke(cli, ["get", "--help"])
+
+    assert result.exit_code == 0
+    assert "--watch" in result.output
+
+
+def test_heavy_modules_are_imported_lazily() -> None:
+    heavy = ("counterweight", "aiohttp", "pydantic", "yaml", "structlog", "importlib.metadata")
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, kludge.cli; print(*(m for m in {heavy!r} if m in sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.split() == []
+
+
+def test_no_command_starts_the_tui(runner: CliRunner, mocker: MockerFixture) -> None:
+    run = mocker.patch("asyncio.run", side_effect=lambda coro: coro.close())
+
+    result = runner.invoke(cli, [])
+
+    assert result.exit_code == 0
+    run.assert_called_once()
+
+
+def test_command_does_not_start_the_tui(runner: CliRunner, mocker: MockerFixture) -> None:
+    run = mocker.patch("asyncio.run", side_effect=lambda coro: coro.close())
+    mocker.patch("structlog.configure")
+
+    result = runner.invoke(cli, ["get", "pods"])
+
+    assert run.call_count == 1  # just the get command's
+    assert result.exit_code == 0
@@ -0,0 +1,123 @@
+from dataclasses import replace
+
+from kludge.diskovery import (
+    ALL_NAMESPACES,
+    Discovery,
+    Resource,
+    _aggregated_resources,
+    discover_resources,
+)
+from tests.fake_api import POD, FakeCluster, serve
+
+
+def test_aggregated_resources_uses_preferred_version() -> None:
+    j = {
+        "kind": "APIGroupDiscoveryList",
+        "items": [
+            {
+                "metadata": {"name": "apps"},
+                "versions": [
+                    {
+                        "version": "v1",
+                        "resources": [
+                            {
+                                "resource": "deployments",
+                                "responseKind": {
+                                    "group": "apps",
+                                    "version": "v1",
+                                    "kind": "Deployment",
+                                },
+                                "scope": "Namespaced",
+                                "singularResource": "deployment",
+                                "shortNames": ["deploy"],
+                                "verbs": ["get", "list", "watch"],
+                            }
+                        ],
+                    },
+                    {"version": "v1beta1", "resources": [{"resource": "old"}]},
+                ],
+            }
+        ],
+    }
+
+    (resource,) = _aggregated_resources(j, core=False)
+
+    assert resource.groupVersion == "apps/v1"
+    assert resource.kind == "Deployment"
+    assert resource.namespaced
+    assert resource.names == (
+        "apps/v1/deployments",
+        "deployments.apps",
+        "deployments",
+        "deployment",
+        "deploy",
+    )
+
+
+def test_collection_url_across_all_namespaces() -> None:
+    assert POD.collection_url("default") == "/api/v1/namespaces/default/pods"
+    assert POD.collection_url(ALL_NAMESPACES) == "/api/v1/pods"
+
+
+def resource(group_version: str, name: str, *short_names: str) -> Resource:
+    return Resource(
+        core="/" not in group_version,
+        groupVersion=group_version,
+        name=name,
+        kind=name.title(),
+        singularName=name.removesuffix("s"),
+        namespaced=True,
+        shortNames=short_names,
+        verbs=("get", "list", "watch"),
+    )
+
+
+def test_index_prefers_earlier_groups_on_collisions() -> None:
+    core_events = resource("v1", "events", "ev")
+    group_events = resource("events.k8s.io/v1", "events", "ev")
+    widgets = resource("example.com/v1", "widgets", "events")
+    unlistable = replace(resource("example.com/v1", "gadgets"), verbs=("get",))
+
+    index = Discovery(resources=(core_events, group_events, widgets, unlistable)).index
+
+    assert index["events"] is core_events
+    assert index["event"] is core_events
+    assert index["ev"] is core_events
+    assert index["events.events.k8s.io"] is group_events
+    assert index["events.k8s.io/v1/events"] is group_events
+    assert index["widgets"] is widgets
+    assert "gadgets" not in index
+
+
+def test_index_prefers_plural_names_to_short_names() -> None:
+    widgets = resource("example.com/v1", "widgets", "pods")
+    pods = resource("v1", "pods", "po")
+
+    index = Discovery(resources=(widgets, pods)).index
+
+    assert index["pods"] is pods
+    assert index["po"] is pods
+
+
+async def test_unchanged_discovery_is_reused() -> None:
+    cluster = FakeCluster(groups=2)
+
+    async with serve(cluster) as klient:
+        cached = await discover_resources(klient)
+        discovery = await discover_resources(klient, cached=cached)
+
+    assert discovery is cached
+    assert cached.etags == {"/api": '"core"', "/apis": '"groups-2-5"'}
+
+
+async def test_only_the_changed_half_of_discovery_is_rebuilt() -> None:
+    async with serve(FakeCluster(groups=2)) as klient:
+        cached = await discover_resources(klient)
+
+    async with serve(FakeCluster(groups=3)) as klient:
+        discovery = await discover_resources(klient, cached=cached)
+
+    core = [r for r in discovery.resources if r.core]
+    assert core and all(a is b for a, b in zip(core, (r for r in cached.resources if r.core)))
+    assert len(discovery.resources) == len(core) + 3 * 5
+    assert discovery.etags == {"/api": '"core"', "/apis": '"groups-3-5"'}
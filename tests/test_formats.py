@@ -0,0 +1,37 @@
+import json
+from io import StringIO
+from typing import Any
+
+from kludge.formats import dump_json, dump_yaml, load_yaml
+
+OBJ: dict[str, Any] = {
+    "metadata": {"name": "pod-0", "namespace": "default", "labels": {"app": "ünïcode"}},
+    "spec": {"containers": [{"name": "main", "args": ["a", "b"]}]},
+}
+
+
+def test_yaml_round_trip() -> None:
+    dumped = dump_yaml(OBJ)
+
+    assert dumped is not None
+    assert load_yaml(dumped) == OBJ
+
+
+def test_yaml_keeps_key_order_in_block_style() -> None:
+    dumped = dump_yaml({"spec": {}, "metadata": {"name": "pod-0"}})
+
+    assert dumped == "spec: {}\nmetadata:\n  name: pod-0\n"
+
+
+def test_yaml_to_stream() -> None:
+    stream = StringIO()
+
+    assert dump_yaml(OBJ, stream) is None
+    assert load_yaml(stream.getvalue()) == OBJ
+
+
+def test_json() -> None:
+    dumped = dump_json(OBJ)
+
+    assert json.loads(dumped) == OBJ
+    assert dumped.startswith(b'{\n  "metadata"')
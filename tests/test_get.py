@@ -0,0 +1,121 @@
+import json
+from asyncio import timeout
+from io import BytesIO
+
+import pytest
+
+from kludge.diskovery import ALL_NAMESPACES, Discovery, discover_resources
+from kludge.get import GetFailed, find_resource, get
+from kludge.watch import LIST_PAGE_SIZE
+from tests.fake_api import POD, FakeCluster, serve
+
+
+def test_find_resource() -> None:
+    discovery = Discovery(resources=(POD,))
+
+    assert find_resource(discovery, "pod") == POD
+    assert find_resource(discovery, "po") == POD
+    assert find_resource(discovery, "pods") == POD
+    assert find_resource(discovery, "nope") is None
+
+
+async def test_find_resource_by_plural_name_of_group_resource() -> None:
+    async with serve(FakeCluster(groups=1, crds_per_group=1)) as klient:
+        discovery = await discover_resources(klient)
+
+    resource = next(r for r in discovery.resources if not r.core)
+    assert find_resource(discovery, resource.name) == resource
+
+
+async def test_table() -> None:
+    out = BytesIO()
+
+    async with serve(FakeCluster(namespaces=1, pods=600)) as klient:
+        await get(klient, POD, "ns-0", out)
+
+    lines = out.getvalue().decode().splitlines()
+    assert len(lines) == 1 + 600
+    assert lines[0].split() == ["NAME", "READY", "STATUS", "RESTARTS", "AGE"]
+    assert lines[1].split() == ["pod-0", "1/1", "CrashLoopBackOff", "0", "0d"]
+    # Widths only grow, so the second page lines up with the first
+    assert lines[600].index("1/1") == lines[1].index("1/1") == lines[0].index("READY")
+
+
+async def test_wide_table_in_all_namespaces() -> None:
+    out = BytesIO()
+
+    async with serve(FakeCluster(namespaces=2, pods=3)) as klient:
+        await get(klient, POD, ALL_NAMESPACES, out, output="wide")
+
+    lines = out.getvalue().decode().splitlines()
+    assert lines[0].split() == [
+        "NAMESPACE",
+        "NAME",
+        "READY",
+        "STATUS",
+        "RESTARTS",
+        "AGE",
+        "IP",
+        "NODE",
+    ]
+    assert [line.split()[:2] for line in lines[1:]] == [
+        [f"ns-{n}", f"pod-{i}"] for n in range(2) for i in range(3)
+    ]
+
+
+async def test_ndjson() -> None:
+    out = BytesIO()
+
+    async with serve(FakeCluster(namespaces=2, pods=600)) as klient:
+        await get(klient, POD, "ns-1", out, output="ndjson")
+
+    objects = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(objects) == 600
+    assert objects[0]["kind"] == "Pod"
+    assert {o["metadata"]["namespace"] for o in objects} == {"ns-1"}
+
+
+async def test_ndjson_watch_events() -> None:
+    out = BytesIO()
+
+    async with serve(FakeCluster(namespaces=1, pods=2)) as klient:
+        await get(klient, POD, "ns-0", out, output="ndjson", watch_events=True)
+
+    events = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [(e["type"], e["object"]["metadata"]["name"]) for e in events] == [
+        ("ADDED", "pod-0"),
+        ("ADDED", "pod-1"),
+    ]
+
+
+async def test_dropped_list_fails() -> None:
+    cluster = FakeCluster(namespaces=1, pods=2, dropped={"/api/v1/namespaces/ns-0/pods"})
+
+    async with serve(cluster) as klient:
+        with pytest.raises(GetFailed):
+            await get(klient, POD, "ns-0", BytesIO(), watch=True)
+
+
+async def test_expired_list_fails_rather_than_writing_rows_twice() -> None:
+    out = BytesIO()
+    cluster = FakeCluster(namespaces=1, pods=600, expired={str(LIST_PAGE_SIZE)})
+
+    async with serve(cluster) as klient:
+        with pytest.raises(GetFailed, match="expired before it was complete"):
+            await get(klient, POD, "ns-0", out)
+
+    assert len(out.getvalue().decode().splitlines()) == 1 + LIST_PAGE_SIZE
+
+
+async def test_dropped_watch_relists(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("kludge.get.INITIAL_BACKOFF", 0)
+    out = BytesIO()
+    cluster = FakeCluster(namespaces=1, pods=2, watches=[[None]])
+
+    async with serve(cluster) as klient:
+        with pytest.raises(TimeoutError):
+            async with timeout(1):
+                await get(klient, POD, "ns-0", out, output="ndjson", watch=True)
+
+    names = [json.loads(line)["metadata"]["name"] for line in out.getvalue().splitlines()]
+    assert names[:4] == ["pod-0", "pod-1", "pod-0", "pod-1"]
@@ -0,0 +1,124 @@
+from asyncio import sleep
+from typing import Any
+
+from kludge.informer import Informers, Store, changes, owned
+from tests.fake_api import POD, FakeCluster, serve
+
+
+def obj(
+    name: str,
+    namespace: str = "default",
+    labels: dict[str, str] | None = None,
+    owners: tuple[str, ...] = (),
+) -> dict[str, Any]:
+    return {
+        "metadata": {
+            "name": name,
+            "namespace": namespace,
+            "uid": f"uid-{name}",
+            "labels": labels or {},
+            "ownerReferences": [{"uid": o} for o in owners],
+        }
+    }
+
+
+def test_indexes() -> None:
+    store = Store()
+    store.upsert(obj("a", labels={"app": "x"}, owners=("uid-rs",)))
+    store.upsert(obj("b", namespace="other", labels={"app": "y"}))
+
+    assert [o["metadata"]["name"] for o in store.in_namespace("default")] == ["a"]
+    assert [o["metadata"]["name"] for o in store.with_label("app", "y")] == ["b"]
+    assert [o["metadata"]["name"] for o in store.owned_by("uid-rs")] == ["a"]
+
+
+def test_upsert_and_delete_update_indexes() -> None:
+    store = Store()
+    store.upsert(obj("a", labels={"app": "x"}))
+    store.upsert(obj("a", labels={"app": "y"}))
+
+    assert store.with_label("app", "x") == []
+    assert len(store.with_label("app", "y")) == 1
+
+    store.delete(obj("a"))
+
+    assert len(store) == 0
+    assert dict(store.by_label) == {}
+    assert dict(store.by_namespace) == {}
+
+
+def test_owned_through_intermediates() -> None:
+    replicasets = Store()
+    replicasets.upsert(obj("rs", owners=("uid-deploy",)))
+
+    pods = Store()
+    pods.upsert(obj("a", owners=("uid-rs",)))
+    pods.upsert(obj("b", owners=("uid-other",)))
+
+    assert owned("uid-deploy", pods, [replicasets]) == {("default", "a")}
+    assert owned("uid-rs", pods, [replicasets]) == {("default", "a")}
+
+
+async def test_informer_lists_into_store() -> None:
+    cluster = FakeCluster(namespaces=2, pods=10)
+
+    async with serve(cluster) as klient:
+        informers = Informers(klient)
+        informer = informers(POD, metadata_only=True)
+        assert informers(POD, metadata_only=True) is informer
+
+        async for _ in changes(informer):
+            break
+
+        await informers.stop()
+
+    assert len(informer.store) == 20
+    assert len(informer.store.in_namespace("ns-1")) == 10
+    assert len(informer.store.owned_by("uid-ns-0-rs-0")) == 2
+
+
+async def test_informer_backs_off_when_forbidden() -> None:
+    cluster = FakeCluster(namespaces=2, pods=10, forbidden={"/api/v1/pods"})
+
+    async with serve(cluster) as klient:
+        informers = Informers(klient)
+        informer = informers(POD, metadata_only=True)
+
+        async for _ in changes(informer):
+            break
+
+        await sleep(0.2)
+        await informers.stop()
+
+    assert informer.error == "Forbidden: cannot get /api/v1/pods"
+    assert not informer.synced.is_set()
+    assert len(informer.store) == 0
+    # It waits before trying again, instead of retrying in a tight loop
+    assert [path for _, path, _ in cluster.requests] == ["/api/v1/pods"]
+
+
+async def test_stopped_informers_are_restarted() -> None:
+    async with serve(FakeCluster(namespaces=1, pods=1)) as klient:
+        informers = Informers(klient)
+        informer = informers(POD, metadata_only=True)
+        await informers.stop()
+
+        restarted = informers(POD, metadata_only=True)
+        await informers.stop()
+
+    assert restarted is not informer
+
+
+async def test_informer_reports_errors_that_are_not_json() -> None:
+    cluster = FakeCluster(namespaces=2, pods=10, unavailable={"/api/v1/pods"})
+
+    async with serve(cluster) as klient:
+        informers = Informers(klient)
+        informer = informers(POD, metadata_only=True)
+
+        async for _ in changes(informer):
+            break
+
+        await informers.stop()
+
+    assert informer.error == "Service Unavailable"
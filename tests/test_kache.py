@@ -0,0 +1,141 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from kludge import kache
+from kludge.diskovery import Discovery, Resource
+from kludge.utils import now
+from kludge.watch import Table
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(kache, "CACHE_DIR", tmp_path)
+    return tmp_path
+
+
+def test_round_trip() -> None:
+    discovery = Discovery(
+        resources=(
+            Resource(
+                core=True,
+                groupVersion="v1",
+                name="pods",
+                kind="Pod",
+                singularName="pod",
+                namespaced=True,
+                shortNames=("po",),
+                verbs=("get", "list", "watch"),
+            ),
+        ),
+        etags={"/api": '"abc"'},
+    )
+
+    kache.write_discovery("https://127.0.0.1:6443", discovery)
+
+    assert kache.read_discovery("https://127.0.0.1:6443") == discovery
+    assert kache.read_discovery("https://127.0.0.1:6444") is None
+
+
+def test_per_server_directory(cache_dir: Path) -> None:
+    assert kache.cache_dir("https://127.0.0.1:6443") == cache_dir / "127.0.0.1_6443"
+
+
+def test_corrupt_cache_is_ignored(cache_dir: Path) -> None:
+    (cache_dir / "127.0.0.1_6443").mkdir()
+    (cache_dir / "127.0.0.1_6443" / "discovery.json").write_text("{")
+
+    assert kache.read_discovery("https://127.0.0.1:6443") is None
+
+
+def view(rows: int) -> kache.View:
+    return kache.View(
+        table=Table.from_json(
+            {
+                "columnDefinitions": [{"name": "Name", "priority": 0}],
+                "rows": [{"cells": [f"pod-{i}"]} for i in range(rows)],
+            }
+        ),
+        fetched=now(),
+    )
+
+
+def key(name: str) -> kache.ViewKey:
+    return ("ctx", f"/api/v1/namespaces/{name}/pods", "", "")
+
+
+def test_view_cache_evicts_least_recently_used() -> None:
+    cache = kache.ViewCache(max_entries=2)
+    a, b, c = view(1), view(1), view(1)
+
+    cache.put(key("a"), a)
+    cache.put(key("b"), b)
+    assert cache.get(key("a")) is a  # now b is the least recently used
+
+    cache.put(key("c"), c)
+
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) is a
+    assert cache.get(key("c")) is c
+
+
+def test_view_cache_is_bounded_by_bytes() -> None:
+    big = view(100)
+    cache = kache.ViewCache(max_bytes=kache.approximate_size(big.table) + 1)
+
+    cache.put(key("a"), view(1))
+    cache.put(key("b"), big)
+
+    assert len(cache) == 1
+    assert cache.get(key("b")) is big
+
+    # Replacing a view doesn't count it twice
+    cache.put(key("b"), big)
+    assert cache.total_bytes == kache.approximate_size(big.table)
+
+
+def test_view_cache_keeps_newest_view_even_if_too_big() -> None:
+    cache = kache.ViewCache(max_bytes=1)
+    v = view(10)
+
+    cache.put(key("a"), v)
+
+    assert cache.get(key("a")) is v
+
+
+def obj(resource_version: str) -> dict[str, Any]:
+    return {"metadata": {"name": "pod-0", "resourceVersion": resource_version}}
+
+
+def test_object_cache_only_serves_fresh_objects() -> None:
+    cache = kache.ObjectCache()
+    cache.put(("ctx", "/api/v1/namespaces/default/pods/pod-0"), obj("1"))
+
+    assert cache.get(("ctx", "/api/v1/namespaces/default/pods/pod-0"), "1") == obj("1")
+    assert cache.get(("ctx", "/api/v1/namespaces/default/pods/pod-0"), "2") is None
+    assert cache.get(("ctx", "/api/v1/namespaces/default/pods/pod-0"), "") is None
+    assert cache.get(("other", "/api/v1/namespaces/default/pods/pod-0"), "1") is None
+
+    assert cache.cached_version(("ctx", "/api/v1/namespaces/default/pods/pod-0")) == "1"
+    assert cache.cached_version(("ctx", "/api/v1/namespaces/default/pods/pod-1")) is None
+
+
+def test_object_cache_evicts_least_recently_used() -> None:
+    cache = kache.ObjectCache(max_entries=2)
+    cache.put(("ctx", "a"), obj("1"))
+    cache.put(("ctx", "b"), obj("1"))
+    cache.get(("ctx", "a"), "1")
+    cache.put(("ctx", "c"), obj("1"))
+
+    assert len(cache) == 2
+    assert cache.cached_version(("ctx", "a")) == "1"
+    assert cache.cached_version(("ctx", "b")) is None
+
+
+def test_unreadable_discovery_cache(cache_dir: Path) -> None:
+    path = kache.cache_dir("https://127.0.0.1:6443") / "discovery.json"
+    path.parent.mkdir(parents=True)
+    path.write_text('{"resources": [{"name": "pods"}]}')
+
+    assert kache.read_discovery("https://127.0.0.1:6443") is None
@@ -0,0 +1,56 @@
+import pytest
+
+from kludge.klient import Klients
+from kludge.konfig import Konfig
+
+KONFIG = Konfig.model_validate(
+    {
+        "apiVersion": "v1",
+        "clusters": [
+            {"name": "a", "cluster": {"server": "http://a.example.com"}},
+            {"name": "b", "cluster": {"server": "http://b.example.com"}},
+        ],
+        "users": [{"name": "me", "user": {}}],
+        "contexts": [
+            {"name": "ctx-a", "context": {"cluster": "a", "user": "me"}},
+            {
+                "name": "ctx-b",
+                "context": {"cluster": "b", "user": "me", "namespace": "kube-system"},
+            },
+        ],
+        "current-context": "ctx-b",
+    }
+)
+
+
+def test_current_context() -> None:
+    context = KONFIG.context()
+
+    assert context.cluster == "b"
+    assert context.namespace == "kube-system"
+    assert KONFIG.cluster(context.cluster).server == "http://b.example.com"
+
+
+def test_named_context() -> None:
+    assert KONFIG.context("ctx-a").cluster == "a"
+
+
+def test_missing_context() -> None:
+    with pytest.raises(Exception, match="No context named 'nope'"):
+        KONFIG.context("nope")
+
+
+def test_no_contexts_falls_back_to_first_cluster_and_user() -> None:
+    konfig = KONFIG.model_copy(update={"contexts": [], "current_context": None})
+
+    assert konfig.context().cluster == "a"
+
+
+async def test_klients_are_kept_per_context() -> None:
+    async with Klients(KONFIG) as klients:
+        assert klients.current is klients["ctx-b"]
+        assert klients["ctx-a"] is klients["ctx-a"]
+        assert klients["ctx-a"].server == "http://a.example.com"
+
+        klients.hooks.append(print)
+        assert klients["ctx-a"].hooks == [print]
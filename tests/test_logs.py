@@ -0,0 +1,79 @@
+import pytest
+
+from kludge.logs import LogBuffer, containers, default_container, follow_logs, stream_logs
+from tests.fake_api import FakeCluster, serve
+
+
+def test_buffer_is_bounded() -> None:
+    buffer = LogBuffer(max_lines=3)
+
+    buffer.extend(["a", "b"])
+    buffer.extend(["c", "d", "e"])
+
+    assert list(buffer.lines) == ["c", "d", "e"]
+    assert buffer.appended == 5
+
+
+def test_tail() -> None:
+    buffer = LogBuffer()
+    buffer.extend([str(i) for i in range(10)])
+
+    assert buffer.tail(3) == ["7", "8", "9"]
+    assert buffer.tail(3, offset=2) == ["5", "6", "7"]
+    assert buffer.tail(3, offset=9) == ["0"]
+
+
+def test_default_container() -> None:
+    pod = {
+        "metadata": {"annotations": {"kubectl.kubernetes.io/default-container": "b"}},
+        "spec": {"containers": [{"name": "a"}, {"name": "b"}], "initContainers": [{"name": "i"}]},
+    }
+
+    assert default_container(pod) == "b"
+    assert default_container({"spec": {"containers": [{"name": "a"}]}}) == "a"
+    assert containers(pod) == ("a", "b", "i")
+
+
+async def test_stream_logs() -> None:
+    cluster = FakeCluster(log_lines=10_000)
+
+    async with serve(cluster) as klient:
+        lines = [
+            line
+            async for batch in stream_logs(
+                klient, namespace="ns-0", pod="pod-0", container="sidecar", tail_lines=5_000
+            )
+            for line in batch
+        ]
+
+    assert len(lines) == 5_000
+    assert lines[0] == "2024-01-01T00:00:00.005000Z sidecar line 5000"
+    assert lines[-1] == "2024-01-01T00:00:00.009999Z sidecar line 9999"
+
+
+async def test_follow_logs_resumes_after_the_connection_drops(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr("kludge.logs.INITIAL_BACKOFF", 0)
+    cluster = FakeCluster(log_lines=10_000, dropped_logs={("ns-0", "pod-0"): 2})
+    errors: list[str | None] = []
+
+    async with serve(cluster) as klient:
+        lines = [
+            line
+            async for batch in follow_logs(
+                klient, namespace="ns-0", pod="pod-0", tail_lines=5_000, on_error=errors.append
+            )
+            for line in batch
+        ]
+
+    # Every line, once each
+    assert lines == [f"2024-01-01T00:00:00.{i:06}Z main line {i}" for i in range(5_000, 10_000)]
+    assert [e is not None for e in errors] == [True, False, True, False]
+    # Each reconnect resumes from the last line so far, rather than tailing again
+    queries = [query for _, path, query in cluster.requests if path.endswith("/log")]
+    assert [("tailLines" in q, "sinceTime" in q) for q in queries] == [
+        (True, False),
+        (False, True),
+        (False, True),
+    ]
@@ -0,0 +1,88 @@
+import pytest
+
+from kludge.patch import PatchFailed, apply_edit, merge_patch, overlaps, paths
+from tests.fake_api import FakeCluster, serve
+
+PATH = "/api/v1/namespaces/ns-0/pods/pod-0"
+
+
+def test_merge_patch_only_has_changes() -> None:
+    before = {"a": 1, "b": {"c": 2, "d": 3}, "e": [1, 2], "f": 4}
+    after = {"a": 1, "b": {"c": 2, "d": 5}, "e": [1], "g": 6}
+
+    assert merge_patch(before, after) == {"f": None, "b": {"d": 5}, "e": [1], "g": 6}
+    assert merge_patch(before, before) == {}
+
+
+def test_paths() -> None:
+    assert set(paths({"a": {"b": 1, "c": None}, "d": [1]})) == {("a", "b"), ("a", "c"), ("d",)}
+
+
+def test_overlaps() -> None:
+    assert overlaps({"a": {"b": 1}}, {"a": {"b": 2}})
+    assert overlaps({"a": {"b": 1}}, {"a": None})
+    assert not overlaps({"a": {"b": 1}}, {"a": {"c": 2}})
+
+
+async def test_apply_edit() -> None:
+    cluster = FakeCluster()
+
+    async with serve(cluster) as klient:
+        before = cluster.pod("ns-0", "pod-0")
+        after = {**before, "metadata": {**before["metadata"], "labels": {"app": "x"}}}
+
+        updated = await apply_edit(klient, PATH, before, after)
+
+    assert updated is not None
+    assert updated["metadata"]["labels"] == {"app": "x"}
+    assert updated["metadata"]["resourceVersion"] == "2"
+
+
+async def test_apply_edit_without_changes() -> None:
+    cluster = FakeCluster()
+
+    async with serve(cluster) as klient:
+        before = cluster.pod("ns-0", "pod-0")
+
+        assert await apply_edit(klient, PATH, before, before) is None
+
+    assert not cluster.edited
+
+
+async def test_apply_edit_retries_conflicts_on_other_fields() -> None:
+    cluster = FakeCluster()
+
+    async with serve(cluster) as klient:
+        before = cluster.pod("ns-0", "pod-0")
+        cluster.edit("ns-0", "pod-0", {"metadata": {"annotations": {"theirs": "y"}}})
+
+        after = {**before, "metadata": {**before["metadata"], "labels": {"app": "x"}}}
+        updated = await apply_edit(klient, PATH, before, after)
+
+    assert updated is not None
+    assert updated["metadata"]["labels"] == {"app": "x"}
+    assert updated["metadata"]["annotations"] == {"theirs": "y"}
+
+
+async def test_apply_edit_fails_on_conflicting_fields() -> None:
+    cluster = FakeCluster()
+
+    async with serve(cluster) as klient:
+        before = cluster.pod("ns-0", "pod-0")
+        cluster.edit("ns-0", "pod-0", {"metadata": {"labels": {"app": "theirs"}}})
+
+        after = {**before, "metadata": {**before["metadata"], "labels": {"app": "mine"}}}
+        with pytest.raises(PatchFailed, match="changed by someone else"):
+            await apply_edit(klient, PATH, before, after)
+
+    assert cluster.pod("ns-0", "pod-0")["metadata"]["labels"] == {"app": "theirs"}
+
+
+async def test_apply_edit_fails_on_errors_that_are_not_json() -> None:
+    cluster = FakeCluster(unavailable={PATH})
+
+    async with serve(cluster) as klient:
+        before = cluster.pod("ns-0", "pod-0")
+        after = {**before, "metadata": {**before["metadata"], "labels": {"app": "x"}}}
+        with pytest.raises(PatchFailed, match="Service Unavailable"):
+            await apply_edit(klient, PATH, before, after)
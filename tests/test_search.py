@@ -0,0 +1,70 @@
+import pytest
+
+from kludge.search import RowSearch, highlights
+from kludge.watch import Row
+
+
+def row(name: str, *cells: str) -> Row:
+    return Row(namespace="default", name=name, resource_version="1", cells=(name, *cells))
+
+
+ROWS = (
+    row("web-1", "Running", "node-a"),
+    row("web-2", "CrashLoopBackOff", "node-b"),
+    row("db-1", "Running", "node-b"),
+)
+
+
+def names(rows: list[Row]) -> list[str]:
+    return [r.name for r in rows]
+
+
+def test_search_ignores_case() -> None:
+    assert names(RowSearch().search(ROWS, ROWS, "RUNNING")) == ["web-1", "db-1"]
+
+
+def test_search_does_not_match_across_cells() -> None:
+    assert RowSearch().search(ROWS, ROWS, "1running") == []
+
+
+def test_longer_query_narrows_previous_matches() -> None:
+    search = RowSearch()
+    search.search(ROWS, ROWS, "node-b")
+
+    # Only rows that matched "node-b" are searched, so the first row can't match, even though it would
+    assert names(search.search((), ROWS, "node-b")) == ["web-2", "db-1"]
+    assert names(search.search((), ROWS, "node-b\tx")) == []
+
+
+def test_shorter_query_returns_earlier_matches() -> None:
+    search = RowSearch()
+    wide = search.search(ROWS, ROWS, "w")
+    search.search(ROWS, ROWS, "web-2")
+
+    # "we" still extends "w", so it narrows those matches
+    assert names(search.search((), ROWS, "we")) == ["web-1", "web-2"]
+    assert search.search((), ROWS, "w") is wide
+
+
+def test_new_rows_start_over() -> None:
+    search = RowSearch()
+    search.search(ROWS, ROWS, "node")
+    unchanged = search.texts[id(ROWS[1])]
+    changed = (row("web-1", "Running", "node-c"), *ROWS[1:])
+
+    assert names(search.search(changed, changed, "node-c")) == ["web-1"]
+    assert search.texts[id(ROWS[1])] is unchanged  # only the changed row's text is rebuilt
+    assert len(search.texts) == len(changed)
+
+
+@pytest.mark.parametrize(
+    "text, query, expected",
+    [
+        ("CrashLoopBackOff", "loop", [("Crash", False), ("Loop", True), ("BackOff", False)]),
+        ("aXa", "a", [("a", True), ("X", False), ("a", True)]),
+        ("abc", "", [("abc", False)]),
+        ("", "a", [("", False)]),
+    ],
+)
+def test_highlights(text: str, query: str, expected: list[tuple[str, bool]]) -> None:
+    assert list(highlights(text, query)) == expected
@@ -0,0 +1,90 @@
+import random
+from typing import Any
+
+import pytest
+
+from kludge.sorting import SortedRows, cell_key
+from kludge.watch import Table
+
+COLUMNS = [
+    {"name": "Name", "type": "string", "format": "name", "priority": 0},
+    {"name": "Restarts", "type": "integer", "format": "", "priority": 0},
+    {"name": "Age", "type": "string", "format": "", "priority": 0},
+    {"name": "Last Seen", "type": "date", "format": "", "priority": 0},
+]
+
+
+def row(name: str, restarts: str = "0", age: str = "1s") -> dict[str, Any]:
+    return {"cells": [name, restarts, age]}
+
+
+def table(*rows: dict[str, Any]) -> dict[str, Any]:
+    return {"columnDefinitions": COLUMNS, "rows": list(rows)}
+
+
+def names(rows: SortedRows) -> list[str]:
+    return [rows[idx].name for idx in range(len(rows))]
+
+
+@pytest.mark.parametrize(
+    "column, cells",
+    [
+        (COLUMNS[1], ["2", "9", "10 (5m ago)", "<none>"]),
+        (COLUMNS[2], ["45s", "3h12m", "2d", "1y3d", "<unknown>"]),
+        (COLUMNS[3], ["9m", "10m"]),
+        (COLUMNS[0], ["a-10", "a-9", "b"]),
+    ],
+)
+def test_cell_key(column: dict[str, Any], cells: list[str]) -> None:
+    assert sorted(cells, key=lambda c: cell_key(column, c)) == cells
+
+
+def test_sorts_and_reverses() -> None:
+    rows = SortedRows(column=1)
+    rows.update(Table.from_json(table(row("a", "10"), row("b", "9"), row("c", "9"))))
+
+    assert names(rows) == ["b", "c", "a"]
+
+    rows.descending = True
+    assert names(rows) == ["a", "c", "b"]
+
+
+def test_changed_rows_are_reinserted() -> None:
+    t = Table.from_json(table(*(row(f"p-{n}", str(n)) for n in range(20))))
+    rows = SortedRows(column=1)
+    rows.update(t)
+
+    t = t.apply("MODIFIED", table(row("p-3", "100")))
+    t = t.apply("DELETED", table(row("p-5")))
+    t = t.apply("ADDED", table(row("q", "4")))
+    rows.update(t)
+
+    assert names(rows) == [
+        "p-0",
+        "p-1",
+        "p-2",
+        "p-4",
+        "q",
+        *(f"p-{n}" for n in range(6, 20)),
+        "p-3",
+    ]
+
+
+def test_incremental_matches_full_sort() -> None:
+    rand = random.Random(0)
+    t = Table.from_json(table(*(row(f"p-{n}", str(rand.randrange(5))) for n in range(200))))
+    rows = SortedRows(column=1)
+    rows.update(t)
+
+    for n in range(100):
+        name = f"p-{rand.randrange(250)}"
+        if rand.random() < 0.3:
+            t = t.apply("DELETED", table(row(name)))
+        else:
+            t = t.apply("MODIFIED", table(row(name, str(rand.randrange(5)))))
+        rows.update(t)
+
+    fresh = SortedRows(column=1)
+    fresh.update(t)
+    assert rows.keys == fresh.keys
+    assert names(rows) == names(fresh)
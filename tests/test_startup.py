@@ -0,0 +1,21 @@
+from kludge.startup import StartupProfile
+
+
+def test_marks_only_count_the_first_time() -> None:
+    profile = StartupProfile(started=0)
+
+    profile.mark("first frame")
+    at = profile.marks["first frame"]
+    profile.mark("first frame")
+
+    assert profile.marks == {"first frame": at}
+
+
+def test_report() -> None:
+    profile = StartupProfile(started=0, marks={"import cli": 0.1, "first frame": 0.7})
+
+    lines = profile.report().splitlines()
+
+    assert lines[1].split() == ["100.0", "ms", "100.0", "ms", "import", "cli"]
+    assert lines[2].endswith("first frame (over the 500 ms budget)")
+    assert profile.over_budget() == ["first frame", "first rows"]
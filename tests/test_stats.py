@@ -0,0 +1,72 @@
+import pytest
+from structlog.testing import capture_logs
+
+from kludge.stats import STATS, Percentiles, RequestRecord, path_template, timed
+from tests.fake_api import FakeCluster, serve
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("/api/v1/namespaces", "/api/v1/namespaces"),
+        ("/api/v1/namespaces/default", "/api/v1/namespaces/{name}"),
+        ("/api/v1/namespaces/default/pods", "/api/v1/namespaces/{namespace}/pods"),
+        (
+            "/api/v1/namespaces/default/pods/foo?watch=true",
+            "/api/v1/namespaces/{namespace}/pods/{name}",
+        ),
+        (
+            "/api/v1/namespaces/default/pods/foo/log",
+            "/api/v1/namespaces/{namespace}/pods/{name}/log",
+        ),
+        ("/apis/apps/v1/deployments", "/apis/apps/v1/deployments"),
+        (
+            "/apis/apps/v1/namespaces/kube-system/deployments/dns",
+            "/apis/apps/v1/namespaces/{namespace}/deployments/{name}",
+        ),
+        ("/apis", "/apis"),
+    ],
+)
+def test_path_template(path: str, expected: str) -> None:
+    assert path_template(path) == expected
+
+
+def test_percentiles() -> None:
+    p = Percentiles.of(float(v) for v in range(1, 101))
+
+    assert p == Percentiles(p50=51, p95=96, p99=100)
+    assert Percentiles.of([]) == Percentiles(0, 0, 0)
+
+
+def test_timed_records_and_logs_renders() -> None:
+    @timed
+    def widget() -> int:
+        return 1
+
+    with capture_logs() as logs:
+        assert widget() == 1
+
+    assert STATS.renders[-1].component == "widget"
+    assert [(log["event"], log["log_level"], log["component"]) for log in logs] == [
+        ("render", "debug", "widget")
+    ]
+
+
+async def test_requests_are_reported_to_hooks() -> None:
+    records: list[RequestRecord] = []
+
+    async with serve(FakeCluster(namespaces=1, pods=1)) as klient:
+        klient.hooks.append(records.append)
+
+        async with await klient.request(method="get", path="/api/v1/namespaces/ns-0/pods/pod-0"):
+            pass
+        async with await klient.request(
+            method="get", path="/api/v1/namespaces/ns-0/pods/pod-0/log"
+        ) as r:
+            text = await r.read()
+
+    assert [(r.method, r.path, r.status) for r in records] == [
+        ("GET", "/api/v1/namespaces/{namespace}/pods/{name}", 200),
+        ("GET", "/api/v1/namespaces/{namespace}/pods/{name}/log", 200),
+    ]
+    assert records[1].bytes == len(text)
@@ -0,0 +1,39 @@
+from kludge.typeahead import Typeahead, fuzzy_score
+
+OPTIONS = Typeahead.build(
+    ["pod", "pods", "po", "persistentvolumeclaims", "pvc", "deployments", "deploy", "daemonsets"]
+)
+
+
+def test_prefixed_prefers_short_options() -> None:
+    assert OPTIONS.prefixed("po", 2) == ["po", "pod"]
+    assert OPTIONS.prefixed("d", 10) == ["deploy", "daemonsets", "deployments"]
+    assert OPTIONS.prefixed("x", 10) == []
+
+
+def test_empty_prefix_returns_shortest() -> None:
+    assert OPTIONS.prefixed("", 2) == ["po", "pod"]
+
+
+def test_fuzzy_matches_subsequences() -> None:
+    assert OPTIONS.fuzzy("dpl", 10) == ["deploy", "deployments"]
+    assert "persistentvolumeclaims" in OPTIONS.fuzzy("pvc", 10)
+    assert OPTIONS.fuzzy("pvc", 10)[0] == "pvc"
+
+
+def test_fuzzy_narrows_incrementally() -> None:
+    index = Typeahead.build(["abc", "abd", "xyz"])
+
+    assert index.fuzzy("a", 10) == ["abc", "abd"]
+    assert index.fuzzy("ac", 10) == ["abc"]
+    assert index.fuzzy("a", 10) == ["abc", "abd"]
+
+
+def test_fuzzy_score_prefers_consecutive_characters() -> None:
+    assert fuzzy_score("abc", "abc") > fuzzy_score("abc", "a-b-c")  # type: ignore[operator]
+    assert fuzzy_score("abc", "acb") is None
+
+
+def test_equal_options_compare_equal() -> None:
+    assert Typeahead.build(["a", "b"]) == Typeahead.build(["b", "a"])
+    assert "a" in Typeahead.build(["a"])
@@ -0,0 +1,290 @@
+from typing import Any
+
+import pytest
+
+from kludge.diskovery import ALL_NAMESPACES
+from kludge.watch import LIST_PAGE_SIZE, Table, TablePages, list_and_watch
+from tests.fake_api import POD, FakeCluster, serve
+
+
+def row(name: str, rv: str, *cells: object) -> dict[str, Any]:
+    return {
+        "cells": [name, *cells],
+        "object": {"metadata": {"name": name, "namespace": "default", "resourceVersion": rv}},
+    }
+
+
+def table(*rows: dict[str, Any], rv: str = "1") -> dict[str, Any]:
+    return {
+        "columnDefinitions": [{"name": "Name", "priority": 0}],
+        "metadata": {"resourceVersion": rv},
+        "rows": list(rows),
+    }
+
+
+def test_from_json() -> None:
+    t = Table.from_json(table(row("a", "1", 3), row("b", "1")))
+
+    assert [r.name for r in t.rows] == ["a", "b"]
+    assert t.rows[0].cells == ("a", "3")
+    assert t.resource_version == "1"
+
+
+def test_added_appends() -> None:
+    t = Table.from_json(table(row("a", "1")))
+
+    new = t.apply("ADDED", table(row("b", "2"), rv="2"))
+
+    assert [r.name for r in new.rows] == ["a", "b"]
+    assert new.resource_version == "2"
+
+
+def test_modified_replaces_in_place() -> None:
+    t = Table.from_json(table(row("a", "1"), row("b", "1")))
+
+    new = t.apply("MODIFIED", table(row("a", "2", "x"), rv="2"))
+
+    assert [r.name for r in new.rows] == ["a", "b"]
+    assert new.rows[0].cells == ("a", "x")
+    assert new.rows[1] is t.rows[1]
+
+
+def test_deleted_removes_and_reindexes() -> None:
+    t = Table.from_json(table(row("a", "1"), row("b", "1"), row("c", "1")))
+
+    new = t.apply("DELETED", table(row("a", "2"), rv="2"))
+    new = new.apply("MODIFIED", table(row("c", "3", "x"), rv="3"))
+
+    assert [r.name for r in new.rows] == ["b", "c"]
+    assert new.rows[1].cells == ("c", "x")
+
+
+def test_unchanged_event_returns_same_table() -> None:
+    t = Table.from_json(table(row("a", "1")))
+
+    assert t.apply("MODIFIED", table(row("a", "1"))) is t
+    assert t.apply("DELETED", table(row("z", "1"))) is t
+
+
+def test_extend_appends_next_page() -> None:
+    t = Table.from_json(table(row("a", "1"), rv="5"))
+
+    new = t.extend({"metadata": {"resourceVersion": "5"}, "rows": [row("b", "1")]})
+
+    assert [r.name for r in new.rows] == ["a", "b"]
+    assert new.resource_version == "5"
+    assert new.apply("DELETED", table(row("a", "6"))).positions == {("default", "b"): 0}
+
+
+def test_widths_grow_incrementally() -> None:
+    t = Table.from_json(table(row("a", "1", "xx")))
+    assert t.widths == (1, 2)
+
+    t = t.apply("MODIFIED", table(row("a", "2", "xxxx")))
+    assert t.widths == (1, 4)
+
+    t = t.apply("DELETED", table(row("a", "3")))
+    assert t.widths == (1, 4)
+
+
+def test_rows_without_objects_use_name_column() -> None:
+    t = Table.from_json(
+        {
+            "columnDefinitions": [
+                {"name": "Ready", "priority": 0},
+                {"name": "Name", "priority": 0, "format": "name"},
+            ],
+            "metadata": {"resourceVersion": "1"},
+            "rows": [{"cells": ["1/1", "a"]}],
+        }
+    )
+
+    assert t.rows[0].key == ("", "a")
+    assert t.apply("DELETED", {"rows": [{"cells": ["1/1", "a"]}]}).rows == ()
+
+
+def test_merge_reuses_unchanged_rows() -> None:
+    t = Table.from_json(table(row("a", "1"), row("b", "1")))
+
+    assert t.merge(Table.from_json(table(row("a", "1"), row("b", "1"), rv="2"))) is t
+
+    new = t.merge(Table.from_json(table(row("b", "1"), row("c", "2"), rv="2")))
+    assert [r.name for r in new.rows] == ["b", "c"]
+    assert new.rows[0] is t.rows[1]
+    assert new.resource_version == "2"
+
+
+def test_namespace_column_is_prepended() -> None:
+    t = Table.from_json(table(row("a", "1", "x")), namespace_column=True)
+
+    assert [c["name"] for c in t.columns] == ["Namespace", "Name"]
+    assert t.rows[0].cells == ("default", "a", "x")
+    assert t.widths == (7, 1, 1)
+
+    new = t.apply("MODIFIED", table(row("a", "2", "yy"), rv="2"))
+    assert new.rows[0].cells == ("default", "a", "yy")
+
+
+async def test_list_all_namespaces() -> None:
+    cluster = FakeCluster(namespaces=3, pods=2)
+
+    async with serve(cluster) as klient:
+        async for t in list_and_watch(
+            klient, path=POD.collection_url(ALL_NAMESPACES), namespace_column=True
+        ):
+            if len(t.rows) == 6:
+                break
+
+    assert t.columns[0]["name"] == "Namespace"
+    assert [r.key for r in t.rows[:3]] == [("ns-0", "pod-0"), ("ns-0", "pod-1"), ("ns-1", "pod-0")]
+    assert t.rows[2].cells[:2] == ("ns-1", "pod-0")
+
+
+async def test_relist_of_unchanged_initial_table_reuses_it() -> None:
+    cluster = FakeCluster(namespaces=1, pods=3)
+
+    async with serve(cluster) as klient:
+        path = POD.collection_url("ns-0")
+        initial = await list_and_watch(klient, path=path).__anext__()
+        table = await list_and_watch(klient, path=path, initial=initial).__anext__()
+
+    assert table is initial
+
+
+def test_only_keeps_matching_rows() -> None:
+    t = Table.from_json(table(row("a", "1", "xxxx"), row("b", "1"), row("c", "1")))
+
+    only = t.only({("default", "c"), ("default", "a")})
+
+    assert [r.name for r in only.rows] == ["a", "c"]
+    assert only.positions == {("default", "a"): 0, ("default", "c"): 1}
+    assert only.widths == t.widths
+
+
+def test_pages_make_the_same_table_as_extending() -> None:
+    first = table(row("a", "1", "xx"), rv="5")
+    second = {"metadata": {"resourceVersion": "5"}, "rows": [row("b", "1", "xxx")]}
+
+    pages = TablePages(namespace_column=True)
+    pages.add(first)
+    pages.add(second)
+    t = pages.table()
+
+    extended = Table.from_json(first, namespace_column=True).extend(second)
+    assert (t.columns, t.rows, t.resource_version, t.widths) == (
+        extended.columns,
+        extended.rows,
+        extended.resource_version,
+        extended.widths,
+    )
+    assert t.positions == extended.positions
+
+
+async def test_list_yields_first_page_then_every_so_often(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("kludge.watch.PROGRESSIVE_LIST_INTERVAL", 3600)
+    rows = LIST_PAGE_SIZE * 3 + 1
+
+    async with serve(FakeCluster(namespaces=1, pods=rows)) as klient:
+        sizes = []
+        async for t in list_and_watch(klient, path=POD.collection_url("ns-0")):
+            sizes.append(len(t.rows))
+            if len(t.rows) == rows:
+                break
+
+    # The pages in between arrive too soon after the first one to be shown
+    assert sizes == [LIST_PAGE_SIZE, rows]
+
+
+def event(type: str, *rows: dict[str, Any], rv: str) -> dict[str, Any]:
+    return {"type": type, "object": table(*rows, rv=rv)}
+
+
+async def test_watch_applies_events_and_relists(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("kludge.watch.INITIAL_BACKOFF", 0)
+    cluster = FakeCluster(
+        namespaces=1,
+        pods=2,
+        watches=[
+            [
+                event("ADDED", row("new", "1001"), rv="1001"),
+                event("BOOKMARK", rv="1002"),
+                {"type": "ERROR", "object": {"kind": "Status", "code": 410}},
+            ],
+            410,
+            # Rows listed in a namespace don't have their objects
+            [event("DELETED", {"cells": ["pod-0"]}, rv="1003"), None],
+        ],
+    )
+    path = POD.collection_url("ns-0")
+
+    async with serve(cluster) as klient:
+        tables = []
+        async for t in list_and_watch(klient, path=path):
+            tables.append(t)
+            if len(tables) == 7:
+                break
+
+    assert [[r.name for r in t.rows] for t in tables] == [
+        ["pod-0", "pod-1"],  # listed
+        ["pod-0", "pod-1", "new"],  # added
+        ["pod-0", "pod-1", "new"],  # bookmarked
+        ["pod-0", "pod-1"],  # relisted after the watch's error
+        ["pod-0", "pod-1"],  # relisted after the watch was gone
+        ["pod-1"],  # deleted
+        ["pod-0", "pod-1"],  # relisted after the connection dropped
+    ]
+    assert tables[2] is tables[1]
+    assert tables[4] is tables[3]
+    # Each relist watches again from the relisted resourceVersion
+    assert [(q.get("watch"), q.get("resourceVersion")) for _, _, q in cluster.requests] == [
+        (None, None),
+        ("1", "1000"),
+        (None, None),
+        ("1", "1000"),
+        (None, None),
+        ("1", "1000"),
+        (None, None),
+    ]
+
+
+async def test_selectors_are_sent_with_the_list_and_the_watch() -> None:
+    cluster = FakeCluster(namespaces=1, pods=1, watches=[[event("BOOKMARK", rv="1001")]])
+
+    async with serve(cluster) as klient:
+        tables = 0
+        async for _ in list_and_watch(
+            klient,
+            path=POD.collection_url("ns-0"),
+            label_selector="app=web",
+            field_selector="status.phase=Running",
+        ):
+            tables += 1
+            if tables == 2:  # listed, then bookmarked
+                break
+
+    assert [
+        (q.get("watch"), q["labelSelector"], q["fieldSelector"]) for _, _, q in cluster.requests
+    ] == [
+        (None, "app=web", "status.phase=Running"),
+        ("1", "app=web", "status.phase=Running"),
+    ]
+
+
+async def test_failed_list_is_reported_and_retried(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("kludge.watch.INITIAL_BACKOFF", 0)
+    path = POD.collection_url("ns-0")
+    cluster = FakeCluster(namespaces=1, pods=2, forbidden={path})
+    errors: list[str | None] = []
+
+    def on_error(error: str | None) -> None:
+        errors.append(error)
+        if len(errors) == 2:
+            cluster.forbidden.clear()
+
+    async with serve(cluster) as klient:
+        # An error isn't an empty table, so the first table is only yielded once listing works
+        t = await list_and_watch(klient, path=path, on_error=on_error).__anext__()
+
+    assert [r.name for r in t.rows] == ["pod-0", "pod-1"]
+    assert errors == [f"Forbidden: cannot get {path}"] * 2
+    assert len(cluster.requests) == 3